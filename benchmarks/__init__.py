@@ -0,0 +1 @@
+"""Benchmarks y servidores falsos de Mistral y GitHub (también los usan los tests)."""
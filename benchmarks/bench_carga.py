@@ -0,0 +1,318 @@
+"""Prueba de carga de Mindly con servidores locales de Mistral y GitHub.
+
+Lanza muchas sesiones simuladas de la app con `streamlit.testing.AppTest`
+contra benchmarks/fake_mistral.py. AppTest parchea estado global de Streamlit
+(secrets, runtime) y no admite ejecuciones simultáneas en un mismo proceso, así
+que la concurrencia sale de `--concurrencia` procesos, cada uno con sus sesiones
+en serie y sus propios recursos compartidos (como una réplica del servidor).
+Mide:
+
+- turnos: rendimiento (turnos/s) y latencia p50/p99 de un turno completo.
+- memoria: tamaño del estado de cada sesión (session_state más su historial en
+  `almacen_sesiones`) y RSS del proceso por sesión.
+- log: coste de `encolar` y de escribir un lote a medida que crece el log.
+- gist: sincronización inicial e incremental contra benchmarks/fake_github.py.
+
+Uso:
+    python benchmarks/bench_carga.py --sesiones 50 --turnos 3 --concurrencia 8
+    python benchmarks/bench_carga.py --json resultado.json
+    python benchmarks/bench_carga.py --referencia resultado.json  # sale con 1 si hay regresión
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(DIRECTORIO)
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, DIRECTORIO)
+
+from fake_github import ServidorGistFalso  # noqa: E402
+from fake_mistral import ServidorMistralFalso  # noqa: E402
+from mindly_backends import BACKENDS, crear_backend  # noqa: E402
+from mindly_cobertura import percentil  # noqa: E402
+from mindly_escritor import EscritorLogAsincrono  # noqa: E402
+from mindly_gist import GistManager, SincronizadorGist  # noqa: E402
+from mindly_http import SesionHTTP  # noqa: E402
+from mindly_indice import LectorLogIndexado  # noqa: E402
+from mindly_logstore import LogStore  # noqa: E402
+
+MENSAJES = [
+    "Últimamente me siento muy ansioso en el trabajo",
+    "¿Qué técnica de respiración me recomiendas para dormir?",
+    "Necesito un consejo para hablar con mi familia",
+    "¿Qué es la terapia cognitivo conductual?",
+    "Me cuesta concentrarme y estoy cansado todo el día",
+]
+
+# Métrica -> True si un valor mayor es mejor
+METRICAS_REGRESION = {
+    "turnos.turnos_por_s": True,
+    "turnos.p50_ms": False,
+    "turnos.p99_ms": False,
+    "memoria.estado_kb_por_sesion": False,
+    "log.lote_ms_final": False,
+    "gist.incremental_ms": False,
+}
+
+
+def rss_kb():
+    """Pico de memoria residente del proceso (KB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def tamano_profundo(objeto, vistos=None):
+    """Bytes aproximados de un objeto y todo lo que contiene"""
+    vistos = set() if vistos is None else vistos
+    if id(objeto) in vistos:
+        return 0
+    vistos.add(id(objeto))
+    tamano = sys.getsizeof(objeto)
+    if isinstance(objeto, dict):
+        tamano += sum(tamano_profundo(k, vistos) + tamano_profundo(v, vistos) for k, v in objeto.items())
+    elif isinstance(objeto, (list, tuple, set, frozenset)):
+        tamano += sum(tamano_profundo(x, vistos) for x in objeto)
+    elif hasattr(objeto, "__dict__"):
+        tamano += tamano_profundo(vars(objeto), vistos)
+    elif hasattr(objeto, "__slots__"):
+        tamano += sum(tamano_profundo(getattr(objeto, s), vistos) for s in objeto.__slots__ if hasattr(objeto, s))
+    return tamano
+
+
+def almacen_de_la_app():
+    """El AlmacenSesiones que la app creó (st.cache_resource) en este proceso"""
+    from mindly_sesiones import AlmacenSesiones
+    return next(o for o in gc.get_objects() if isinstance(o, AlmacenSesiones))
+
+
+def trabajador(indices, turnos, url_mistral, directorio, timeout):
+    """Proceso de carga: ejecuta sus sesiones una tras otra y devuelve las mediciones"""
+    from streamlit.testing.v1 import AppTest
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    os.environ["MISTRAL_SERVER_URL"] = url_mistral
+    os.environ.setdefault("MISTRAL_RPS", "1000")
+    os.makedirs(directorio, exist_ok=True)
+    os.chdir(directorio)  # los logs de la app (chat_logs/) van al directorio de este proceso
+
+    # AppTest usa siempre el mismo id de sesión, así que todas las sesiones
+    # simuladas compartirían historial (chat_sesiones/<id>.jsonl); cada una lleva el suyo
+    sesion_actual = {"id": None}
+    iniciar_runner = LocalScriptRunner.__init__
+
+    def iniciar_con_id(self, *args, **kwargs):
+        iniciar_runner(self, *args, **kwargs)
+        self._session_id = sesion_actual["id"]
+
+    LocalScriptRunner.__init__ = iniciar_con_id
+
+    def nueva_sesion(sesion_id):
+        sesion_actual["id"] = sesion_id
+        at = AppTest.from_file(os.path.join(RAIZ, "mindly_ia.py"), default_timeout=timeout)
+        at.secrets["MISTRAL_API_KEY"] = "x" * 32
+        return at.run()
+
+    nueva_sesion(f"bench-{os.getpid()}-calentamiento")  # importaciones y recursos compartidos fuera de la medición
+    almacen = almacen_de_la_app()
+    latencias_ms, errores, estados = [], [], []
+    rss_inicial = rss_kb()
+    for i in indices:
+        sesion_id = f"bench-{os.getpid()}-{i}"
+        at = nueva_sesion(sesion_id)
+        for t in range(turnos):
+            if not at.chat_input:
+                errores.append(at.exception[0].value if at.exception else "sin chat_input")
+                break
+            inicio = time.perf_counter()
+            at.chat_input[0].set_value(f"{MENSAJES[(i + t) % len(MENSAJES)]} ({i}-{t})").run()
+            latencias_ms.append((time.perf_counter() - inicio) * 1000)
+            if at.exception:
+                errores.append(at.exception[0].value)
+        estados.append(tamano_profundo({k: at.session_state[k] for k in at.session_state})
+                       + almacen.obtener(sesion_id).tamano_bytes())
+    gc.collect()
+    historiales = len([n for n in os.listdir(almacen.directorio)
+                       if n.startswith(f"bench-{os.getpid()}-") and "calentamiento" not in n])
+    return latencias_ms, errores, estados, max(rss_kb() - rss_inicial, 0), historiales
+
+
+def fase_turnos(args, url_mistral, directorio):
+    repartos = [list(range(p, args.sesiones, args.concurrencia)) for p in range(args.concurrencia)]
+    repartos = [r for r in repartos if r]
+    contexto = multiprocessing.get_context("spawn")
+    inicio = time.perf_counter()
+    with contexto.Pool(len(repartos)) as pool:
+        resultados = pool.starmap(trabajador, [
+            (r, args.turnos, url_mistral, os.path.join(directorio, f"proceso_{p}"), args.timeout)
+            for p, r in enumerate(repartos)
+        ])
+    segundos = time.perf_counter() - inicio
+
+    latencias_ms = [ms for r in resultados for ms in r[0]]
+    errores = [e for r in resultados for e in r[1]]
+    estados = [e for r in resultados for e in r[2]]
+    turnos = {
+        "sesiones": args.sesiones,
+        "procesos": len(repartos),
+        "turnos": len(latencias_ms),
+        "errores": len(errores),
+        "turnos_por_s": len(latencias_ms) / segundos,
+        "p50_ms": percentil(latencias_ms, 0.50),
+        "p99_ms": percentil(latencias_ms, 0.99),
+    }
+    memoria = {
+        "estado_kb_por_sesion": sum(estados) / len(estados) / 1024 if estados else 0.0,
+        "rss_kb_por_sesion": sum(r[3] for r in resultados) / max(args.sesiones, 1),
+        "historiales": sum(r[4] for r in resultados),  # un archivo por sesión simulada
+    }
+    return turnos, memoria, errores[:3]
+
+
+def entrada_sintetica(i):
+    return {
+        "timestamp": f"2024-01-{1 + i // 50000:02d}T12:00:00",
+        "usuario": MENSAJES[i % len(MENSAJES)],
+        "respuesta": "Respuesta de prueba " * 20,
+        "intencion": "consulta_emocional",
+    }
+
+
+def fase_log(args, directorio):
+    """Coste de escribir el log a medida que crece (lo que hace `guardar_log`)"""
+    store = crear_backend(args.backend_log, os.path.join(directorio, "log_bench"))
+    escritor = EscritorLogAsincrono(store, max_cola=10 * args.lote_log)
+    tamanos = [n for n in (1_000, 10_000, 100_000, 300_000) if n <= args.max_log] or [args.max_log]
+    filas = []
+    escritas = 0
+    for objetivo in tamanos:
+        # Rellenar hasta el tamaño objetivo sin medir
+        while escritas + args.lote_log <= objetivo - args.lote_log:
+            store.agregar_lote([entrada_sintetica(escritas + j) for j in range(args.lote_log)])
+            escritas += args.lote_log
+        lote = [entrada_sintetica(escritas + j) for j in range(args.lote_log)]
+        antes = escritor.estadisticas()
+        inicio = time.perf_counter()
+        for entrada in lote:
+            escritor.encolar(entrada)
+        encolar_us = (time.perf_counter() - inicio) / len(lote) * 1e6
+        escritor.flush()
+        escritas += len(lote)
+        despues = escritor.estadisticas()
+        lotes = max(despues["lotes"] - antes["lotes"], 1)
+        filas.append({"entradas": escritas, "encolar_us": encolar_us,
+                      "lote_ms": (despues["latencia_total_ms"] - antes["latencia_total_ms"]) / lotes})
+    escritor.cerrar()
+    store.cerrar()
+    return {"backend": args.backend_log, "filas": filas, "lote_ms_final": filas[-1]["lote_ms"]}
+
+
+def fase_gist(args, directorio):
+    store = LogStore(os.path.join(directorio, "log_gist"))
+    store.agregar_lote([entrada_sintetica(i) for i in range(args.entradas_gist)])
+    store.flush()
+    lector = LectorLogIndexado(store)
+    with ServidorGistFalso(latencia=args.latencia_github) as github:
+        gist = GistManager("token", sesion=SesionHTTP(), api_base=github.url)
+        sincronizador = SincronizadorGist(gist, os.path.join(directorio, "gist_sync.json"))
+        inicio = time.perf_counter()
+        ok, _, subidas = sincronizador.sincronizar(lector)
+        inicial_ms = (time.perf_counter() - inicio) * 1000
+
+        store.agregar_lote([entrada_sintetica(args.entradas_gist + i) for i in range(10)])
+        store.flush()
+        inicio = time.perf_counter()
+        ok_incremental, _, _ = sincronizador.sincronizar(lector)
+        incremental_ms = (time.perf_counter() - inicio) * 1000
+        peticiones = len(github.peticiones)
+    store.cerrar()
+    return {"ok": ok and ok_incremental, "entradas": subidas, "inicial_ms": inicial_ms,
+            "incremental_ms": incremental_ms, "peticiones": peticiones}
+
+
+def valor(resultado, ruta):
+    for clave in ruta.split("."):
+        resultado = resultado.get(clave) if isinstance(resultado, dict) else None
+    return resultado
+
+
+def comparar(resultado, referencia, tolerancia):
+    """Métricas que empeoran más de `tolerancia` (fracción) respecto a la referencia"""
+    regresiones = []
+    for ruta, mayor_mejor in METRICAS_REGRESION.items():
+        actual, anterior = valor(resultado, ruta), valor(referencia, ruta)
+        if not actual or not anterior:
+            continue
+        cambio = (anterior - actual) / anterior if mayor_mejor else (actual - anterior) / anterior
+        if cambio > tolerancia:
+            regresiones.append(f"{ruta}: {anterior:.2f} -> {actual:.2f} ({cambio:+.0%})")
+    return regresiones
+
+
+def imprimir(resultado):
+    t, m = resultado["turnos"], resultado["memoria"]
+    print(f"\nTurnos: {t['turnos']} en {t['sesiones']} sesiones ({t['procesos']} procesos) • "
+          f"{t['turnos_por_s']:.1f} turnos/s • "
+          f"p50 {t['p50_ms']:.0f} ms • p99 {t['p99_ms']:.0f} ms • {t['errores']} errores")
+    print(f"Memoria: estado {m['estado_kb_por_sesion']:.1f} KB/sesión • RSS {m['rss_kb_por_sesion']:.0f} KB/sesión • "
+          f"{m['historiales']} historiales en disco")
+    print(f"\nLog ({resultado['log']['backend']})")
+    print(f"{'entradas':>10} {'encolar (µs)':>14} {'lote (ms)':>10}")
+    for fila in resultado["log"]["filas"]:
+        print(f"{fila['entradas']:>10} {fila['encolar_us']:>14.2f} {fila['lote_ms']:>10.2f}")
+    g = resultado["gist"]
+    print(f"\nGist: {g['entradas']} entradas en {g['inicial_ms']:.0f} ms • incremental {g['incremental_ms']:.0f} ms • "
+          f"{g['peticiones']} peticiones • {'ok' if g['ok'] else 'ERROR'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sesiones", type=int, default=50)
+    parser.add_argument("--turnos", type=int, default=3, help="turnos por sesión")
+    parser.add_argument("--concurrencia", type=int, default=8, help="procesos de carga")
+    parser.add_argument("--latencia", type=float, default=0.2, help="segundos hasta el primer token")
+    parser.add_argument("--intervalo-token", type=float, default=0.005)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--latencia-github", type=float, default=0.02)
+    parser.add_argument("--max-log", type=int, default=100_000, help="tamaño máximo del log en la fase de log")
+    parser.add_argument("--lote-log", type=int, default=200)
+    parser.add_argument("--backend-log", choices=BACKENDS, default="jsonl")
+    parser.add_argument("--entradas-gist", type=int, default=20_000)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", help="guardar el resultado en este archivo")
+    parser.add_argument("--referencia", help="resultado anterior con el que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="empeoramiento admitido (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="mindly_bench_")
+    try:
+        with ServidorMistralFalso(latencia_primer_token=args.latencia, intervalo_token=args.intervalo_token,
+                                  jitter=args.jitter) as mistral:
+            turnos, memoria, errores = fase_turnos(args, mistral.url, directorio)
+        resultado = {"turnos": turnos, "memoria": memoria,
+                     "log": fase_log(args, directorio), "gist": fase_gist(args, directorio)}
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    imprimir(resultado)
+    for error in errores:
+        print(f"  error: {error}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2)
+    if args.referencia:
+        with open(args.referencia, encoding="utf-8") as f:
+            regresiones = comparar(resultado, json.load(f), args.tolerancia)
+        for regresion in regresiones:
+            print(f"REGRESIÓN {regresion}")
+        sys.exit(1 if regresiones else 0)
+
+
+if __name__ == "__main__":
+    main()
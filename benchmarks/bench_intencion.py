@@ -0,0 +1,61 @@
+"""Micro-benchmark del clasificador de intención frente a la versión anterior.
+
+Uso: python benchmarks/bench_intencion.py [repeticiones]
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from mindly_intencion import clasificador  # noqa: E402
+
+
+def detectar_intencion_anterior(mensaje):
+    mensaje = mensaje.lower()
+    if re.search(r"\b(ansiedad|depresión|estrés|angustia|tristeza|miedo)\b", mensaje):
+        return "consulta_emocional"
+    elif re.search(r"\b(ayuda|consejo|apoyo|orientación|escuchar)\b", mensaje):
+        return "solicitud_ayuda"
+    elif re.search(r"\b(técnica|herramienta|ejercicio|estrategia|psicoterapia|mindfulness|respiración)\b", mensaje):
+        return "consulta_tecnica"
+    elif re.search(r"\b(urgente|crisis|emergencia)\b", mensaje):
+        return "situacion_urgente"
+    else:
+        return "intencion_desconocida"
+
+
+MENSAJES = [
+    "Hola, ¿cómo estás?",
+    "Tengo mucha ansiedad antes de los exámenes",
+    "creo que tengo depresion desde hace meses",
+    "Estoy teniendo una crisis de ansiedad ahora mismo",
+    "¿Me recomiendas alguna técnica de respiración?",
+    "Necesito un consejo sobre cómo hablar con mi pareja",
+    "Es urgente, no sé qué hacer",
+    "Es urgente—no sé qué hacer, «ayuda»",
+    "Quiero empezar a practicar mindfulness por las mañanas antes de ir a trabajar " * 4,
+]
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{'mensaje':<50} {'anterior':<22} {'nuevo':<22}")
+    for m in MENSAJES:
+        print(f"{m[:48]:<50} {detectar_intencion_anterior(m):<22} {clasificador.clasificar(m).etiqueta:<22}")
+
+    for nombre, fn in (("anterior", detectar_intencion_anterior),
+                       ("nuevo", lambda m: clasificador.clasificar(m).etiqueta)):
+        # El mínimo de varias tandas es lo menos sensible al ruido de la máquina
+        segundos = min(timeit.repeat(lambda: [fn(m) for m in MENSAJES], number=repeticiones // 5, repeat=5)) * 5
+        por_mensaje_us = segundos / (repeticiones * len(MENSAJES)) * 1e6
+        print(f"{nombre:<10} {por_mensaje_us:8.2f} µs/mensaje")
+
+    lote = MENSAJES * 1000
+    segundos = timeit.timeit(lambda: clasificador.clasificar_lote(lote), number=5) / 5
+    print(f"lote       {len(lote) / segundos:10.0f} mensajes/s")
+
+
+if __name__ == "__main__":
+    main()
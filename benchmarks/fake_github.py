@@ -0,0 +1,159 @@
+"""Sustituto local de la API de Gists de GitHub para pruebas y benchmarks.
+
+Implementa lo que usa Mindly: POST /gists, PATCH y GET /gists/<id> (con
+truncado del contenido por encima de `limite_contenido` y del listado por
+encima de `max_archivos`, como la API real) y las URLs raw. Permite inyectar latencia y respuestas de error.
+
+Uso independiente: python benchmarks/fake_github.py [puerto]
+"""
+import json
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ServidorGistFalso:
+    def __init__(self, puerto=0, latencia=0.0, limite_contenido=1024 * 1024, max_archivos=300):
+        self.latencia = latencia
+        self.limite_contenido = limite_contenido
+        self.max_archivos = max_archivos
+        self.gists = {}
+        self.fallos = []  # códigos de estado a devolver (en orden) antes de responder bien
+        self.peticiones = []
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", puerto), self._manejador())
+        self._hilo = None
+
+    @property
+    def url(self):
+        host, puerto = self._httpd.server_address
+        return f"http://{host}:{puerto}"
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+    def _manejador(self):
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _json(self, estado, cuerpo, cabeceras=None):
+                datos = json.dumps(cuerpo).encode("utf-8")
+                self.send_response(estado)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(datos)))
+                for clave, valor in (cabeceras or {}).items():
+                    self.send_header(clave, valor)
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def _cuerpo(self):
+                longitud = int(self.headers.get("Content-Length", 0))
+                return json.loads(self.rfile.read(longitud) or b"{}")
+
+            def _fallo_inyectado(self):
+                with servidor._lock:
+                    servidor.peticiones.append((self.command, self.path))
+                    estado = servidor.fallos.pop(0) if servidor.fallos else None
+                if servidor.latencia:
+                    time.sleep(servidor.latencia)
+                if estado is None:
+                    return False
+                cabeceras = {"Retry-After": "0"} if estado in (403, 429) else {}
+                if estado == 403:
+                    cabeceras["X-RateLimit-Remaining"] = "0"
+                self._json(estado, {"message": "fallo inyectado"}, cabeceras)
+                return True
+
+            def _vista(self, gist_id):
+                archivos = {}
+                todos = sorted(servidor.gists[gist_id].items())
+                for nombre, contenido in todos[:servidor.max_archivos]:
+                    datos = contenido.encode("utf-8")
+                    truncado = len(datos) > servidor.limite_contenido
+                    archivos[nombre] = {
+                        "filename": nombre,
+                        "size": len(datos),
+                        "truncated": truncado,
+                        "content": datos[:servidor.limite_contenido].decode("utf-8", "ignore"),
+                        "raw_url": f"{servidor.url}/raw/{gist_id}/{nombre}",
+                    }
+                return {"id": gist_id, "html_url": f"{servidor.url}/gist/{gist_id}", "files": archivos,
+                        "truncated": len(todos) > servidor.max_archivos}
+
+            def do_POST(self):
+                if self._fallo_inyectado():
+                    return
+                cuerpo = self._cuerpo()
+                gist_id = uuid.uuid4().hex
+                with servidor._lock:
+                    servidor.gists[gist_id] = {n: f["content"] for n, f in cuerpo.get("files", {}).items()}
+                    vista = self._vista(gist_id)
+                self._json(201, vista)
+
+            def do_PATCH(self):
+                if self._fallo_inyectado():
+                    return
+                gist_id = self.path.rstrip("/").split("/")[-1]
+                if gist_id not in servidor.gists:
+                    return self._json(404, {"message": "Not Found"})
+                cuerpo = self._cuerpo()
+                with servidor._lock:
+                    for nombre, archivo in cuerpo.get("files", {}).items():
+                        if archivo is None:
+                            servidor.gists[gist_id].pop(nombre, None)
+                        else:
+                            servidor.gists[gist_id][nombre] = archivo["content"]
+                    vista = self._vista(gist_id)
+                self._json(200, vista)
+
+            def do_GET(self):
+                if self._fallo_inyectado():
+                    return
+                partes = self.path.strip("/").split("/")
+                if partes[0] == "raw" and len(partes) == 3 and partes[1] in servidor.gists:
+                    contenido = servidor.gists[partes[1]].get(partes[2])
+                    if contenido is None:
+                        return self._json(404, {"message": "Not Found"})
+                    datos = contenido.encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; charset=utf-8")
+                    self.send_header("Content-Length", str(len(datos)))
+                    self.end_headers()
+                    for i in range(0, len(datos), 64 * 1024):
+                        self.wfile.write(datos[i:i + 64 * 1024])
+                    return
+                if partes[0] == "gists" and len(partes) == 2 and partes[1] in servidor.gists:
+                    with servidor._lock:
+                        vista = self._vista(partes[1])
+                    return self._json(200, vista)
+                self._json(404, {"message": "Not Found"})
+
+        return Manejador
+
+
+if __name__ == "__main__":
+    puerto = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    with ServidorGistFalso(puerto) as servidor:
+        print(f"API de Gists falsa en {servidor.url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
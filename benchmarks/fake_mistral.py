@@ -0,0 +1,156 @@
+"""Sustituto local de la API de chat de Mistral para pruebas y benchmarks.
+
+Responde a POST /v1/chat/completions, con y sin `stream`, en el formato del SDK
+oficial. La latencia hasta el primer token y entre tokens es configurable (en
+general o por modelo) y se pueden inyectar errores HTTP, por ejemplo 429 con
+Retry-After.
+
+Uso independiente: python benchmarks/fake_mistral.py [puerto]
+y arrancar la app con MISTRAL_SERVER_URL=http://127.0.0.1:<puerto>
+"""
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RESPUESTA_POR_DEFECTO = (
+    "Entiendo cómo te sientes. Una técnica sencilla es la respiración 4-7-8: inhala durante "
+    "cuatro segundos, mantén el aire siete y exhala lentamente durante ocho. Repite el ciclo "
+    "cuatro veces y observa cómo cambia tu cuerpo. Si el malestar continúa, considera hablar "
+    "con un profesional de la salud mental."
+)
+
+
+class ServidorMistralFalso:
+    def __init__(self, puerto=0, latencia_primer_token=0.05, intervalo_token=0.005,
+                 respuesta=RESPUESTA_POR_DEFECTO, jitter=0.0):
+        self.latencia_primer_token = latencia_primer_token
+        self.intervalo_token = intervalo_token
+        self.respuesta = respuesta
+        self.jitter = jitter
+        self.latencias_por_modelo = {}  # modelo -> latencia hasta el primer token
+        self.fallos = []  # códigos de estado a devolver (en orden) antes de responder bien
+        self.peticiones = []
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", puerto), self._manejador())
+        self._httpd.daemon_threads = True
+        self._hilo = None
+
+    @property
+    def url(self):
+        host, puerto = self._httpd.server_address
+        return f"http://{host}:{puerto}"
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+    def _latencia(self, modelo):
+        base = self.latencias_por_modelo.get(modelo, self.latencia_primer_token)
+        return max(base + random.uniform(-self.jitter, self.jitter), 0.0)
+
+    def _manejador(self):
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, estado, cuerpo, cabeceras=None):
+                datos = json.dumps(cuerpo).encode("utf-8")
+                self.send_response(estado)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(datos)))
+                for clave, valor in (cabeceras or {}).items():
+                    self.send_header(clave, valor)
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def do_POST(self):
+                longitud = int(self.headers.get("Content-Length", 0))
+                cuerpo = json.loads(self.rfile.read(longitud) or b"{}")
+                modelo = cuerpo.get("model", "desconocido")
+                with servidor._lock:
+                    servidor.peticiones.append(cuerpo)
+                    estado = servidor.fallos.pop(0) if servidor.fallos else None
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    return self._json(404, {"message": "Not Found"})
+                if estado is not None:
+                    cabeceras = {"Retry-After": "0.1"} if estado == 429 else {}
+                    return self._json(estado, {"object": "error", "message": f"fallo inyectado {estado}"},
+                                      cabeceras)
+
+                texto = servidor.respuesta
+                palabras = texto.split(" ")
+                tokens_prompt = sum(len(m.get("content") or "") for m in cuerpo.get("messages", [])) // 4
+                uso = {"prompt_tokens": tokens_prompt, "completion_tokens": len(palabras),
+                       "total_tokens": tokens_prompt + len(palabras)}
+                identificador = uuid.uuid4().hex
+                time.sleep(servidor._latencia(modelo))
+
+                if not cuerpo.get("stream"):
+                    time.sleep(servidor.intervalo_token * len(palabras))
+                    return self._json(200, {
+                        "id": identificador, "object": "chat.completion", "created": int(time.time()),
+                        "model": modelo, "usage": uso,
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": texto}}],
+                    })
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for i, palabra in enumerate(palabras):
+                        if i:
+                            time.sleep(servidor.intervalo_token)
+                        fragmento = {
+                            "id": identificador, "object": "chat.completion.chunk",
+                            "created": int(time.time()), "model": modelo,
+                            "choices": [{"index": 0, "finish_reason": None,
+                                         "delta": {"role": "assistant",
+                                                   "content": palabra if i == 0 else " " + palabra}}],
+                        }
+                        if i == len(palabras) - 1:
+                            fragmento["choices"][0]["finish_reason"] = "stop"
+                            fragmento["usage"] = uso
+                        self._trozo(f"data: {json.dumps(fragmento)}\n\n")
+                    self._trozo("data: [DONE]\n\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # el cliente canceló el stream
+
+            def _trozo(self, texto):
+                datos = texto.encode("utf-8")
+                self.wfile.write(f"{len(datos):x}\r\n".encode() + datos + b"\r\n")
+                self.wfile.flush()
+
+        return Manejador
+
+
+if __name__ == "__main__":
+    puerto = int(sys.argv[1]) if len(sys.argv) > 1 else 8766
+    with ServidorMistralFalso(puerto) as servidor:
+        print(f"API de Mistral falsa en {servidor.url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,194 @@
+import json
+import threading
+
+import numpy as np
+
+NAT = np.datetime64("NaT", "s")
+
+
+class _Columna:
+    """Array de NumPy que crece por bloques (capacidad doblada, sin copiar en cada append)"""
+
+    def __init__(self, dtype, capacidad=1024):
+        self._datos = np.empty(capacidad, dtype=dtype)
+        self.n = 0
+
+    def agregar(self, valores):
+        necesaria = self.n + len(valores)
+        if necesaria > len(self._datos):
+            nuevos = np.empty(max(necesaria, 2 * len(self._datos)), dtype=self._datos.dtype)
+            nuevos[:self.n] = self._datos[:self.n]
+            self._datos = nuevos
+        self._datos[self.n:necesaria] = valores
+        self.n = necesaria
+
+    @property
+    def valores(self):
+        return self._datos[:self.n]
+
+
+def _parsear_timestamps(textos):
+    """ISO 8601 a datetime64[s] en bloque; los que no se entienden quedan como NaT"""
+    try:
+        return np.array(textos, dtype="datetime64[s]")
+    except ValueError:
+        resultado = np.empty(len(textos), dtype="datetime64[s]")
+        for i, texto in enumerate(textos):
+            try:
+                resultado[i] = np.datetime64(texto, "s")
+            except ValueError:
+                resultado[i] = NAT
+        return resultado
+
+
+class FuenteArchivo:
+    """Un archivo suelto como fuente: array JSON (formato antiguo o exportación) o JSONL"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+
+    def contar(self):
+        return sum(1 for _ in self.iterar_desde(0))
+
+    def iterar_desde(self, n=0):
+        with open(self.ruta, encoding="utf-8") as f:
+            primero = f.read(1)
+            while primero.isspace():
+                primero = f.read(1)
+            f.seek(0)
+            if primero == "[":
+                entradas = iter(json.load(f))
+            else:
+                entradas = (json.loads(linea) for linea in f if linea.strip())
+            for i, entrada in enumerate(entradas):
+                if i >= n:
+                    yield entrada
+
+
+class AnaliticaLog:
+    """Agregados del log calculados sobre columnas de NumPy.
+
+    `actualizar(fuente)` lee solo las entradas nuevas de la fuente (cualquier
+    backend de mindly_backends o una `FuenteArchivo`), en bloques de
+    `tam_bloque`, y las añade a cuatro columnas: timestamp, intención
+    (codificada como entero), longitud del mensaje y longitud de la respuesta.
+    Los recuentos por intención se acumulan bloque a bloque; el resto de
+    agregados se calcula vectorizado y se guarda hasta que llegan entradas nuevas.
+    """
+
+    def __init__(self, tam_bloque=50_000):
+        self.tam_bloque = tam_bloque
+        self._lock = threading.Lock()
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self.n = 0
+        self.categorias = []
+        self._codigos = {}
+        self._ts = _Columna("datetime64[s]")
+        self._intencion = _Columna(np.int16)
+        self._len_usuario = _Columna(np.int32)
+        self._len_respuesta = _Columna(np.int32)
+        self._por_intencion = np.zeros(0, dtype=np.int64)
+        self._cache = {}
+
+    def actualizar(self, fuente):
+        with self._lock:
+            total = fuente.contar()
+            if total < self.n:
+                self._reiniciar()  # el log se ha purgado o sustituido
+            if total == self.n:
+                return self
+            bloque = []
+            for entrada in fuente.iterar_desde(self.n):
+                bloque.append(entrada)
+                if len(bloque) >= self.tam_bloque:
+                    self._incorporar(bloque)
+                    bloque = []
+            if bloque:
+                self._incorporar(bloque)
+            self._cache = {}
+        return self
+
+    def _codigo(self, intencion):
+        codigo = self._codigos.get(intencion)
+        if codigo is None:
+            codigo = self._codigos[intencion] = len(self.categorias)
+            self.categorias.append(intencion)
+        return codigo
+
+    def _incorporar(self, entradas):
+        self._ts.agregar(_parsear_timestamps([(e.get("timestamp") or "NaT")[:19] for e in entradas]))
+        codigos = np.fromiter((self._codigo(e.get("intencion") or "desconocida") for e in entradas),
+                              dtype=np.int16, count=len(entradas))
+        self._intencion.agregar(codigos)
+        self._len_usuario.agregar(np.fromiter((len(e.get("usuario") or "") for e in entradas),
+                                              dtype=np.int32, count=len(entradas)))
+        self._len_respuesta.agregar(np.fromiter((len(e.get("respuesta") or "") for e in entradas),
+                                                dtype=np.int32, count=len(entradas)))
+        conteo = np.bincount(codigos, minlength=len(self.categorias))
+        conteo[:len(self._por_intencion)] += self._por_intencion
+        self._por_intencion = conteo
+        self.n += len(entradas)
+
+    def _cacheado(self, clave, calcular):
+        with self._lock:
+            if clave not in self._cache:
+                self._cache[clave] = calcular()
+            return self._cache[clave]
+
+    def intenciones(self):
+        """Total de mensajes por intención"""
+        return {c: int(n) for c, n in zip(self.categorias, self._por_intencion)}
+
+    def percentiles_longitud(self, percentiles=(50, 90, 99)):
+        """Percentiles de longitud (caracteres) de mensajes y respuestas"""
+        def calcular():
+            resultado = {}
+            for nombre, columna in (("usuario", self._len_usuario), ("respuesta", self._len_respuesta)):
+                valores = columna.valores
+                calculados = np.percentile(valores, percentiles) if len(valores) else [0] * len(percentiles)
+                resultado[nombre] = {f"p{p}": float(v) for p, v in zip(percentiles, calculados)}
+            return resultado
+        return self._cacheado(("longitud", tuple(percentiles)), calcular)
+
+    def intenciones_por_dia(self):
+        """(días, categorías, matriz días x categorías con el número de mensajes)"""
+        def calcular():
+            ts = self._ts.valores
+            validos = ~np.isnat(ts)
+            dias = ts[validos].astype("datetime64[D]")
+            if not len(dias):
+                return np.array([], dtype="datetime64[D]"), list(self.categorias), np.zeros((0, len(self.categorias)), np.int64)
+            primero = dias.min()
+            indice_dia = (dias - primero).astype(np.int64)
+            n_dias, n_cat = int(indice_dia.max()) + 1, len(self.categorias)
+            clave = indice_dia * n_cat + self._intencion.valores[validos]
+            matriz = np.bincount(clave, minlength=n_dias * n_cat).reshape(n_dias, n_cat)
+            return primero + np.arange(n_dias), list(self.categorias), matriz
+        return self._cacheado("intenciones_por_dia", calcular)
+
+    def carga_horaria(self):
+        """Mensajes por hora del día (0-23) y estadísticas de las horas con más carga"""
+        def calcular():
+            ts = self._ts.valores
+            ts = ts[~np.isnat(ts)]
+            if not len(ts):
+                return {"por_hora_del_dia": np.zeros(24, np.int64), "hora_pico": None,
+                        "max_por_hora": 0, "p95_por_hora": 0.0, "momento_pico": None}
+            horas = ts.astype("datetime64[h]")
+            hora_del_dia = (horas - ts.astype("datetime64[D]")).astype(np.int64)
+            por_hora_del_dia = np.bincount(hora_del_dia, minlength=24)
+            # Carga de cada hora concreta del calendario (solo las horas con actividad)
+            indice = (horas - horas.min()).astype(np.int64)
+            por_hora = np.bincount(indice)
+            activas = por_hora[por_hora > 0]
+            pico = int(por_hora.argmax())
+            return {
+                "por_hora_del_dia": por_hora_del_dia,
+                "hora_pico": int(por_hora_del_dia.argmax()),
+                "max_por_hora": int(por_hora[pico]),
+                "p95_por_hora": float(np.percentile(activas, 95)),
+                "momento_pico": str(horas.min() + pico),
+            }
+        return self._cacheado("carga_horaria", calcular)
@@ -0,0 +1,407 @@
+"""Archivo comprimido del log, indexado por tiempo e intención.
+
+Las entradas antiguas se compactan en bloques comprimidos (zstd si está
+instalado el paquete `zstandard`, si no gzip) y se purgan del backend. El índice
+(`indice.json`) guarda por bloque dónde está, su rango de timestamps y un mapa
+de bits con las intenciones que contiene, así que una exportación por fechas o
+por intención solo descomprime los bloques que pueden tener resultados.
+
+    python mindly_archivo.py compactar --dias 30
+    python mindly_archivo.py exportar --desde 2026-10-01 --intencion situacion_urgente --salida urgentes.json
+"""
+import argparse
+import gzip
+import heapq
+import itertools
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+
+from mindly_backends import crear_backend
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+VERSION_ARCHIVO = 1
+NIVEL_GZIP = 9
+NIVEL_ZSTD = 12
+
+
+def _comprimir(datos, codec):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=NIVEL_ZSTD).compress(datos)
+    return gzip.compress(datos, compresslevel=NIVEL_GZIP, mtime=0)
+
+
+def _descomprimir(datos, codec):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("El archivo tiene bloques zstd: instala el paquete zstandard para leerlos")
+        return zstandard.ZstdDecompressor().decompress(datos)
+    return gzip.decompress(datos)
+
+
+class ArchivoLog:
+    """Entradas antiguas del log en bloques comprimidos de solo adición.
+
+    Cada compactación escribe un archivo `bloques-NNNNN.dat` nuevo y después
+    sustituye el índice de forma atómica; si se interrumpe antes, el archivo a
+    medias se sobrescribe en la siguiente. Dentro de un bloque, la primera línea
+    es la lista de [timestamp, posición, intención] de sus entradas y el resto
+    las entradas en JSONL, de modo que filtrar no obliga a parsear cada entrada.
+    """
+
+    def __init__(self, directorio, max_bytes_bloque=256 * 1024, codec=None):
+        self.directorio = directorio
+        self.ruta_indice = os.path.join(directorio, "indice.json")
+        self.max_bytes_bloque = max_bytes_bloque
+        self.codec = codec or ("zstd" if zstandard is not None else "gzip")
+        self._lock = threading.Lock()
+        self._stats = {"consultas": 0, "bloques_leidos": 0, "bloques_saltados": 0}
+        self._indice, self._mtime = self._cargar()
+
+    @property
+    def total(self):
+        return self._indice["total"]
+
+    @property
+    def purga_pendiente(self):
+        return self._indice["purga_pendiente"]
+
+    def actualizar(self):
+        """Releer el índice si otro proceso ha compactado"""
+        try:
+            mtime = os.stat(self.ruta_indice).st_mtime_ns
+        except FileNotFoundError:
+            return self
+        if mtime != self._mtime:
+            with self._lock:
+                self._indice, self._mtime = self._cargar()
+        return self
+
+    def agregar(self, entradas, inicio):
+        """Archivar `entradas`, que son las siguientes del log a partir de la posición `inicio`.
+
+        El índice queda con `purga_pendiente` hasta que se llame a `confirmar_purga()`.
+        """
+        with self._lock:
+            indice = json.loads(json.dumps(self._indice))
+            if inicio != indice["total"]:
+                raise ValueError(f"El archivo tiene {indice['total']} entradas; no se puede seguir desde {inicio}")
+            os.makedirs(self.directorio, exist_ok=True)
+            nombre = f"bloques-{len({b['archivo'] for b in indice['bloques']}):05d}.dat"
+            codigos = {intencion: i for i, intencion in enumerate(indice["intenciones"])}
+            grupos = {}  # código de intención -> bloque en construcción
+            n = 0
+            with open(os.path.join(self.directorio, nombre), "wb") as f:
+                for posicion, entrada in enumerate(entradas, start=inicio):
+                    intencion = entrada.get("intencion")
+                    if intencion not in codigos:
+                        codigos[intencion] = len(indice["intenciones"])
+                        indice["intenciones"].append(intencion)
+                    conteo = intencion or "intencion_desconocida"
+                    indice["conteo"][conteo] = indice["conteo"].get(conteo, 0) + 1
+                    linea = json.dumps(entrada, ensure_ascii=False, separators=(",", ":")) + "\n"
+                    grupo = grupos.setdefault(codigos[intencion], {"claves": [], "lineas": [], "bytes": 0})
+                    grupo["claves"].append([entrada.get("timestamp") or "", posicion, codigos[intencion]])
+                    grupo["lineas"].append(linea)
+                    grupo["bytes"] += len(linea)
+                    n += 1
+                    if grupo["bytes"] >= self.max_bytes_bloque:
+                        indice["bloques"].append(self._escribir_bloque(f, nombre, grupo))
+                        del grupos[codigos[intencion]]
+                for grupo in sorted(grupos.values(), key=lambda g: g["claves"][0][1]):
+                    indice["bloques"].append(self._escribir_bloque(f, nombre, grupo))
+                f.flush()
+                os.fsync(f.fileno())
+            if n == 0:
+                os.remove(os.path.join(self.directorio, nombre))
+                return 0
+            indice["total"] += n
+            indice["purga_pendiente"] = True
+            self._guardar(indice)
+            return n
+
+    def confirmar_purga(self):
+        """Anotar que el backend ya borró las entradas archivadas"""
+        with self._lock:
+            if self._indice["purga_pendiente"]:
+                self._guardar(dict(self._indice, purga_pendiente=False))
+
+    def iterar_desde(self, n=0, limite=None):
+        """Iterar las entradas archivadas desde la n-ésima hasta `limite` (sin incluirla)"""
+        for _, linea in self._lineas(self._indice, n, limite):
+            yield json.loads(linea)
+
+    def consultar_lineas(self, desde=None, hasta=None, intenciones=None, limite=None):
+        """Líneas JSON (bytes) de las entradas archivadas en [desde, hasta) con alguna de `intenciones`.
+
+        Solo se descomprimen los bloques cuyo rango de timestamps se solapa con
+        el pedido y cuyo mapa de intenciones tiene alguna de las buscadas.
+        """
+        indice = self._indice
+        mascara = None
+        if intenciones is not None:
+            mascara = sum(1 << i for i, intencion in enumerate(indice["intenciones"]) if intencion in intenciones)
+        stats = {"bloques_leidos": 0, "bloques_saltados": 0}
+        try:
+            for _, linea in self._lineas(indice, 0, limite, desde, hasta, mascara, stats):
+                yield linea
+        finally:
+            with self._lock:
+                self._stats["consultas"] += 1
+                for clave, valor in stats.items():
+                    self._stats[clave] += valor
+
+    def _lineas(self, indice, n, limite, desde=None, hasta=None, mascara=None, stats=None):
+        """(posición, línea) de las entradas que coinciden, en el orden del log.
+
+        Los bloques de cada compactación se separan por intención, así que un
+        filtro por una intención poco frecuente no descomprime los bloques del
+        resto; cada grupo de bloques con el mismo mapa es un flujo ordenado y
+        los flujos se mezclan por posición.
+        """
+        limite = indice["total"] if limite is None else min(limite, indice["total"])
+        flujos = {}
+        for bloque in indice["bloques"]:
+            flujos.setdefault(bloque["mapa"], []).append(bloque)
+        return heapq.merge(*(self._flujo(bloques, n, limite, desde, hasta, mascara, stats)
+                             for bloques in flujos.values()), key=lambda par: par[0])
+
+    def _flujo(self, bloques, n, limite, desde, hasta, mascara, stats):
+        for bloque in bloques:
+            if bloque["ultima"] < n or bloque["primera"] >= limite:
+                continue
+            if ((mascara is not None and not bloque["mapa"] & mascara)
+                    or (desde is not None and bloque["ts_max"] < desde)
+                    or (hasta is not None and bloque["ts_min"] >= hasta)):
+                if stats is not None:
+                    stats["bloques_saltados"] += 1
+                continue
+            if stats is not None:
+                stats["bloques_leidos"] += 1
+            claves, lineas = self._leer_bloque(bloque)
+            for (ts, posicion, codigo), linea in zip(claves, lineas):
+                if (n <= posicion < limite and (desde is None or ts >= desde) and (hasta is None or ts < hasta)
+                        and (mascara is None or mascara >> codigo & 1)):
+                    yield posicion, linea
+
+    def conteo_intenciones(self):
+        return dict(self._indice["conteo"])
+
+    def ultimo_timestamp(self):
+        return max((b["ts_max"] for b in self._indice["bloques"]), default=None) or None
+
+    def estadisticas(self):
+        indice = self._indice
+        bytes_archivo = sum(b["bytes"] for b in indice["bloques"])
+        bytes_originales = sum(b["bytes_originales"] for b in indice["bloques"])
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            "entradas": indice["total"],
+            "bloques": len(indice["bloques"]),
+            "bytes": bytes_archivo,
+            "bytes_originales": bytes_originales,
+            "ratio": bytes_originales / bytes_archivo if bytes_archivo else 0.0,
+            "codecs": sorted({b["codec"] for b in indice["bloques"]}),
+        })
+        return stats
+
+    def _escribir_bloque(self, f, nombre, grupo):
+        claves = grupo["claves"]
+        cabecera = json.dumps(claves, ensure_ascii=False, separators=(",", ":"))
+        datos = (cabecera + "\n" + "".join(grupo["lineas"])).encode("utf-8")
+        comprimido = _comprimir(datos, self.codec)
+        offset = f.tell()
+        f.write(comprimido)
+        mapa = 0
+        for _, _, codigo in claves:
+            mapa |= 1 << codigo
+        return {"archivo": nombre, "offset": offset, "bytes": len(comprimido), "bytes_originales": len(datos),
+                "codec": self.codec, "entradas": len(claves), "primera": claves[0][1], "ultima": claves[-1][1],
+                "ts_min": min(c[0] for c in claves), "ts_max": max(c[0] for c in claves), "mapa": mapa}
+
+    def _leer_bloque(self, bloque):
+        with open(os.path.join(self.directorio, bloque["archivo"]), "rb") as f:
+            f.seek(bloque["offset"])
+            datos = _descomprimir(f.read(bloque["bytes"]), bloque["codec"])
+        cabecera, _, cuerpo = datos.partition(b"\n")
+        return json.loads(cabecera), cuerpo.splitlines(keepends=True)
+
+    def _vacio(self):
+        return {"version": VERSION_ARCHIVO, "total": 0, "purga_pendiente": False,
+                "intenciones": [], "conteo": {}, "bloques": []}
+
+    def _cargar(self):
+        try:
+            with open(self.ruta_indice, "r", encoding="utf-8") as f:
+                mtime = os.fstat(f.fileno()).st_mtime_ns
+                indice = json.load(f)
+            if indice.get("version") == VERSION_ARCHIVO:
+                return indice, mtime
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        return self._vacio(), None
+
+    def _guardar(self, indice):
+        temporal = f"{self.ruta_indice}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(indice, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, self.ruta_indice)
+        self._indice, self._mtime = indice, os.stat(self.ruta_indice).st_mtime_ns
+
+
+class LogConArchivado:
+    """Backend de log cuyas entradas antiguas viven en un `ArchivoLog`.
+
+    Las posiciones no cambian al compactar: las `purgadas()` primeras entradas
+    del backend están en el archivo y el resto en el backend, así que `contar()`
+    e `iterar_desde(n)` siguen valiendo para la sincronización con Gist y la
+    analítica. Tiene la misma interfaz que los backends de mindly_backends.
+    """
+
+    def __init__(self, backend, archivo):
+        self.backend = backend
+        self.archivo = archivo
+        self.directorio = backend.directorio
+        self._lock = threading.Lock()
+        if archivo.purga_pendiente:
+            # Compactación interrumpida entre archivar y purgar: se termina ahora
+            backend.purgar(archivo.total)
+            archivo.confirmar_purga()
+
+    def agregar_lote(self, entradas):
+        self.backend.agregar_lote(entradas)
+
+    def flush(self):
+        self.backend.flush()
+
+    def cerrar(self):
+        self.backend.cerrar()
+
+    def actualizar(self):
+        self.backend.actualizar()
+        self.archivo.actualizar()
+        return self
+
+    def contar(self):
+        return self.backend.purgadas() + self.backend.contar()
+
+    def ultimo_timestamp(self):
+        return self.backend.ultimo_timestamp() or self.archivo.ultimo_timestamp()
+
+    def conteo_intenciones(self):
+        conteo = self.archivo.conteo_intenciones()
+        for intencion, n in self.backend.conteo_intenciones().items():
+            conteo[intencion] = conteo.get(intencion, 0) + n
+        return conteo
+
+    def iterar_desde(self, n=0):
+        """Iterar las entradas a partir de la n-ésima (0 = todas), primero las archivadas.
+
+        Si faltan entradas que el backend dice haber purgado y que no están en el
+        archivo (p. ej. un segmento borrado a mano), lanza `RuntimeError` en vez
+        de saltarlas: quien sincroniza cuenta posiciones y se desalinearía.
+        """
+        while True:
+            base = self.backend.purgadas()
+            if n >= base:
+                break
+            # Otro proceso puede haber compactado: las que purgó solo están en su versión del índice
+            self.archivo.actualizar()
+            inicio = n
+            for entrada in self.archivo.iterar_desde(n, limite=base):
+                yield entrada
+                n += 1
+            if n == inicio:
+                raise RuntimeError(f"Las entradas {n}-{base - 1} se purgaron del backend pero no están en el archivo")
+        yield from self.backend.iterar_desde(n - base)
+
+    def compactar(self, corte):
+        """Archivar y purgar las entradas más antiguas con timestamp anterior a `corte`. Devuelve cuántas"""
+        with self._lock:
+            self.actualizar()
+            base = self.backend.purgadas()
+            n = self.backend.purgables(corte)
+            if n == 0:
+                return 0
+            entradas = self.backend.iterar_desde(0)
+            try:
+                archivadas = self.archivo.agregar(itertools.islice(entradas, n), inicio=base)
+            finally:
+                entradas.close()
+            if archivadas != n:
+                raise RuntimeError(f"Se esperaban {n} entradas para archivar y se leyeron {archivadas}")
+            self.backend.purgar(base + n)
+            self.archivo.confirmar_purga()
+            return n
+
+    def exportar(self, destino, desde=None, hasta=None, intenciones=None):
+        """Escribir en `destino` (binario) un array JSON con las entradas que coinciden. Devuelve cuántas"""
+        intenciones = set(intenciones) if intenciones is not None else None
+        destino.write(b"[")
+        total = 0
+        for linea in self.archivo.consultar_lineas(desde, hasta, intenciones, limite=self.backend.purgadas()):
+            destino.write(b",\n" if total else b"\n")
+            destino.write(linea.rstrip(b"\n"))
+            total += 1
+        for entrada in self.backend.consultar(desde, hasta, intenciones):
+            destino.write(b",\n" if total else b"\n")
+            destino.write(json.dumps(entrada, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            total += 1
+        destino.write(b"\n]\n")
+        return total
+
+
+def ruta_archivo(tipo, directorio, ruta_sqlite=None):
+    """Directorio del archivo comprimido de un backend"""
+    if tipo == "sqlite":
+        return (ruta_sqlite or os.path.join(directorio, "chat_log.sqlite3")) + ".archivo"
+    return os.path.join(directorio, "archivo")
+
+
+def abrir_log(tipo, directorio, ruta_sqlite=None):
+    """Backend de log ("jsonl" o "sqlite") junto con su archivo comprimido"""
+    return LogConArchivado(crear_backend(tipo, directorio, ruta_sqlite),
+                           ArchivoLog(ruta_archivo(tipo, directorio, ruta_sqlite)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("accion", choices=("compactar", "exportar", "estado"))
+    parser.add_argument("--backend", default=os.getenv("MINDLY_LOG_BACKEND", "jsonl"))
+    parser.add_argument("--directorio", default="chat_logs")
+    parser.add_argument("--sqlite", default=os.getenv("MINDLY_LOG_SQLITE"))
+    parser.add_argument("--dias", type=int, default=30, help="compactar las entradas de más de N días")
+    parser.add_argument("--desde", help="timestamp ISO (incluido)")
+    parser.add_argument("--hasta", help="timestamp ISO (excluido)")
+    parser.add_argument("--intencion", action="append", help="repetible; por defecto todas")
+    parser.add_argument("--salida", help="archivo JSON de la exportación (por defecto, la salida estándar)")
+    args = parser.parse_args()
+
+    log = abrir_log(args.backend, args.directorio, args.sqlite).actualizar()
+    if args.accion == "compactar":
+        corte = (datetime.now() - timedelta(days=args.dias)).isoformat()
+        print(f"{log.compactar(corte)} entradas archivadas", file=sys.stderr)
+    elif args.accion == "exportar":
+        destino = open(args.salida, "wb") if args.salida else sys.stdout.buffer
+        try:
+            total = log.exportar(destino, args.desde, args.hasta, args.intencion)
+        finally:
+            if args.salida:
+                destino.close()
+        print(f"{total} entradas exportadas", file=sys.stderr)
+    print(json.dumps(log.archivo.estadisticas(), ensure_ascii=False), file=sys.stderr)
+    log.cerrar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PerfilArranque:
+    """Tiempos del arranque de un proceso, para el panel de administrador.
+
+    Las fases se miden solo la primera vez (la primera ejecución del script es
+    la que paga imports y recursos; las siguientes los reutilizan). Los módulos
+    pesados se importan dentro de `importando(...)` cuando hacen falta, y se anota
+    cuánto tardaron y si fue bajo demanda o en la precarga de segundo plano.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fases = {}
+        self._imports = {}
+        self._precarga = None
+
+    def registrar(self, fase, ms):
+        with self._lock:
+            self._fases.setdefault(fase, round(ms, 1))
+
+    @contextmanager
+    def fase(self, nombre):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nombre, (time.perf_counter() - inicio) * 1000)
+
+    @contextmanager
+    def importando(self, modulo, origen="bajo demanda"):
+        """Medir los imports del bloque si `modulo` aún no estaba cargado"""
+        cargado = modulo in sys.modules
+        inicio = time.perf_counter()
+        yield
+        if not cargado:
+            with self._lock:
+                self._imports.setdefault(modulo, {"ms": round((time.perf_counter() - inicio) * 1000, 1),
+                                                  "origen": origen})
+
+    def precargar(self, modulos):
+        """Importar `modulos` en un hilo de fondo (una vez por proceso), después del primer render"""
+        with self._lock:
+            if self._precarga is not None:
+                return
+            self._precarga = threading.Thread(target=self._precargar, args=(modulos,), daemon=True)
+        self._precarga.start()
+
+    def _precargar(self, modulos):
+        for modulo in modulos:
+            try:
+                with self.importando(modulo, "precarga"):
+                    importlib.import_module(modulo)
+            except ImportError:
+                pass  # se volverá a intentar (y a mostrar el error) cuando haga falta
+
+    def fases(self):
+        with self._lock:
+            return dict(self._fases)
+
+    def imports(self):
+        with self._lock:
+            return {modulo: dict(datos) for modulo, datos in self._imports.items()}
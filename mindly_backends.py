@@ -0,0 +1,353 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from mindly_indice import LectorLogIndexado
+from mindly_logstore import LogStore
+
+BACKENDS = ("jsonl", "sqlite")
+
+
+def coincide(entrada, desde=None, hasta=None, intenciones=None):
+    """Si la entrada cae en [desde, hasta) (timestamps ISO) y en una de `intenciones`"""
+    ts = entrada.get("timestamp") or ""
+    if desde is not None and ts < desde:
+        return False
+    if hasta is not None and ts >= hasta:
+        return False
+    return intenciones is None or entrada.get("intencion") in intenciones
+
+
+class BackendJSONL:
+    """Log en segmentos JSONL con índice incremental (mindly_logstore + mindly_indice).
+
+    Solo admite un proceso escritor; para varios procesos usar `BackendSQLite`.
+    La purga borra segmentos completos (un día o menos por segmento).
+    """
+
+    def __init__(self, directorio, **opciones_store):
+        self.store = LogStore(directorio, **opciones_store)
+        self.lector = LectorLogIndexado(self.store)
+        self.directorio = directorio
+
+    def agregar_lote(self, entradas):
+        self.store.agregar_lote(entradas)
+
+    def flush(self):
+        self.store.flush()
+
+    def cerrar(self):
+        self.store.cerrar()
+
+    def actualizar(self):
+        self.lector.actualizar()
+        return self
+
+    def contar(self):
+        return self.lector.contar()
+
+    def ultimo_timestamp(self):
+        return self.lector.ultimo_timestamp()
+
+    def conteo_intenciones(self):
+        return self.lector.conteo_intenciones()
+
+    def iterar_desde(self, n=0):
+        return self.lector.iterar_desde(n)
+
+    def purgadas(self):
+        return self.lector.purgadas()
+
+    def purgables(self, corte):
+        """Cuántas de las entradas más antiguas se pueden purgar: segmentos enteros anteriores a `corte`"""
+        self.actualizar()
+        n = 0
+        for ruta, entradas, ultimo in self.lector.segmentos_indexados():
+            if ruta == self.store.segmento_activo() or not ultimo or ultimo >= corte:
+                break
+            n += entradas
+        return n
+
+    def purgar(self, hasta):
+        """Borrar las entradas más antiguas hasta que haya `hasta` purgadas en total.
+
+        `hasta - purgadas()` tiene que cubrir segmentos completos (ver `purgables`).
+        Los archivos se borran antes de tocar el índice: si el proceso cae a
+        medias, el siguiente `actualizar()` cuenta como purgados los que faltan.
+        """
+        self.actualizar()
+        n = hasta - self.purgadas()
+        rutas, cubiertas = [], 0
+        for ruta, entradas, _ in self.lector.segmentos_indexados():
+            if cubiertas >= n:
+                break
+            rutas.append(ruta)
+            cubiertas += entradas
+        if cubiertas != max(n, 0) or self.store.segmento_activo() in rutas:
+            raise ValueError(f"No se pueden purgar {n} entradas sin partir un segmento")
+        for ruta in rutas:
+            os.remove(ruta)
+        self.actualizar()
+        return max(n, 0)
+
+    def consultar(self, desde=None, hasta=None, intenciones=None):
+        """Entradas en [desde, hasta) con alguna de `intenciones`; solo abre los segmentos de esos días"""
+        if intenciones is not None and not intenciones:
+            return
+        dia_desde = desde[:10].replace("-", "") if desde else None
+        dia_hasta = hasta[:10].replace("-", "") if hasta else None
+        for ruta in self.store.segmentos():
+            dia = os.path.basename(ruta).rsplit("-", 2)[1]
+            if (dia_desde and dia < dia_desde) or (dia_hasta and dia > dia_hasta):
+                continue
+            with open(ruta, "r", encoding="utf-8") as f:
+                for linea in f:
+                    if linea.strip():
+                        entrada = json.loads(linea)
+                        if coincide(entrada, desde, hasta, intenciones):
+                            yield entrada
+
+
+class BackendSQLite:
+    """Log en una base SQLite en modo WAL, compartible entre varios procesos.
+
+    Cada lote se inserta con `executemany` en una sola transacción (`BEGIN
+    IMMEDIATE`), así que los escritores de distintos procesos se turnan sin
+    perder entradas y los lectores no se bloquean. Hay índices por timestamp e
+    intención para las estadísticas y las consultas. Las conexiones salen de un
+    pool de como mucho `max_conexiones`, compartido por todos los hilos (cada
+    rerun de Streamlit corre en un hilo nuevo); una iteración la retiene hasta
+    terminar. El número de entradas purgadas se guarda en la tabla `meta`, en
+    la misma transacción que las borra. Las bases nuevas se crean con
+    `auto_vacuum=INCREMENTAL`, así la purga devuelve el espacio por tandas cortas
+    en lugar de un VACUUM que bloquea a los escritores.
+    """
+
+    def __init__(self, ruta, timeout=30.0, tam_pagina_lectura=1000, max_conexiones=4):
+        self.ruta = ruta
+        self.timeout = timeout
+        self.tam_pagina_lectura = tam_pagina_lectura
+        self.max_conexiones = max_conexiones
+        self.directorio = os.path.dirname(os.path.abspath(ruta))
+        os.makedirs(self.directorio, exist_ok=True)
+        self._cond = threading.Condition()
+        self._libres = []
+        self._abiertas = 0
+        self._cerrado = False
+        with self._conexion() as conexion:
+            conexion.executescript("""
+                CREATE TABLE IF NOT EXISTS logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT,
+                    intencion TEXT,
+                    entrada TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS logs_timestamp ON logs(timestamp);
+                CREATE INDEX IF NOT EXISTS logs_intencion ON logs(intencion);
+                CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor INTEGER NOT NULL);
+            """)
+
+    @property
+    def conexiones_abiertas(self):
+        with self._cond:
+            return self._abiertas
+
+    def agregar_lote(self, entradas):
+        filas = [(e.get("timestamp"), e.get("intencion"), json.dumps(e, ensure_ascii=False)) for e in entradas]
+        if not filas:
+            return
+        with self._conexion() as conexion:
+            self._empezar_escritura(conexion)
+            try:
+                conexion.executemany("INSERT INTO logs (timestamp, intencion, entrada) VALUES (?, ?, ?)", filas)
+                conexion.execute("COMMIT")
+            except BaseException:
+                conexion.execute("ROLLBACK")
+                raise
+
+    def _empezar_escritura(self, conexion):
+        inicio = time.monotonic()
+        while True:
+            try:
+                conexion.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                # busy_timeout ya espera; esto cubre el caso de "database is locked" al promocionar el bloqueo
+                if "locked" not in str(e) or time.monotonic() - inicio > self.timeout:
+                    raise
+                time.sleep(0.01)
+
+    def flush(self):
+        # Cada lote ya queda confirmado en el WAL al hacer COMMIT
+        pass
+
+    def cerrar(self):
+        """Cerrar las conexiones libres; las que están en uso se cierran al devolverse"""
+        with self._cond:
+            libres, self._libres = self._libres, []
+            self._abiertas -= len(libres)
+            self._cerrado = True
+            self._cond.notify_all()
+        for conexion in libres:
+            conexion.close()
+
+    def actualizar(self):
+        return self
+
+    def contar(self):
+        with self._conexion() as conexion:
+            return conexion.execute("SELECT count(*) FROM logs").fetchone()[0]
+
+    def ultimo_timestamp(self):
+        with self._conexion() as conexion:
+            return conexion.execute("SELECT max(timestamp) FROM logs").fetchone()[0]
+
+    def conteo_intenciones(self):
+        with self._conexion() as conexion:
+            filas = conexion.execute(
+                "SELECT coalesce(nullif(intencion, ''), 'intencion_desconocida') AS i, count(*) FROM logs GROUP BY i")
+            return {intencion: n for intencion, n in filas}
+
+    def iterar_desde(self, n=0):
+        """Iterar las entradas a partir de la n-ésima (0 = todas), en orden de inserción"""
+        with self._conexion() as conexion:
+            fila = conexion.execute("SELECT id FROM logs ORDER BY id LIMIT 1 OFFSET ?", (n,)).fetchone()
+            if fila is None:
+                return
+            ultimo = fila[0] - 1
+            while True:
+                # Paginación por id: cada página es una búsqueda en el índice de la clave primaria
+                filas = conexion.execute("SELECT id, entrada FROM logs WHERE id > ? ORDER BY id LIMIT ?",
+                                         (ultimo, self.tam_pagina_lectura)).fetchall()
+                if not filas:
+                    return
+                for ultimo, entrada in filas:
+                    yield json.loads(entrada)
+
+    def purgadas(self):
+        with self._conexion() as conexion:
+            fila = conexion.execute("SELECT valor FROM meta WHERE clave = 'purgadas'").fetchone()
+        return fila[0] if fila else 0
+
+    def purgables(self, corte):
+        """Cuántas de las entradas más antiguas (por orden de inserción) son anteriores a `corte`"""
+        with self._conexion() as conexion:
+            return conexion.execute("""
+                SELECT count(*) FROM logs WHERE id < coalesce(
+                    (SELECT min(id) FROM logs WHERE timestamp IS NULL OR timestamp >= ?),
+                    (SELECT max(id) + 1 FROM logs))
+            """, (corte,)).fetchone()[0]
+
+    def purgar(self, hasta):
+        """Borrar las entradas más antiguas hasta que haya `hasta` purgadas en total.
+
+        Es idempotente: si otro proceso ya purgó, no borra nada más.
+        """
+        with self._conexion() as conexion:
+            self._empezar_escritura(conexion)
+            try:
+                fila = conexion.execute("SELECT valor FROM meta WHERE clave = 'purgadas'").fetchone()
+                n = hasta - (fila[0] if fila else 0)
+                if n > 0:
+                    conexion.execute("DELETE FROM logs WHERE id IN (SELECT id FROM logs ORDER BY id LIMIT ?)", (n,))
+                    conexion.execute("INSERT INTO meta (clave, valor) VALUES ('purgadas', ?) "
+                                     "ON CONFLICT(clave) DO UPDATE SET valor = valor + excluded.valor", (n,))
+                conexion.execute("COMMIT")
+            except BaseException:
+                conexion.execute("ROLLBACK")
+                raise
+            if n > 0:
+                self._liberar_paginas(conexion)
+        return max(n, 0)
+
+    def _liberar_paginas(self, conexion, paginas_por_tanda=1000):
+        """Devolver al sistema las páginas libres tras una purga.
+
+        Cada `incremental_vacuum` es una transacción corta, así que los escritores
+        se cuelan entre tandas. En bases creadas sin `auto_vacuum` no hace nada y
+        las páginas libres se reutilizan en las siguientes inserciones.
+        """
+        if conexion.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:  # 2 = INCREMENTAL
+            return
+        while conexion.execute("PRAGMA freelist_count").fetchone()[0]:
+            conexion.execute(f"PRAGMA incremental_vacuum({paginas_por_tanda})").fetchall()
+        conexion.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def consultar(self, desde=None, hasta=None, intenciones=None):
+        """Entradas en [desde, hasta) con alguna de `intenciones`, usando los índices de la tabla"""
+        if intenciones is not None and not intenciones:
+            return
+        condiciones, parametros = [], []
+        if desde is not None:
+            condiciones.append("timestamp >= ?")
+            parametros.append(desde)
+        if hasta is not None:
+            condiciones.append("timestamp < ?")
+            parametros.append(hasta)
+        if intenciones is not None:
+            condiciones.append(f"intencion IN ({', '.join('?' * len(intenciones))})")
+            parametros.extend(intenciones)
+        donde = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        with self._conexion() as conexion:
+            for (entrada,) in conexion.execute(f"SELECT entrada FROM logs {donde} ORDER BY id", parametros):
+                yield json.loads(entrada)
+
+    @contextmanager
+    def _conexion(self):
+        conexion = self._tomar()
+        try:
+            yield conexion
+        finally:
+            self._devolver(conexion)
+
+    def _tomar(self):
+        limite = time.monotonic() + self.timeout
+        with self._cond:
+            while not self._libres and self._abiertas >= self.max_conexiones:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise sqlite3.OperationalError(f"Ninguna de las {self.max_conexiones} conexiones quedó libre")
+                self._cond.wait(restante)
+            if self._libres:
+                return self._libres.pop()
+            self._abiertas += 1
+        try:
+            return self._abrir()
+        except BaseException:
+            with self._cond:
+                self._abiertas -= 1
+                self._cond.notify()
+            raise
+
+    def _devolver(self, conexion):
+        if conexion.in_transaction:
+            conexion.execute("ROLLBACK")  # una iteración abandonada a medias no debe dejar nada abierto
+        with self._cond:
+            if not self._cerrado:
+                self._libres.append(conexion)
+                self._cond.notify()
+                return
+            self._abiertas -= 1
+            self._cond.notify()
+        conexion.close()
+
+    def _abrir(self):
+        conexion = sqlite3.connect(self.ruta, timeout=self.timeout, isolation_level=None,
+                                   check_same_thread=False)
+        conexion.execute("PRAGMA auto_vacuum=INCREMENTAL")  # solo cuenta al crear la base, antes del WAL
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.execute("PRAGMA synchronous=NORMAL")
+        conexion.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        return conexion
+
+
+def crear_backend(tipo, directorio, ruta_sqlite=None):
+    """Backend de log según la configuración ("jsonl" o "sqlite")"""
+    if tipo == "jsonl":
+        return BackendJSONL(directorio)
+    if tipo == "sqlite":
+        return BackendSQLite(ruta_sqlite or os.path.join(directorio, "chat_log.sqlite3"))
+    raise ValueError(f"Backend de log desconocido: {tipo} (opciones: {', '.join(BACKENDS)})")
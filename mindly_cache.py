@@ -0,0 +1,212 @@
+import hashlib
+import math
+import re
+import sys
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+
+# Un "no" cambia el sentido de la frase aunque apenas cambie el coseno
+NEGACIONES = frozenset("no ni nunca jamas tampoco nada nadie ningun ninguna ninguno sin".split())
+# Primera persona y vocabulario emocional: el mensaje habla del usuario, su respuesta no se comparte
+MARCAS_PERSONALES = frozenset("""
+yo mi mis mio mia mios mias conmigo nos nuestro nuestra nuestros nuestras
+estoy estaba estuve siento sentia senti tengo tenia soy era fui llamo vivo trabajo
+marido mujer esposo esposa pareja novio novia hijo hija hijos madre padre familia jefe
+triste tristeza solo sola llorar lloro miedo ansiedad ansioso ansiosa depresion deprimido deprimida
+estres estresado estresada angustia angustiado angustiada pega pegan maltrato abuso suicidio morir
+""".split())
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes, sin signos de puntuación y con espacios colapsados"""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"[^\w\s]", " ", texto)
+    return " ".join(texto.split())
+
+
+def contenido_personal(texto_normalizado):
+    """Si el mensaje (ya normalizado) habla del propio usuario o de cómo se siente"""
+    return not MARCAS_PERSONALES.isdisjoint(texto_normalizado.split())
+
+
+def _negaciones(texto_normalizado):
+    return frozenset(p for p in texto_normalizado.split() if p in NEGACIONES)
+
+
+def _terminos(texto_normalizado):
+    """Palabras más trigramas de caracteres, para tolerar erratas y variaciones"""
+    terminos = Counter(texto_normalizado.split())
+    relleno = f" {texto_normalizado} "
+    terminos.update("#" + relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return terminos
+
+
+class _Entrada:
+    __slots__ = ("respuesta", "creada", "latencia_ms", "terminos", "negaciones", "contexto", "bytes")
+
+    def __init__(self, respuesta, latencia_ms, terminos, negaciones, contexto, tam):
+        self.respuesta = respuesta
+        self.creada = time.monotonic()
+        self.latencia_ms = latencia_ms
+        self.terminos = terminos
+        self.negaciones = negaciones
+        self.contexto = contexto
+        self.bytes = tam
+
+
+class CacheRespuestas:
+    """Caché de respuestas del modelo con dos niveles.
+
+    - Exacto: clave = prompt normalizado + system message + últimos
+      `turnos_contexto` mensajes del historial.
+    - Similitud (opcional): entre las entradas con el mismo contexto, la de mayor
+      coseno TF-IDF (palabras + trigramas) si supera `umbral_similitud` y tiene
+      las mismas negaciones.
+
+    Solo se comparten entre sesiones las respuestas a prompts para los que
+    `compartible` devuelve True y que no tienen contenido personal; las demás
+    se guardan en el ámbito de su sesión y solo admiten acierto exacto.
+    Las entradas caducan a los `ttl` segundos y se expulsan por LRU cuando se
+    supera `max_entradas` o `max_bytes`. Los prompts para los que `excluir`
+    devuelve True nunca se guardan ni se sirven desde la caché.
+    """
+
+    def __init__(self, ttl=3600, max_entradas=1000, max_bytes=8 * 1024 * 1024,
+                 similitud=True, umbral_similitud=0.75, turnos_contexto=2, excluir=None, compartible=None):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.similitud = similitud
+        self.umbral_similitud = umbral_similitud
+        self.turnos_contexto = turnos_contexto
+        self.excluir = excluir
+        self.compartible = compartible
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+        self._por_contexto = {}
+        self._df = Counter()
+        self._bytes = 0
+        self._stats = {"aciertos_exactos": 0, "aciertos_similares": 0, "fallos": 0,
+                       "excluidas": 0, "ms_ahorrados": 0.0}
+
+    def ambito(self, prompt, norm, sesion_id):
+        """"compartida" si la respuesta puede servirse a cualquier sesión, si no el id de la sesión (o None)"""
+        if self.compartible is not None and self.compartible(prompt) and not contenido_personal(norm):
+            return "compartida"
+        return sesion_id
+
+    def clave_contexto(self, system_message, history, ambito="compartida"):
+        h = hashlib.sha1(ambito.encode("utf-8") + b"\0" + system_message.encode("utf-8"))
+        if self.turnos_contexto:
+            for m in history[-self.turnos_contexto:]:
+                h.update(b"\0" + m["role"].encode() + b"\0" + normalizar(m["content"]).encode("utf-8"))
+        return h.hexdigest()
+
+    def buscar(self, prompt, system_message, history, sesion_id=None):
+        """Devolver la respuesta cacheada o None"""
+        inicio = time.perf_counter()
+        norm = normalizar(prompt)
+        ambito = self.ambito(prompt, norm, sesion_id)
+        if ambito is None or (self.excluir and self.excluir(prompt)):
+            with self._lock:
+                self._stats["excluidas"] += 1
+            return None
+
+        contexto = self.clave_contexto(system_message, history, ambito)
+        with self._lock:
+            entrada = self._vigente((contexto, norm))
+            tipo = "aciertos_exactos"
+            if entrada is None and self.similitud and ambito == "compartida":
+                entrada = self._mas_similar(contexto, _terminos(norm), _negaciones(norm))
+                tipo = "aciertos_similares"
+            if entrada is None:
+                self._stats["fallos"] += 1
+                return None
+            self._stats[tipo] += 1
+            coste_ms = (time.perf_counter() - inicio) * 1000
+            self._stats["ms_ahorrados"] += max(entrada.latencia_ms - coste_ms, 0.0)
+            return entrada.respuesta
+
+    def guardar(self, prompt, system_message, history, respuesta, latencia_ms, sesion_id=None):
+        norm = normalizar(prompt)
+        ambito = self.ambito(prompt, norm, sesion_id)
+        if ambito is None or (self.excluir and self.excluir(prompt)):
+            return
+        contexto = self.clave_contexto(system_message, history, ambito)
+        terminos = _terminos(norm)
+        tam = (sys.getsizeof(respuesta) + sys.getsizeof(norm)
+               + sum(sys.getsizeof(t) + 32 for t in terminos) + 200)
+        clave = (contexto, norm)
+        with self._lock:
+            if clave in self._entradas:
+                self._quitar(clave)
+            self._entradas[clave] = _Entrada(respuesta, latencia_ms, terminos, _negaciones(norm), contexto, tam)
+            self._por_contexto.setdefault(contexto, set()).add(clave)
+            self._df.update(terminos.keys())
+            self._bytes += tam
+            while self._entradas and (len(self._entradas) > self.max_entradas
+                                      or self._bytes > self.max_bytes):
+                self._quitar(next(iter(self._entradas)))
+
+    def estadisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entradas"] = len(self._entradas)
+            stats["bytes"] = self._bytes
+        consultas = stats["aciertos_exactos"] + stats["aciertos_similares"] + stats["fallos"]
+        stats["tasa_aciertos"] = (
+            (stats["aciertos_exactos"] + stats["aciertos_similares"]) / consultas if consultas else 0.0
+        )
+        return stats
+
+    def _vigente(self, clave):
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            return None
+        if time.monotonic() - entrada.creada > self.ttl:
+            self._quitar(clave)
+            return None
+        self._entradas.move_to_end(clave)
+        return entrada
+
+    def _mas_similar(self, contexto, terminos, negaciones):
+        candidatos = self._por_contexto.get(contexto)
+        if not candidatos:
+            return None
+        n = len(self._entradas) + 1
+        idf = lambda t: math.log(n / (1 + self._df.get(t, 0))) + 1.0
+        consulta = {t: f * idf(t) for t, f in terminos.items()}
+        norma_consulta = math.sqrt(sum(w * w for w in consulta.values()))
+        if not norma_consulta:
+            return None
+
+        mejor, mejor_sim = None, self.umbral_similitud
+        for clave in list(candidatos):
+            entrada = self._entradas[clave]
+            if entrada.negaciones != negaciones:
+                continue
+            pesos = {t: f * idf(t) for t, f in entrada.terminos.items()}
+            norma = math.sqrt(sum(w * w for w in pesos.values()))
+            if not norma:
+                continue
+            producto = sum(w * pesos.get(t, 0.0) for t, w in consulta.items())
+            sim = producto / (norma * norma_consulta)
+            if sim >= mejor_sim:
+                mejor, mejor_sim = clave, sim
+        return self._vigente(mejor) if mejor else None
+
+    def _quitar(self, clave):
+        entrada = self._entradas.pop(clave)
+        self._bytes -= entrada.bytes
+        for t in entrada.terminos:
+            self._df[t] -= 1
+            if self._df[t] <= 0:
+                del self._df[t]
+        claves = self._por_contexto.get(entrada.contexto)
+        if claves:
+            claves.discard(clave)
+            if not claves:
+                del self._por_contexto[entrada.contexto]
@@ -0,0 +1,221 @@
+import time
+from contextlib import nullcontext
+
+from mindly_contexto import contar_tokens, tokens_mensajes
+from mindly_intencion import detectar_intencion
+from mindly_planificador import LimiteEsperaExcedido
+
+MODELO_LOCAL = "base_conocimiento"  # valor de metricas["modelo"] cuando responde la base de conocimiento
+
+
+def mensaje_error(e):
+    """Traducir una excepción de Mistral a un mensaje amable para el usuario"""
+    error_msg = str(e)
+    if isinstance(e, LimiteEsperaExcedido):
+        return "⏳ Hemos alcanzado el límite de solicitudes. Por favor, espera unos minutos y vuelve a intentarlo."
+    elif isinstance(e, TimeoutError):
+        return "⌛ Mistral está tardando demasiado en responder. Por favor, inténtalo de nuevo en unos momentos."
+    elif "401" in error_msg or "unauthorized" in error_msg.lower() or "illegal header value" in error_msg.lower():
+        return "❌ Lo siento, no puedo procesar tu solicitud ahora. La clave de API de Mistral es incorrecta. Si eres el administrador, por favor revisa la configuración."
+    elif "429" in error_msg or "rate limit" in error_msg.lower():
+        return "⏳ Hemos alcanzado el límite de solicitudes. Por favor, espera unos minutos y vuelve a intentarlo."
+    elif "400" in error_msg or "bad request" in error_msg.lower():
+        return "⚠️ Hubo un problema con la solicitud. Tal vez el mensaje era muy largo. ¿Podrías intentar una versión más corta?"
+    elif "500" in error_msg or "internal server error" in error_msg.lower():
+        return "🔧 Ups, parece que Mistral está teniendo problemas técnicos. Por favor, intenta de nuevo en unos momentos."
+    else:
+        return f"❌ Ha ocurrido un error inesperado. Por favor, revisa tu conexión a internet e inténtalo de nuevo."
+
+
+def _texto_delta(evento):
+    """Extraer el texto incremental de un evento del stream de Mistral"""
+    choices = evento.data.choices
+    if not choices:
+        return ""
+    contenido = choices[0].delta.content
+    if not contenido:
+        return ""
+    if isinstance(contenido, str):
+        return contenido
+    return "".join(getattr(parte, "text", "") or "" for parte in contenido)
+
+
+def _tokens_respuesta(metricas, uso):
+    if uso is not None and getattr(uso, "completion_tokens", None) is not None:
+        metricas["tokens_respuesta"] = uso.completion_tokens
+
+
+def en_conversacion(message, history):
+    """Si hay turnos anteriores al mensaje actual (el historial puede incluirlo ya al final)"""
+    previos = len(history) if history else 0
+    if previos and history[-1]["role"] == "user" and history[-1]["content"] == message:
+        previos -= 1
+    return previos > 0
+
+
+class MotorChat:
+    """Camino completo de una respuesta del modelo, sin nada de Streamlit.
+
+    Construye el contexto, elige modelo con el enrutador, pasa por el
+    planificador y aplica plazo y cobertura. Lo usan la app (un motor por
+    proceso) y el replay offline de mindly_replay.py, así los dos miden lo mismo.
+    `obtener_cliente()` devuelve el cliente de Mistral y solo se llama al enviar
+    una petición, de modo que el SDK no se carga hasta el primer turno.
+
+    Con una `conocimiento` (mindly_conocimiento.BaseConocimiento), los mensajes
+    de `intenciones_conocimiento` se buscan antes en ella: una coincidencia
+    segura se responde sin llamar al modelo y una parcial añade sus pasajes al
+    system message. A mitad de una conversación nunca se responde directamente,
+    porque el mensaje puede depender de lo anterior; como mucho se añaden pasajes.
+    """
+
+    def __init__(self, obtener_cliente, enrutador, planificador, cobertura, constructor, registro=None,
+                 plazo_s=60.0, tokens_respuesta_estimados=500, conocimiento=None,
+                 intenciones_conocimiento=("consulta_tecnica",)):
+        self.obtener_cliente = obtener_cliente
+        self.enrutador = enrutador
+        self.planificador = planificador
+        self.cobertura = cobertura
+        self.constructor = constructor
+        self.registro = registro
+        self.plazo_s = plazo_s
+        self.tokens_respuesta_estimados = tokens_respuesta_estimados
+        self.conocimiento = conocimiento
+        self.intenciones_conocimiento = set(intenciones_conocimiento)
+
+    def _medir(self, etapa):
+        return self.registro.medir(etapa) if self.registro else nullcontext()
+
+    def construir_mensajes(self, message, history, system_message, resumen=None):
+        with self._medir("contexto"):
+            return self.constructor.construir(message, history, system_message, resumen)
+
+    def _preparar(self, message, history, system_message, resumen, intencion, metricas):
+        """(respuesta directa de la base de conocimiento o None, mensajes para el modelo, intención)"""
+        intencion = intencion or detectar_intencion(message)
+        if self.conocimiento is not None and intencion in self.intenciones_conocimiento:
+            with self._medir("conocimiento"):
+                resultado = self.conocimiento.consultar(
+                    message, directa_permitida=not en_conversacion(message, history))
+            metricas["conocimiento"] = resultado.tipo
+            if resultado.tipo == "directa":
+                metricas["modelo"] = MODELO_LOCAL
+                metricas["tokens_prompt"] = 0
+                return resultado.documentos[0][0]["respuesta"], None, intencion
+            if resultado.tipo == "pasajes":
+                bloque = self.conocimiento.bloque_pasajes(resultado)
+                if bloque:
+                    system_message = f"{system_message}\n\n{bloque}"
+        messages = self.construir_mensajes(message, history, system_message, resumen)
+        metricas["tokens_prompt"] = tokens_mensajes(messages)
+        return None, messages, intencion
+
+    def _llamada(self, peticion, cadena, intencion, sesion_id, tokens_prompt, metricas, extraer):
+        """Fragmentos de texto de `peticion(modelo)` con plazo y, si tarda, una petición de cobertura.
+
+        La principal recorre la cadena de respaldo del enrutador (solo cambia de
+        modelo si falla antes de empezar a recibir tokens); la de cobertura usa el
+        modelo más rápido de la cadena. Cada una pasa por el planificador con sus
+        propias métricas y al final se copian las de la que ganó.
+        """
+        metricas = {} if metricas is None else metricas
+        propias = {"principal": {}, "cobertura": {}}
+
+        def lanzar(cadena_modelos, nombre):
+            def llamar():
+                resultado, _ = self.enrutador.ejecutar(
+                    cadena_modelos,
+                    lambda modelo: self.planificador.ejecutar(
+                        sesion_id,
+                        lambda: peticion(modelo),
+                        tokens_estimados=tokens_prompt + self.tokens_respuesta_estimados,
+                        metricas=propias[nombre]
+                    ),
+                    propias[nombre]
+                )
+                return resultado
+            return llamar
+
+        try:
+            yield from self.cobertura.ejecutar(
+                lanzar(cadena, "principal"),
+                lanzar([self.enrutador.modelo_cobertura(intencion, cadena)], "cobertura"),
+                extraer=extraer,
+                metricas=metricas
+            )
+        finally:
+            metricas.update(propias["cobertura"] if metricas.get("cobertura_ganada") else propias["principal"])
+
+    def chat(self, message, history, system_message, metricas=None, resumen=None, sesion_id=None, intencion=None):
+        inicio = time.perf_counter()
+        metricas_llamada = {} if metricas is None else metricas
+        try:
+            directa, messages, intencion = self._preparar(message, history, system_message, resumen,
+                                                          intencion, metricas_llamada)
+            if directa is not None:
+                return directa
+            tokens_prompt = metricas_llamada["tokens_prompt"]
+            cadena = self.enrutador.elegir(intencion, tokens_prompt)
+            client = self.obtener_cliente()
+            peticion = lambda modelo: [client.chat.complete(model=modelo, messages=messages,
+                                                            timeout_ms=int(self.plazo_s * 1000))]
+
+            def extraer(response):
+                _tokens_respuesta(metricas_llamada, response.usage)
+                return response.choices[0].message.content
+
+            respuesta = "".join(self._llamada(peticion, cadena, intencion, sesion_id, tokens_prompt,
+                                              metricas_llamada, extraer))
+            metricas_llamada.setdefault("tokens_respuesta", contar_tokens(respuesta))
+            return respuesta
+
+        except Exception as e:
+            metricas_llamada["error"] = True
+            return mensaje_error(e)
+        finally:
+            metricas_llamada["duracion_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+
+    def chat_stream(self, message, history, system_message, metricas, resumen=None, sesion_id=None, intencion=None):
+        """Generar la respuesta token a token.
+
+        Rellena `metricas` con `ttft_ms` (tiempo hasta el primer token) y
+        `duracion_ms`, y deja el texto completo en `metricas["respuesta"]`.
+        Si el stream falla, a mitad o al inicio, se emite el mensaje de error amable.
+        """
+        inicio = time.perf_counter()
+        partes = []
+        try:
+            directa, messages, intencion = self._preparar(message, history, system_message, resumen,
+                                                          intencion, metricas)
+            if directa is not None:
+                metricas["ttft_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+                partes.append(directa)
+                yield directa
+                return
+            cadena = self.enrutador.elegir(intencion, metricas["tokens_prompt"])
+            client = self.obtener_cliente()
+            peticion = lambda modelo: client.chat.stream(model=modelo, messages=messages,
+                                                         timeout_ms=int(self.plazo_s * 1000))
+
+            def extraer(evento):
+                # El último evento del stream trae el uso de tokens
+                _tokens_respuesta(metricas, getattr(evento.data, "usage", None))
+                return _texto_delta(evento)
+
+            for texto in self._llamada(peticion, cadena, intencion, sesion_id, metricas["tokens_prompt"],
+                                       metricas, extraer):
+                if "ttft_ms" not in metricas:
+                    metricas["ttft_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+                partes.append(texto)
+                yield texto
+            metricas.setdefault("tokens_respuesta", contar_tokens("".join(partes)))
+        except Exception as e:
+            error = mensaje_error(e)
+            if partes:
+                error = "\n\n" + error
+            partes.append(error)
+            metricas["error"] = True
+            yield error
+        finally:
+            metricas["duracion_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+            metricas["respuesta"] = "".join(partes)
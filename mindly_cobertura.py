@@ -0,0 +1,243 @@
+import queue
+import threading
+import time
+from collections import deque
+
+
+def percentil(valores, p):
+    """Percentil `p` (0-1) por el método del rango más cercano"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = min(max(int(round(p * len(ordenados) + 0.5)) - 1, 0), len(ordenados) - 1)
+    return ordenados[indice]
+
+
+class _Intento(threading.Thread):
+    """Una petición al modelo en su propio hilo; publica sus eventos en una cola compartida"""
+
+    def __init__(self, nombre, lanzar, extraer, cola):
+        super().__init__(name=f"mindly-{nombre}", daemon=True)
+        self.nombre = nombre
+        self.lanzar = lanzar
+        self.extraer = extraer
+        self.cola = cola
+        self.cancelado = threading.Event()
+        self.primer_token = None
+        self._fuente = None
+        self._lock = threading.Lock()
+        self._al_medir = None
+        self._temporizador = None
+
+    def run(self):
+        try:
+            self._fuente = self.lanzar()
+            for evento in self._fuente:
+                if self.cancelado.is_set():
+                    break
+                texto = self.extraer(evento)
+                if texto:
+                    if self.primer_token is None:
+                        self.primer_token = time.perf_counter()
+                    if self._al_medir is not None:
+                        self._medir(self.primer_token)
+                        break
+                    self.cola.put((self, "token", texto))
+            self.cola.put((self, "fin", None))
+        except Exception as e:
+            if not self.cancelado.is_set():
+                self.cola.put((self, "error", e))
+        finally:
+            self._dejar_de_vigilar()
+            self._cerrar()
+
+    def cancelar(self):
+        self.cancelado.set()
+        self._cerrar()
+
+    def vigilar(self, al_medir, plazo_s):
+        """Dejar correr el intento solo hasta su primer token para medirlo.
+
+        `al_medir` recibe el momento del primer token; si no llega en `plazo_s`
+        se cancela y recibe el momento del corte (un valor censurado).
+        """
+        with self._lock:
+            self._al_medir = al_medir
+            self._temporizador = threading.Timer(max(plazo_s, 0.0), lambda: self._medir(time.perf_counter()))
+            self._temporizador.daemon = True
+            self._temporizador.start()
+        if self.primer_token is not None:
+            self._medir(self.primer_token)
+
+    def _medir(self, momento):
+        with self._lock:
+            al_medir, self._al_medir = self._al_medir, None
+            temporizador, self._temporizador = self._temporizador, None
+        if al_medir is None:
+            return
+        if temporizador is not None:
+            temporizador.cancel()
+        self.cancelar()
+        al_medir(momento)
+
+    def _dejar_de_vigilar(self):
+        # Terminó o falló sin dar ningún token: no hay latencia que medir
+        with self._lock:
+            self._al_medir = None
+            temporizador, self._temporizador = self._temporizador, None
+        if temporizador is not None:
+            temporizador.cancel()
+
+    def _cerrar(self):
+        # Cerrar la respuesta HTTP interrumpe también una lectura bloqueada del stream
+        respuesta = getattr(self._fuente, "response", None)
+        if respuesta is not None:
+            try:
+                respuesta.close()
+            except Exception:
+                pass
+
+
+class CoberturaLLM:
+    """Peticiones al modelo con plazo máximo y cobertura (hedging) opcional.
+
+    Si el intento principal no ha dado su primer token pasado el umbral (el
+    percentil `percentil` de los tiempos hasta el primer token del intento
+    principal, o `umbral_por_defecto_s` mientras haya menos de `min_muestras`),
+    se lanza un segundo intento, normalmente con un modelo más rápido. Gana el
+    primero que produce un token, porque a partir de ahí la respuesta ya se está
+    mostrando, y el otro se cancela. Si no hay respuesta completa en `plazo_total_s` se lanza
+    `TimeoutError`.
+
+    Para comparar la cola de latencias con y sin cobertura se guardan dos
+    series: la latencia efectiva hasta el primer token y la del intento
+    principal. Cuando gana la cobertura, el principal sigue vivo (sin mostrarse)
+    hasta su propio primer token para medirlo; si no llega antes del plazo total
+    se cancela y cuenta el plazo, que es una cota inferior. El umbral sale solo
+    de la serie del principal: la efectiva ya está recortada por las coberturas
+    y, si se usara, cada cobertura adelantaría la siguiente.
+    """
+
+    def __init__(self, plazo_total_s=60.0, activa=True, umbral_por_defecto_s=5.0, percentil=0.95,
+                 min_muestras=20, ventana=500):
+        self.plazo_total_s = plazo_total_s
+        self.activa = activa
+        self.umbral_por_defecto_s = umbral_por_defecto_s
+        self.percentil = percentil
+        self.min_muestras = min_muestras
+        self._lock = threading.Lock()
+        self._efectiva_ms = deque(maxlen=ventana)
+        self._principal_ms = deque(maxlen=ventana)
+        self._stats = {"turnos": 0, "coberturas_lanzadas": 0, "coberturas_ganadas": 0, "plazos_agotados": 0}
+
+    def umbral_s(self):
+        with self._lock:
+            muestras = list(self._principal_ms)
+        if len(muestras) < self.min_muestras:
+            return self.umbral_por_defecto_s
+        return percentil(muestras, self.percentil) / 1000
+
+    def ejecutar(self, lanzar, lanzar_cobertura=None, extraer=lambda evento: evento, metricas=None):
+        """Generar los fragmentos de texto del intento ganador.
+
+        `lanzar` y `lanzar_cobertura` devuelven un iterable de eventos (p. ej. el
+        stream del SDK); `extraer` convierte cada evento en texto.
+        """
+        inicio = time.perf_counter()
+        limite = inicio + self.plazo_total_s
+        momento_cobertura = inicio + self.umbral_s() if (self.activa and lanzar_cobertura) else None
+        cola = queue.Queue()
+        principal = _Intento("principal", lanzar, extraer, cola)
+        principal.start()
+        activos = [principal]
+        ganador = None
+        with self._lock:
+            self._stats["turnos"] += 1
+
+        try:
+            while True:
+                ahora = time.perf_counter()
+                if ahora >= limite:
+                    with self._lock:
+                        self._stats["plazos_agotados"] += 1
+                    if ganador is None:
+                        self._registrar(principal_ms=(ahora - inicio) * 1000)
+                    raise TimeoutError(f"Sin respuesta completa del modelo en {self.plazo_total_s:.0f} s")
+                if ganador is None and momento_cobertura is not None and ahora >= momento_cobertura:
+                    momento_cobertura = None
+                    cobertura = _Intento("cobertura", lanzar_cobertura, extraer, cola)
+                    cobertura.start()
+                    activos.append(cobertura)
+                    with self._lock:
+                        self._stats["coberturas_lanzadas"] += 1
+                    if metricas is not None:
+                        metricas["cobertura"] = True
+
+                espera = limite - ahora
+                if ganador is None and momento_cobertura is not None:
+                    espera = min(espera, momento_cobertura - ahora)
+                try:
+                    intento, tipo, valor = cola.get(timeout=max(espera, 0.001))
+                except queue.Empty:
+                    continue
+
+                if ganador is None:
+                    if tipo == "error":
+                        activos.remove(intento)
+                        if not activos:
+                            raise valor
+                        continue
+                    ganador = intento
+                    self._elegir(ganador, activos, inicio, limite, metricas)
+                if intento is not ganador:
+                    continue
+                if tipo == "token":
+                    yield valor
+                elif tipo == "fin":
+                    return
+                else:
+                    raise valor
+        finally:
+            for intento in activos:
+                if intento is not ganador or intento.is_alive():
+                    intento.cancelar()
+
+    def estadisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+            efectiva, principal = list(self._efectiva_ms), list(self._principal_ms)
+        for nombre, serie in (("efectiva", efectiva), ("sin_cobertura", principal)):
+            for p in (50, 95, 99):
+                stats[f"{nombre}_p{p}_ms"] = percentil(serie, p / 100)
+        stats["umbral_ms"] = self.umbral_s() * 1000
+        return stats
+
+    def _elegir(self, ganador, activos, inicio, limite, metricas):
+        ahora = time.perf_counter()
+        transcurrido_ms = (ahora - inicio) * 1000
+        for intento in activos:
+            if intento is ganador:
+                continue
+            if intento.nombre == "principal":
+                intento.vigilar(lambda momento: self._registrar(principal_ms=(momento - inicio) * 1000),
+                                limite - ahora)
+            else:
+                intento.cancelar()
+        activos[:] = [ganador]
+        gana_cobertura = ganador.nombre == "cobertura"
+        with self._lock:
+            if gana_cobertura:
+                self._stats["coberturas_ganadas"] += 1
+        if metricas is not None:
+            metricas["cobertura_ganada"] = gana_cobertura
+        if gana_cobertura:
+            self._registrar(efectiva_ms=transcurrido_ms)
+        else:
+            self._registrar(efectiva_ms=transcurrido_ms, principal_ms=transcurrido_ms)
+
+    def _registrar(self, efectiva_ms=None, principal_ms=None):
+        with self._lock:
+            if efectiva_ms is not None:
+                self._efectiva_ms.append(efectiva_ms)
+            if principal_ms is not None:
+                self._principal_ms.append(principal_ms)
@@ -0,0 +1,297 @@
+"""Base de conocimiento local de técnicas, con índice BM25 en disco.
+
+El índice se construye a partir de conocimiento/tecnicas.json y se guarda al
+lado (tecnicas.bm25); los procesos lo abren con mmap. Para reconstruirlo a mano
+o probar una consulta:
+
+    python mindly_conocimiento.py
+    python mindly_conocimiento.py "qué es la respiración 4-7-8"
+"""
+import hashlib
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+
+from mindly_cache import NEGACIONES
+from mindly_cobertura import percentil
+from mindly_contexto import contar_tokens
+from mindly_intencion import plegar
+
+MAGIA = b"MBM25v2\0"  # v2: vocabulario con negaciones y plegado que respeta separadores
+# magia, sha1 del JSON, documentos, términos, entradas de postings, k1, b
+CABECERA = struct.Struct("<8s20sIIIdd")
+K1 = 1.2
+B = 0.75
+
+PALABRAS_VACIAS = frozenset(plegar(p) for p in """
+a al algo alguna alguno ante antes como con contra cual cuando de del desde donde durante e el ella ellas
+ello ellos en entre era eres es esa ese eso esta este esto estoy fue ha hay la las le les lo los mas me mi
+mis mucho muy mí nos o os otra otro para pero poco por porque que qué quien se sea ser si
+sobre soy su sus también te ti tu tus tú un una uno unos unas y ya yo
+puedes podrías puedo quiero quisiera necesito dime explica explícame cuéntame enséñame ayúdame hacer hago
+saber sé conoces recomiendas recomendarías alguna algún tipo forma manera cosa cosas hola gracias favor
+técnica técnicas herramienta herramientas estrategia estrategias
+""".split())
+
+_PALABRAS = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+Resultado = namedtuple("Resultado", ["tipo", "documentos", "confianza", "duracion_ms"])
+
+
+def _raiz(palabra):
+    """Normalización ligera: pronombre de infinitivos (calmarme, relajarse), adverbios en -mente y plurales"""
+    if len(palabra) > 6 and palabra[-4:] in ("arme", "erme", "irme", "arse", "erse", "irse"):
+        return palabra[:-2]
+    if len(palabra) > 7 and palabra.endswith("mente"):
+        palabra = palabra[:-5]
+    if len(palabra) > 4 and palabra.endswith("ces"):
+        return palabra[:-3] + "z"
+    if len(palabra) > 5 and palabra.endswith("es") and palabra[-3] not in "aeiou":
+        return palabra[:-2]
+    if len(palabra) > 3 and palabra.endswith("s") and not palabra.endswith("ss"):
+        return palabra[:-1]
+    return palabra
+
+
+def terminos(texto):
+    """Términos de búsqueda de un texto: plegado, sin palabras vacías y con raíz ligera"""
+    for palabra in _PALABRAS.findall(plegar(texto)):
+        if palabra not in PALABRAS_VACIAS and len(palabra) > 1:
+            yield _raiz(palabra)
+
+
+def _nombres(documento):
+    """Conjuntos de términos que nombran el documento: cada palabra del título y cada palabra clave completa"""
+    nombres = [frozenset([termino]) for termino in terminos(documento["titulo"])]
+    nombres += [frozenset(terminos(clave)) for clave in documento.get("palabras_clave", [])]
+    return [nombre for nombre in nombres if nombre]
+
+
+def _texto_indexable(documento):
+    # Título y palabras clave cuentan doble
+    destacado = " ".join([documento["titulo"]] + documento.get("palabras_clave", []))
+    return f"{destacado} {destacado} {documento['respuesta']}"
+
+
+def construir_indice(documentos, huella=b"\0" * 20, k1=K1, b=B):
+    """Serializar el índice BM25 de `documentos`.
+
+    Cada entrada de postings guarda ya su peso BM25 (idf por la frecuencia
+    saturada y normalizada por longitud), así buscar es solo sumar pesos. Los
+    términos van ordenados y, por cada uno, se guarda dónde empiezan sus postings
+    y su peso máximo, que sirve para calcular la confianza de un resultado.
+    """
+    frecuencias = [{} for _ in documentos]
+    longitudes = []
+    for frec, documento in zip(frecuencias, documentos):
+        n = 0
+        for termino in terminos(_texto_indexable(documento)):
+            frec[termino] = frec.get(termino, 0) + 1
+            n += 1
+        longitudes.append(n)
+    media = sum(longitudes) / len(longitudes) if longitudes else 1.0
+
+    postings = {}
+    for doc, frec in enumerate(frecuencias):
+        for termino, tf in frec.items():
+            postings.setdefault(termino, []).append((doc, tf))
+
+    vocabulario = sorted(postings)
+    inicios, maximos, docs, pesos = [0], [], [], []
+    for termino in vocabulario:
+        lista = postings[termino]
+        idf = math.log(1 + (len(documentos) - len(lista) + 0.5) / (len(lista) + 0.5))
+        maximo = 0.0
+        for doc, tf in lista:
+            peso = idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * longitudes[doc] / media))
+            docs.append(doc)
+            pesos.append(peso)
+            maximo = max(maximo, peso)
+        inicios.append(len(docs))
+        maximos.append(maximo)
+
+    return b"".join([
+        CABECERA.pack(MAGIA, huella, len(documentos), len(vocabulario), len(docs), k1, b),
+        struct.pack(f"<{len(inicios)}I", *inicios),
+        struct.pack(f"<{len(maximos)}f", *maximos),
+        struct.pack(f"<{len(docs)}I", *docs),
+        struct.pack(f"<{len(pesos)}f", *pesos),
+        "\n".join(vocabulario).encode("utf-8"),
+    ])
+
+
+class IndiceBM25:
+    """Índice serializado por `construir_indice`, leído sin copiar (bytes o mmap).
+
+    Solo el vocabulario se carga en un dict; inicios, pesos máximos y postings
+    son vistas sobre el propio buffer.
+    """
+
+    def __init__(self, datos):
+        self.datos = datos
+        magia, self.huella, self.n_documentos, n_terminos, n_postings, _, _ = CABECERA.unpack_from(datos)
+        if magia != MAGIA:
+            raise ValueError("No es un índice BM25 de Mindly")
+        vista = memoryview(datos)
+        pos = CABECERA.size
+        self._inicios = vista[pos:pos + 4 * (n_terminos + 1)].cast("I")
+        pos += 4 * (n_terminos + 1)
+        self._maximos = vista[pos:pos + 4 * n_terminos].cast("f")
+        pos += 4 * n_terminos
+        self._docs = vista[pos:pos + 4 * n_postings].cast("I")
+        pos += 4 * n_postings
+        self._pesos = vista[pos:pos + 4 * n_postings].cast("f")
+        pos += 4 * n_postings
+        vocabulario = bytes(vista[pos:]).decode("utf-8").split("\n") if n_terminos else []
+        self._termino = {termino: i for i, termino in enumerate(vocabulario)}
+        self.peso_maximo_medio = sum(self._maximos) / n_terminos if n_terminos else 0.0
+
+    def buscar(self, texto, k=3):
+        """([(documento, puntuación)] de los k mejores, puntuación ideal de la consulta)
+
+        La puntuación ideal es la que tendría un documento que fuese el mejor
+        para todos los términos; los términos que el índice no conoce suman el
+        peso máximo medio, para que las consultas sobre otros temas no parezcan seguras.
+        """
+        puntuaciones = {}
+        ideal = 0.0
+        for termino in set(terminos(texto)):
+            i = self._termino.get(termino)
+            if i is None:
+                ideal += self.peso_maximo_medio
+                continue
+            ideal += self._maximos[i]
+            for j in range(self._inicios[i], self._inicios[i + 1]):
+                doc = self._docs[j]
+                puntuaciones[doc] = puntuaciones.get(doc, 0.0) + self._pesos[j]
+        mejores = sorted(puntuaciones.items(), key=lambda par: -par[1])[:k]
+        return mejores, ideal
+
+
+class BaseConocimiento:
+    """Contenido verificado de técnicas para responder sin llamar al modelo.
+
+    `consultar(mensaje)` devuelve un `Resultado` con `tipo`:
+
+    - "directa": la mejor coincidencia supera `umbral_directo` de confianza y
+      `puntuacion_minima` de puntuación BM25, saca ventaja a la segunda y el
+      mensaje la nombra (una palabra del título o una palabra clave entera); su
+      respuesta se muestra tal cual. Nunca si el mensaje lleva una negación ("no
+      me funciona la respiración 4-7-8") o si `directa_permitida` es falso.
+    - "pasajes": hay coincidencias por encima de `umbral_pasajes`; las `k` mejores
+      se añaden al prompt (`bloque_pasajes`) y responde el modelo.
+    - "sin_coincidencia": el modelo responde como siempre.
+
+    El índice se reconstruye solo si cambia el JSON (su huella va en la cabecera).
+    """
+
+    def __init__(self, ruta, ruta_indice=None, umbral_directo=0.6, umbral_pasajes=0.35, k=2,
+                 max_tokens_pasajes=450, ventaja_directa=0.75, puntuacion_minima=4.0):
+        self.ruta = ruta
+        self.ruta_indice = ruta_indice or os.path.splitext(ruta)[0] + ".bm25"
+        self.umbral_directo = umbral_directo
+        self.umbral_pasajes = umbral_pasajes
+        self.k = k
+        self.max_tokens_pasajes = max_tokens_pasajes
+        self.ventaja_directa = ventaja_directa
+        self.puntuacion_minima = puntuacion_minima
+        with open(ruta, "rb") as f:
+            contenido = f.read()
+        self.documentos = json.loads(contenido)
+        self._nombres = [_nombres(documento) for documento in self.documentos]
+        self.indice = self._abrir_indice(hashlib.sha1(contenido).digest())
+        self._lock = threading.Lock()
+        self._tiempos_ms = deque(maxlen=1000)
+        self._stats = {"consultas": 0, "directa": 0, "pasajes": 0, "sin_coincidencia": 0}
+
+    def _abrir_indice(self, huella):
+        try:
+            with open(self.ruta_indice, "rb") as f:
+                datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if datos[:len(MAGIA)] == MAGIA and CABECERA.unpack_from(datos)[1] == huella:
+                return IndiceBM25(datos)
+            datos.close()
+        except (OSError, ValueError):
+            pass
+        datos = construir_indice(self.documentos, huella)
+        try:
+            temporal = f"{self.ruta_indice}.{os.getpid()}.tmp"
+            with open(temporal, "wb") as f:
+                f.write(datos)
+            os.replace(temporal, self.ruta_indice)
+            with open(self.ruta_indice, "rb") as f:
+                return IndiceBM25(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except OSError:
+            return IndiceBM25(datos)  # sin permiso de escritura: índice en memoria
+
+    def consultar(self, mensaje, directa_permitida=True):
+        inicio = time.perf_counter()
+        mejores, ideal = self.indice.buscar(mensaje, max(self.k, 2))
+        confianza = mejores[0][1] / ideal if mejores and ideal else 0.0
+        segunda = mejores[1][1] if len(mejores) > 1 else 0.0
+        if (directa_permitida and confianza >= self.umbral_directo and mejores[0][1] >= self.puntuacion_minima
+                and segunda <= self.ventaja_directa * mejores[0][1] and self._directa_segura(mensaje, mejores[0][0])):
+            tipo, mejores = "directa", mejores[:1]
+        elif confianza >= self.umbral_pasajes:
+            # Solo los pasajes que se acercan a la mejor coincidencia
+            tipo = "pasajes"
+            mejores = [par for par in mejores[:self.k] if par[1] >= self.umbral_pasajes * ideal]
+        else:
+            tipo, mejores = "sin_coincidencia", []
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+        with self._lock:
+            self._stats["consultas"] += 1
+            self._stats[tipo] += 1
+            self._tiempos_ms.append(duracion_ms)
+        return Resultado(tipo, [(self.documentos[doc], puntuacion) for doc, puntuacion in mejores],
+                         round(confianza, 3), duracion_ms)
+
+    def _directa_segura(self, mensaje, doc):
+        """Si el mensaje nombra el documento y no lleva ninguna negación"""
+        if NEGACIONES.intersection(_PALABRAS.findall(plegar(mensaje))):
+            return False
+        consulta = set(terminos(mensaje))
+        return any(nombre <= consulta for nombre in self._nombres[doc])
+
+    def bloque_pasajes(self, resultado):
+        """Texto para añadir al system message con los pasajes del resultado"""
+        partes = ["Información verificada de la guía de técnicas de Mindly. Úsala si responde a la "
+                  "pregunta, adaptándola al usuario, y no inventes pasos distintos:"]
+        disponible = self.max_tokens_pasajes
+        for documento, _ in resultado.documentos:
+            pasaje = f"### {documento['titulo']}\n{documento['respuesta']}"
+            coste = contar_tokens(pasaje)
+            if coste > disponible:
+                break
+            partes.append(pasaje)
+            disponible -= coste
+        return "\n\n".join(partes) if len(partes) > 1 else ""
+
+    def estadisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+            tiempos = list(self._tiempos_ms)
+        stats["tasa_directas"] = stats["directa"] / stats["consultas"] if stats["consultas"] else 0.0
+        stats["busqueda_p50_us"] = (percentil(tiempos, 0.50) or 0.0) * 1000
+        stats["busqueda_p99_us"] = (percentil(tiempos, 0.99) or 0.0) * 1000
+        return stats
+
+
+if __name__ == "__main__":
+    ruta = os.path.join(os.path.dirname(os.path.abspath(__file__)), "conocimiento", "tecnicas.json")
+    base = BaseConocimiento(ruta)
+    print(f"Índice {base.ruta_indice}: {base.indice.n_documentos} documentos, "
+          f"{len(base.indice._termino)} términos")
+    for consulta in sys.argv[1:]:
+        resultado = base.consultar(consulta)
+        print(f"\n{consulta!r}: {resultado.tipo} (confianza {resultado.confianza}, "
+              f"{resultado.duracion_ms * 1000:.0f} µs)")
+        for documento, puntuacion in resultado.documentos:
+            print(f"  {puntuacion:6.2f}  {documento['titulo']}")
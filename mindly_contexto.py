@@ -0,0 +1,111 @@
+import math
+import re
+from functools import lru_cache
+
+# Coste fijo aproximado por mensaje (rol y separadores de la plantilla de chat)
+TOKENS_POR_MENSAJE = 4
+
+_PATRON_TOKENS = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_PATRON_FRASE = re.compile(r"(?<=[.!?…])\s+")
+
+
+@lru_cache(maxsize=4096)
+def contar_tokens(texto):
+    """Estimación local del número de tokens.
+
+    Cada palabra cuenta como un token por cada ~4 caracteres y cada signo de
+    puntuación como uno, que se aproxima bien al tokenizador de Mistral en español
+    sin necesidad de cargarlo.
+    """
+    total = 0
+    for pieza in _PATRON_TOKENS.findall(texto):
+        total += math.ceil(len(pieza) / 4) if pieza[0].isalnum() or pieza[0] == "_" else 1
+    return total
+
+
+def tokens_mensajes(mensajes):
+    return sum(contar_tokens(m["content"]) + TOKENS_POR_MENSAJE for m in mensajes)
+
+
+class ResumenRodante:
+    """Resumen extractivo de los turnos que ya no caben en la ventana.
+
+    De cada mensaje se conserva su primera frase (recortada a `max_caracteres`).
+    Si el resumen supera `max_tokens`, se descartan sus líneas más antiguas.
+    `turnos_resumidos` indica cuántos mensajes del historial cubre.
+    """
+
+    ETIQUETAS = {"user": "Usuario", "assistant": "Mindly"}
+
+    def __init__(self, max_tokens=400, max_caracteres=160):
+        self.max_tokens = max_tokens
+        self.max_caracteres = max_caracteres
+        self.lineas = []
+        self.turnos_resumidos = 0
+
+    @property
+    def texto(self):
+        return "\n".join(self.lineas)
+
+    def incorporar(self, mensajes):
+        for m in mensajes:
+            frase = _PATRON_FRASE.split(m["content"].strip(), maxsplit=1)[0]
+            frase = " ".join(frase.split())
+            if len(frase) > self.max_caracteres:
+                frase = frase[:self.max_caracteres - 1].rstrip() + "…"
+            if frase:
+                self.lineas.append(f"- {self.ETIQUETAS.get(m['role'], m['role'])}: {frase}")
+        self.turnos_resumidos += len(mensajes)
+        while len(self.lineas) > 1 and contar_tokens(self.texto) > self.max_tokens:
+            self.lineas.pop(0)
+
+
+class ConstructorContexto:
+    """Construye la lista de mensajes para el modelo dentro de un presupuesto de tokens.
+
+    El turno pendiente no se duplica si ya es el último mensaje del historial. Los
+    mensajes más recientes se envían literalmente mientras quepan en
+    `presupuesto_tokens` (y no pasen de `max_mensajes`); los anteriores se pliegan
+    en el `ResumenRodante` de la sesión en lugar de perderse.
+    """
+
+    def __init__(self, presupuesto_tokens=3000, max_mensajes=None):
+        self.presupuesto_tokens = presupuesto_tokens
+        self.max_mensajes = max_mensajes
+
+    def construir(self, message, history, system_message, resumen=None):
+        previo = history
+        if previo and previo[-1]["role"] == "user" and previo[-1]["content"] == message:
+            previo = previo[:-1]
+
+        inicio_minimo = min(resumen.turnos_resumidos, len(previo)) if resumen else 0
+        disponible = (self.presupuesto_tokens
+                      - tokens_mensajes([{"content": system_message}, {"content": message}]))
+        if resumen is not None:
+            # Se reserva el tamaño máximo del resumen, que puede crecer en este mismo turno
+            disponible -= resumen.max_tokens + TOKENS_POR_MENSAJE
+
+        corte = len(previo)
+        while corte > inicio_minimo:
+            coste = contar_tokens(previo[corte - 1]["content"]) + TOKENS_POR_MENSAJE
+            if coste > disponible:
+                break
+            if self.max_mensajes is not None and len(previo) - corte >= self.max_mensajes:
+                break
+            disponible -= coste
+            corte -= 1
+        # La ventana no debe empezar con una respuesta del asistente
+        while corte < len(previo) and previo[corte]["role"] == "assistant":
+            corte += 1
+
+        if resumen is not None and corte > resumen.turnos_resumidos:
+            resumen.incorporar(previo[resumen.turnos_resumidos:corte])
+
+        contenido_sistema = system_message
+        if resumen and resumen.lineas:
+            contenido_sistema += "\n\nResumen de la conversación anterior:\n" + resumen.texto
+
+        messages = [{"role": "system", "content": contenido_sistema}]
+        messages.extend({"role": m["role"], "content": m["content"]} for m in previo[corte:])
+        messages.append({"role": "user", "content": message})
+        return messages
@@ -0,0 +1,147 @@
+import atexit
+import queue
+import threading
+import time
+
+POLITICAS = ("bloquear", "descartar_nuevo", "descartar_antiguo")
+
+
+class EscritorLogAsincrono:
+    """Hilo único que escribe el log en segundo plano.
+
+    Los turnos de chat solo encolan la entrada; el hilo agrupa lo que haya en la
+    cola (hasta `max_lote` entradas) y lo escribe en una sola llamada a
+    `destino.agregar_lote`. Cuando la cola está llena se aplica `politica`:
+
+    - "bloquear": espera hasta `timeout_bloqueo` segundos y, si sigue llena, descarta.
+    - "descartar_nuevo": descarta la entrada que llega.
+    - "descartar_antiguo": saca la entrada más vieja de la cola y encola la nueva.
+
+    Si se pasa `metricas` (un `RegistroMetricas`), cada lote escrito se observa
+    en la etapa "log_escritura".
+    """
+
+    def __init__(self, destino, max_cola=1000, max_lote=200, politica="bloquear",
+                 timeout_bloqueo=0.5, metricas=None):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política desconocida: {politica}")
+        self.destino = destino
+        self.max_lote = max_lote
+        self.politica = politica
+        self.timeout_bloqueo = timeout_bloqueo
+        self.metricas = metricas
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._parar = threading.Event()
+        self._lock_stats = threading.Lock()
+        self._stats = {
+            "encoladas": 0,
+            "escritas": 0,
+            "descartadas": 0,
+            "lotes": 0,
+            "errores": 0,
+            "profundidad_max": 0,
+            "latencia_ultima_ms": 0.0,
+            "latencia_max_ms": 0.0,
+            "latencia_total_ms": 0.0,
+        }
+        self._hilo = threading.Thread(target=self._bucle, name="mindly-log-writer", daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)
+
+    def encolar(self, entrada):
+        """Encolar una entrada sin bloquear el turno (salvo política "bloquear")"""
+        if self._parar.is_set():
+            return False
+        try:
+            if self.politica == "bloquear":
+                self._cola.put(entrada, timeout=self.timeout_bloqueo)
+            else:
+                self._cola.put_nowait(entrada)
+        except queue.Full:
+            if self.politica != "descartar_antiguo":
+                self._contar("descartadas")
+                return False
+            try:
+                self._cola.get_nowait()
+                self._cola.task_done()
+                self._contar("descartadas")
+            except queue.Empty:
+                pass
+            try:
+                self._cola.put_nowait(entrada)
+            except queue.Full:
+                self._contar("descartadas")
+                return False
+
+        with self._lock_stats:
+            self._stats["encoladas"] += 1
+            profundidad = self._cola.qsize()
+            if profundidad > self._stats["profundidad_max"]:
+                self._stats["profundidad_max"] = profundidad
+        return True
+
+    def flush(self, timeout=5.0):
+        """Esperar a que se escriba todo lo encolado hasta ahora"""
+        limite = time.monotonic() + timeout
+        while self._cola.unfinished_tasks and time.monotonic() < limite:
+            time.sleep(0.01)
+        if hasattr(self.destino, "flush"):
+            self.destino.flush()
+        return not self._cola.unfinished_tasks
+
+    def cerrar(self, timeout=5.0):
+        """Vaciar la cola y detener el hilo"""
+        if self._parar.is_set():
+            return
+        self.flush(timeout)
+        self._parar.set()
+        self._hilo.join(timeout)
+
+    def estadisticas(self):
+        with self._lock_stats:
+            stats = dict(self._stats)
+        stats["profundidad"] = self._cola.qsize()
+        stats["latencia_media_ms"] = (
+            stats["latencia_total_ms"] / stats["lotes"] if stats["lotes"] else 0.0
+        )
+        return stats
+
+    def _contar(self, clave, n=1):
+        with self._lock_stats:
+            self._stats[clave] += n
+
+    def _bucle(self):
+        while not (self._parar.is_set() and self._cola.empty()):
+            try:
+                primera = self._cola.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            lote = [primera]
+            while len(lote) < self.max_lote:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+
+            inicio = time.perf_counter()
+            try:
+                self.destino.agregar_lote(lote)
+                ok = True
+            except Exception:
+                ok = False
+            ms = (time.perf_counter() - inicio) * 1000
+
+            with self._lock_stats:
+                if ok:
+                    self._stats["escritas"] += len(lote)
+                else:
+                    self._stats["errores"] += 1
+                    self._stats["descartadas"] += len(lote)
+                self._stats["lotes"] += 1
+                self._stats["latencia_ultima_ms"] = ms
+                self._stats["latencia_total_ms"] += ms
+                self._stats["latencia_max_ms"] = max(self._stats["latencia_max_ms"], ms)
+            if ok and self.metricas is not None:
+                self.metricas.observar("log_escritura", ms)
+            for _ in lote:
+                self._cola.task_done()
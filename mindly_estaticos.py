@@ -0,0 +1,72 @@
+import glob
+import hashlib
+import os
+import re
+
+# Familias y pesos que usan los estilos; los archivos van en static/fuentes/<Familia>-<peso>.woff2
+FUENTES = {"Poppins": (300, 400, 500, 600), "Inter": (300, 400, 500)}
+NOMBRES_PESO = {300: "Light", 400: "Regular", 500: "Medium", 600: "SemiBold"}
+
+_COMENTARIOS = re.compile(r"/\*.*?\*/", re.S)
+_ESPACIOS = re.compile(r"\s+")
+_ALREDEDOR = re.compile(r"\s*([{}:;,>])\s*")
+
+
+def minificar_css(css):
+    """Quitar comentarios y espacios sobrantes (sin tocar el contenido de las cadenas)"""
+    partes = re.split(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')""", css)
+    for i in range(0, len(partes), 2):
+        texto = _COMENTARIOS.sub("", partes[i])
+        texto = _ESPACIOS.sub(" ", texto)
+        texto = _ALREDEDOR.sub(r"\1", texto)
+        partes[i] = texto.replace(";}", "}")
+    return "".join(partes).strip()
+
+
+def reglas_fuentes(dir_fuentes, prefijo_url="fuentes"):
+    """@font-face de las fuentes de FUENTES.
+
+    Primero se usa la fuente instalada en el equipo (`local()`); si está el
+    archivo .woff2 en `dir_fuentes`, se sirve desde la propia app. No se pide
+    nada a servidores externos.
+    """
+    reglas = []
+    for familia, pesos in FUENTES.items():
+        for peso in pesos:
+            nombre_peso = NOMBRES_PESO.get(peso, str(peso))
+            origenes = [f"local('{familia} {nombre_peso}')", f"local('{familia}-{nombre_peso}')"]
+            archivo = f"{familia}-{peso}.woff2"
+            if os.path.exists(os.path.join(dir_fuentes, archivo)):
+                origenes.append(f"url('{prefijo_url}/{archivo}') format('woff2')")
+            reglas.append(
+                f"@font-face {{ font-family: '{familia}'; font-style: normal; font-weight: {peso}; "
+                f"font-display: swap; src: {', '.join(origenes)}; }}"
+            )
+    return "\n".join(reglas)
+
+
+def construir_hoja_estilos(origen, dir_static, nombre="mindly"):
+    """Minificar `origen` (más las @font-face) y dejarlo en `dir_static`.
+
+    El archivo se llama `<nombre>.<hash>.min.css`, así el navegador puede
+    guardarlo en caché sin riesgo de servir una versión vieja. Solo se escribe si
+    no existe y se borran las versiones anteriores. Devuelve `(archivo, css)`.
+    """
+    with open(origen, encoding="utf-8") as f:
+        fuente = f.read()
+    css = minificar_css(reglas_fuentes(os.path.join(dir_static, "fuentes")) + "\n" + fuente)
+    archivo = f"{nombre}.{hashlib.sha1(css.encode('utf-8')).hexdigest()[:10]}.min.css"
+    ruta = os.path.join(dir_static, archivo)
+    if not os.path.exists(ruta):
+        os.makedirs(dir_static, exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(css)
+        os.replace(temporal, ruta)
+        for anterior in glob.glob(os.path.join(dir_static, f"{nombre}.*.min.css")):
+            if anterior != ruta:
+                try:
+                    os.remove(anterior)
+                except OSError:
+                    pass
+    return archivo, css
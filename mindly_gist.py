@@ -0,0 +1,412 @@
+import base64
+import gzip
+import json
+import os
+import random
+import time
+import zlib
+from datetime import datetime
+from urllib.parse import quote
+
+import requests
+
+GITHUB_API = "https://api.github.com"
+ARCHIVO_MANIFIESTO = "manifest.json"
+REINTENTABLES = {403, 429, 500, 502, 503, 504}
+
+
+class GistManager:
+    def __init__(self, token, gist_id=None, sesion=None, api_base=GITHUB_API):
+        self.token = token
+        self.gist_id = gist_id
+        self.sesion = sesion or requests.Session()
+        self.api_base = api_base.rstrip("/")
+        self.headers = {
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github.v3+json"
+        }
+
+    def crear_gist(self, filename, content, description="Chat logs de Mindly"):
+        """Crear un nuevo Gist"""
+        response = self.crear_gist_archivos({filename: {"content": content}}, description)
+
+        if response.status_code == 201:
+            gist_data = response.json()
+            self.gist_id = gist_data["id"]
+            return True, gist_data["id"], gist_data["html_url"]
+        else:
+            return False, None, response.json()
+
+    def actualizar_gist(self, filename, content):
+        """Actualizar un Gist existente"""
+        if not self.gist_id:
+            return False, "No hay Gist ID configurado"
+
+        response = self.actualizar_archivos({filename: {"content": content}})
+
+        if response.status_code == 200:
+            return True, response.json()["html_url"]
+        else:
+            return False, response.json()
+
+    def obtener_gist(self):
+        """Obtener contenido del Gist"""
+        if not self.gist_id:
+            return False, "No hay Gist ID configurado"
+
+        response = self.sesion.get(
+            f"{self.api_base}/gists/{self.gist_id}",
+            headers=self.headers
+        )
+
+        if response.status_code == 200:
+            return True, response.json()
+        else:
+            return False, response.json()
+
+    def crear_gist_archivos(self, files, description="Chat logs de Mindly"):
+        """POST de un Gist con varios archivos; devuelve la respuesta HTTP"""
+        return self.sesion.post(
+            f"{self.api_base}/gists",
+            headers=self.headers,
+            json={"description": description, "public": False, "files": files}
+        )
+
+    def actualizar_archivos(self, files):
+        """PATCH de varios archivos del Gist; devuelve la respuesta HTTP"""
+        return self.sesion.patch(
+            f"{self.api_base}/gists/{self.gist_id}",
+            headers=self.headers,
+            json={"files": files}
+        )
+
+
+class ErrorSincronizacion(Exception):
+    pass
+
+
+def espera_reintento(response, intento, base=1.0, maximo=60.0):
+    """Segundos a esperar antes de reintentar: Retry-After, reset del rate limit o backoff con jitter"""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(float(retry_after), maximo)
+        except ValueError:
+            pass
+    if response.headers.get("X-RateLimit-Remaining") == "0" and response.headers.get("X-RateLimit-Reset"):
+        try:
+            return min(max(float(response.headers["X-RateLimit-Reset"]) - time.time(), 0.0), maximo)
+        except ValueError:
+            pass
+    return min(base * (2 ** intento), maximo) * random.uniform(0.5, 1.0)
+
+
+def es_reintentable(response):
+    if response.status_code not in REINTENTABLES:
+        return False
+    if response.status_code == 403:
+        # 403 solo es temporal si es un límite de peticiones; si no, es un token sin permisos
+        return (response.headers.get("X-RateLimit-Remaining") == "0"
+                or "Retry-After" in response.headers
+                or "rate limit" in response.text.lower())
+    return True
+
+
+def codificar_fragmento(lineas, comprimir):
+    contenido = "".join(lineas)
+    if not comprimir:
+        return contenido
+    return base64.b64encode(gzip.compress(contenido.encode("utf-8"))).decode("ascii")
+
+
+class SincronizadorGist:
+    """Sincronización incremental del log con un Gist.
+
+    Solo sube las entradas posteriores a la marca de agua (`hwm`, número de
+    entradas ya subidas). Las entradas se reparten en fragmentos JSONL por día
+    (`chat_log-AAAAMMDD-NNN.jsonl`, o `.jsonl.gz.b64` si `comprimir`) de como
+    mucho `max_bytes_fragmento`, y `manifest.json` describe qué rango cubre cada
+    fragmento. El último fragmento, si no está lleno, se regenera desde el log
+    local y se amplía, así que nunca se vuelve a subir más que un fragmento ya
+    existente. Cada PATCH incluye el manifiesto actualizado y, si tiene éxito, el
+    estado local se guarda, de modo que un fallo permite retomar desde ahí.
+    """
+
+    def __init__(self, gist_manager, ruta_estado, max_bytes_fragmento=900 * 1024,
+                 max_bytes_peticion=3 * 1024 * 1024, comprimir=False, max_intentos=5,
+                 espera_base=1.0, dormir=time.sleep):
+        self.gist = gist_manager
+        self.ruta_estado = ruta_estado
+        self.max_bytes_fragmento = max_bytes_fragmento
+        self.max_bytes_peticion = max_bytes_peticion
+        self.comprimir = comprimir
+        self.max_intentos = max_intentos
+        self.espera_base = espera_base
+        self.dormir = dormir
+        self.reintentos = 0
+
+    def sincronizar(self, lector):
+        """Subir las entradas nuevas. Devuelve (éxito, url del Gist o mensaje de error, nº de entradas subidas)"""
+        lector.actualizar()
+        try:
+            manifiesto = self._manifiesto_actual()
+            hwm_inicial = manifiesto["hwm"]
+            total = lector.contar()
+            if total <= hwm_inicial:
+                return True, self._url(), 0
+
+            pendientes = {}
+            for nombre, fragmento, lineas in self._fragmentos(lector, manifiesto, total):
+                pendientes[nombre] = {"content": codificar_fragmento(lineas, self.comprimir)}
+                self._registrar(manifiesto, fragmento)
+                if sum(len(f["content"]) for f in pendientes.values()) >= self.max_bytes_peticion:
+                    self._subir(pendientes, manifiesto)
+                    pendientes = {}
+            if pendientes:
+                self._subir(pendientes, manifiesto)
+            return True, self._url(), manifiesto["hwm"] - hwm_inicial
+        except ErrorSincronizacion as e:
+            return False, str(e), 0
+
+    def _fragmentos(self, lector, manifiesto, total):
+        """Generar (nombre, descripción, líneas) de los fragmentos a (re)subir.
+
+        Cada fragmento se entrega antes de empezar el siguiente, y el llamador lo
+        registra en el manifiesto, así que el índice del siguiente nombre ya lo tiene en cuenta.
+        """
+        hwm = manifiesto["hwm"]
+        desde = hwm
+        actual, lineas = None, []
+        ultimo = manifiesto["fragmentos"][-1] if manifiesto["fragmentos"] else None
+        if (ultimo and ultimo["hasta"] == hwm and ultimo["bytes"] < self.max_bytes_fragmento
+                and ultimo["comprimido"] == self.comprimir):
+            # Reabrir el último fragmento: se reconstruye desde el log local
+            actual = dict(ultimo, hasta=ultimo["desde"], bytes=0)
+            desde = ultimo["desde"]
+
+        for n, entrada in enumerate(lector.iterar_desde(desde), start=desde):
+            if n >= total:
+                break
+            linea = json.dumps(entrada, ensure_ascii=False, separators=(",", ":")) + "\n"
+            tam = len(linea.encode("utf-8"))
+            dia = (entrada.get("timestamp") or datetime.now().isoformat())[:10].replace("-", "")
+            if actual is not None and (actual["dia"] != dia or actual["bytes"] + tam > self.max_bytes_fragmento):
+                if actual["hasta"] > hwm:
+                    yield actual["archivo"], actual, lineas
+                actual = None
+            if actual is None:
+                actual = self._nuevo_fragmento(manifiesto, dia, n)
+                lineas = []
+            lineas.append(linea)
+            actual["hasta"] = n + 1
+            actual["bytes"] += tam
+        if actual is not None and actual["hasta"] > hwm:
+            yield actual["archivo"], actual, lineas
+
+    def _nuevo_fragmento(self, manifiesto, dia, desde):
+        usados = [f["indice"] for f in manifiesto["fragmentos"] if f["dia"] == dia]
+        indice = max(usados) + 1 if usados else 0
+        extension = ".jsonl.gz.b64" if self.comprimir else ".jsonl"
+        return {"archivo": f"chat_log-{dia}-{indice:03d}{extension}", "dia": dia, "indice": indice,
+                "desde": desde, "hasta": desde, "bytes": 0, "comprimido": self.comprimir}
+
+    def _registrar(self, manifiesto, fragmento):
+        for i, existente in enumerate(manifiesto["fragmentos"]):
+            if existente["archivo"] == fragmento["archivo"]:
+                manifiesto["fragmentos"][i] = dict(fragmento)
+                break
+        else:
+            manifiesto["fragmentos"].append(dict(fragmento))
+        manifiesto["hwm"] = max(manifiesto["hwm"], fragmento["hasta"])
+
+    def _subir(self, archivos, manifiesto):
+        publico = dict(manifiesto, actualizado=datetime.now().isoformat())
+        archivos = dict(archivos)
+        archivos[ARCHIVO_MANIFIESTO] = {"content": json.dumps(publico, ensure_ascii=False, indent=1)}
+
+        if self.gist.gist_id:
+            response = self._con_reintentos(lambda: self.gist.actualizar_archivos(archivos))
+            ok = response.status_code == 200
+        else:
+            response = self._con_reintentos(lambda: self.gist.crear_gist_archivos(archivos))
+            ok = response.status_code == 201
+            if ok:
+                self.gist.gist_id = response.json()["id"]
+        if not ok:
+            raise ErrorSincronizacion(f"GitHub respondió {response.status_code}: {response.text[:200]}")
+        self._html_url = response.json().get("html_url")
+        self._guardar_estado(publico)
+
+    def _con_reintentos(self, peticion):
+        for intento in range(self.max_intentos):
+            try:
+                response = peticion()
+            except requests.RequestException as e:
+                if intento == self.max_intentos - 1:
+                    raise ErrorSincronizacion(f"Error de red: {e}")
+                self.reintentos += 1
+                self.dormir(min(self.espera_base * (2 ** intento), 60.0) * random.uniform(0.5, 1.0))
+                continue
+            if not es_reintentable(response) or intento == self.max_intentos - 1:
+                return response
+            self.reintentos += 1
+            self.dormir(espera_reintento(response, intento, self.espera_base))
+        return response
+
+    def _manifiesto_actual(self):
+        estado = self._cargar_estado()
+        if estado and estado.get("gist_id") == self.gist.gist_id:
+            return estado["manifiesto"]
+        if self.gist.gist_id:
+            # Sin estado local (otra máquina o primer uso): partir del manifiesto remoto
+            ok, datos = self.gist.obtener_gist()
+            if not ok:
+                raise ErrorSincronizacion(f"No se pudo leer el Gist: {datos}")
+            archivos = datos.get("files", {})
+            if datos.get("truncated"):
+                archivos = ListadoTruncado(archivos)
+            archivo = archivos.get(ARCHIVO_MANIFIESTO)
+            if archivo:
+                contenido = archivo.get("content", "")
+                if archivo.get("truncated") and archivo.get("raw_url"):
+                    contenido = self.gist.sesion.get(archivo["raw_url"], headers=self.gist.headers).text
+                return json.loads(contenido)
+        return {"version": 1, "hwm": 0, "fragmentos": []}
+
+    def _url(self):
+        if getattr(self, "_html_url", None):
+            return self._html_url
+        return f"https://gist.github.com/{self.gist.gist_id}" if self.gist.gist_id else None
+
+    def _cargar_estado(self):
+        try:
+            with open(self.ruta_estado, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _guardar_estado(self, manifiesto):
+        temporal = f"{self.ruta_estado}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({"gist_id": self.gist.gist_id, "manifiesto": manifiesto}, f, ensure_ascii=False)
+        os.replace(temporal, self.ruta_estado)
+
+
+def iterar_bytes_archivo(gist_manager, archivo, tam_bloque=64 * 1024):
+    """Bytes de un archivo del Gist en bloques.
+
+    La API trunca el `content` de los archivos de más de ~1 MB; en ese caso se
+    descarga `raw_url` en streaming en lugar de usar el contenido incompleto.
+    """
+    if archivo.get("truncated") and archivo.get("raw_url"):
+        with gist_manager.sesion.get(archivo["raw_url"], headers=gist_manager.headers,
+                                     stream=True, timeout=60) as response:
+            response.raise_for_status()
+            for bloque in response.iter_content(tam_bloque):
+                if bloque:
+                    yield bloque
+    else:
+        contenido = archivo.get("content") or ""
+        for i in range(0, len(contenido), tam_bloque):
+            yield contenido[i:i + tam_bloque].encode("utf-8")
+
+
+def descomprimir_fragmento(bloques):
+    """Decodificar base64 y descomprimir gzip sobre la marcha"""
+    descompresor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    resto = b""
+    for bloque in bloques:
+        datos = resto + b"".join(bloque.split())
+        corte = len(datos) // 4 * 4
+        resto = datos[corte:]
+        salida = descompresor.decompress(base64.b64decode(datos[:corte]))
+        if salida:
+            yield salida
+    if resto:
+        yield descompresor.decompress(base64.b64decode(resto))
+    final = descompresor.flush()
+    if final:
+        yield final
+
+
+def iterar_lineas(bloques):
+    """Reagrupar bloques de bytes en líneas completas (sin el salto de línea)"""
+    pendiente = b""
+    for bloque in bloques:
+        pendiente += bloque
+        *lineas, pendiente = pendiente.split(b"\n")
+        for linea in lineas:
+            if linea.strip():
+                yield linea
+    if pendiente.strip():
+        yield pendiente
+
+
+class ListadoTruncado(dict):
+    """Archivos de un Gist cuyo listado vino truncado (la API solo devuelve 300).
+
+    Los archivos que faltan en el listado se leen de su URL raw, que se deduce
+    de la de cualquier archivo listado: todas comparten
+    `.../raw/<revisión>/` y solo cambia el nombre final.
+    """
+
+    def __init__(self, archivos):
+        super().__init__(archivos)
+        self._base_raw = None
+        for archivo in archivos.values():
+            if archivo.get("raw_url"):
+                self._base_raw = archivo["raw_url"].rsplit("/", 1)[0] + "/"
+                break
+
+    def get(self, nombre, defecto=None):
+        if nombre in self:
+            return self[nombre]
+        if self._base_raw is None:
+            return defecto
+        return {"filename": nombre, "truncated": True, "raw_url": self._base_raw + quote(nombre)}
+
+    def __missing__(self, nombre):
+        archivo = self.get(nombre)
+        if archivo is None:
+            raise KeyError(nombre)
+        return archivo
+
+
+def exportar_gist(gist_manager, destino, tam_bloque=64 * 1024):
+    """Escribir en `destino` (binario) todo el log del Gist como un único array JSON.
+
+    Los fragmentos se recorren en el orden del manifiesto y se copian línea a
+    línea sin parsearlas, así que la memoria usada no depende del tamaño del log.
+    Si el Gist es del formato antiguo (`chat_log.json`), se copia tal cual.
+    Devuelve el número de entradas exportadas (o None para el formato antiguo).
+    """
+    ok, datos = gist_manager.obtener_gist()
+    if not ok:
+        raise ErrorSincronizacion(f"No se pudo leer el Gist: {datos}")
+    archivos = datos.get("files", {})
+    if datos.get("truncated"):
+        archivos = ListadoTruncado(archivos)
+
+    if archivos.get(ARCHIVO_MANIFIESTO) is None:
+        if archivos.get("chat_log.json") is None:
+            raise ErrorSincronizacion("El Gist no contiene logs de Mindly")
+        for bloque in iterar_bytes_archivo(gist_manager, archivos["chat_log.json"], tam_bloque):
+            destino.write(bloque)
+        return None
+
+    manifiesto = json.loads(b"".join(iterar_bytes_archivo(gist_manager, archivos[ARCHIVO_MANIFIESTO])))
+    destino.write(b"[")
+    total = 0
+    for fragmento in manifiesto["fragmentos"]:
+        archivo = archivos.get(fragmento["archivo"])
+        if archivo is None:
+            raise ErrorSincronizacion(f"Falta el fragmento {fragmento['archivo']} en el Gist")
+        bloques = iterar_bytes_archivo(gist_manager, archivo, tam_bloque)
+        if fragmento.get("comprimido"):
+            bloques = descomprimir_fragmento(bloques)
+        for linea in iterar_lineas(bloques):
+            destino.write(b",\n" if total else b"\n")
+            destino.write(linea)
+            total += 1
+    destino.write(b"\n]\n")
+    return total
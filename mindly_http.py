@@ -0,0 +1,99 @@
+import threading
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class EstadisticasConexiones:
+    """Contadores de peticiones y conexiones nuevas de un cliente HTTP"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.peticiones = 0
+        self.conexiones_nuevas = 0
+
+    def sumar(self, peticiones=0, conexiones=0):
+        with self._lock:
+            self.peticiones += peticiones
+            self.conexiones_nuevas += conexiones
+
+    def resumen(self):
+        with self._lock:
+            peticiones, conexiones = self.peticiones, self.conexiones_nuevas
+        reutilizadas = max(peticiones - conexiones, 0)
+        return {
+            "peticiones": peticiones,
+            "conexiones_nuevas": conexiones,
+            "reutilizadas": reutilizadas,
+            "tasa_reutilizacion": reutilizadas / peticiones if peticiones else 0.0,
+        }
+
+
+def crear_cliente_httpx(max_conexiones=20, max_keepalive=10, keepalive_expiry=60.0, timeout=120.0):
+    """Cliente httpx con pool dimensionado para el SDK de Mistral.
+
+    Devuelve `(cliente, estadisticas)`. Las conexiones nuevas se cuentan con la
+    extensión `trace` de httpcore, que notifica cada conexión TCP abierta.
+    """
+    stats = EstadisticasConexiones()
+
+    def trace(evento, info):
+        if evento == "connection.connect_tcp.complete":
+            stats.sumar(conexiones=1)
+
+    def al_enviar(request):
+        stats.sumar(peticiones=1)
+        request.extensions["trace"] = trace
+
+    cliente = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=max_conexiones,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        timeout=timeout,
+        event_hooks={"request": [al_enviar]},
+    )
+    return cliente, stats
+
+
+class AdaptadorConEstadisticas(HTTPAdapter):
+    """HTTPAdapter de requests que lleva la cuenta de peticiones y conexiones"""
+
+    def __init__(self, stats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        self.stats.sumar(peticiones=1)
+        return super().send(request, **kwargs)
+
+    def conexiones_abiertas(self):
+        """Conexiones creadas por los pools de urllib3 hasta ahora"""
+        pools = self.poolmanager.pools
+        return sum(pools[clave].num_connections for clave in pools.keys())
+
+
+class SesionHTTP(requests.Session):
+    """requests.Session con pool dimensionado y estadísticas de reutilización"""
+
+    def __init__(self, pool_conexiones=4, pool_max=10):
+        super().__init__()
+        self.stats = EstadisticasConexiones()
+        self._adaptador = AdaptadorConEstadisticas(
+            self.stats, pool_connections=pool_conexiones, pool_maxsize=pool_max
+        )
+        self.mount("https://", self._adaptador)
+        self.mount("http://", self._adaptador)
+
+    def estadisticas(self):
+        resumen = self.stats.resumen()
+        conexiones = self._adaptador.conexiones_abiertas()
+        reutilizadas = max(resumen["peticiones"] - conexiones, 0)
+        resumen.update({
+            "conexiones_nuevas": conexiones,
+            "reutilizadas": reutilizadas,
+            "tasa_reutilizacion": reutilizadas / resumen["peticiones"] if resumen["peticiones"] else 0.0,
+        })
+        return resumen
@@ -1,10 +1,36 @@
+import time
+inicio_rerun = time.perf_counter()
 import streamlit as st
-import json
-import re
-import requests
+fin_import_streamlit = time.perf_counter()
 import os
-from datetime import datetime
-from mistralai import Mistral
+import tempfile
+from datetime import datetime, timedelta
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+# mistralai, requests (mindly_http, mindly_gist) y numpy (mindly_analitica) se importan
+# solo cuando hacen falta: son la mayor parte del arranque de un proceso nuevo
+from mindly_arranque import PerfilArranque
+from mindly_logstore import migrar_json_legacy
+from mindly_archivo import abrir_log
+from mindly_escritor import EscritorLogAsincrono
+from mindly_cache import CacheRespuestas
+from mindly_contexto import ConstructorContexto, ResumenRodante
+from mindly_intencion import detectar_intencion
+from mindly_router import EnrutadorModelos, MODELO_GRANDE, REGLAS_POR_DEFECTO
+from mindly_planificador import PlanificadorMistral
+from mindly_cobertura import CoberturaLLM
+from mindly_chat import MotorChat, MODELO_LOCAL
+from mindly_metricas import RegistroMetricas, ETAPAS
+from mindly_estaticos import construir_hoja_estilos, minificar_css
+from mindly_sesiones import AlmacenSesiones
+
+@st.cache_resource
+def obtener_perfil_arranque():
+    """Tiempos del arranque de este proceso"""
+    return PerfilArranque()
+
+perfil_arranque = obtener_perfil_arranque()
+perfil_arranque.registrar("import streamlit", (fin_import_streamlit - inicio_rerun) * 1000)
+perfil_arranque.registrar("imports de la app", (time.perf_counter() - fin_import_streamlit) * 1000)
 
 def verificar_admin():
     """Verifica si se accede con parámetro admin=true en la URL"""
@@ -20,435 +46,500 @@ system_message = (
     "Si notas que alguien necesita apoyo emocional urgente, sugiérele que busque ayuda profesional inmediata."
 )
 
-LOG_FILE = "chat_log.json"
+# Se muestra al instante, antes de esperar al modelo, cuando el mensaje es una situación urgente
+RECURSOS_CRISIS = """
+🆘 **Si estás en peligro o piensas en hacerte daño, busca ayuda ahora mismo:**
+- **Emergencias:** 112 (Europa) • 911 (América)
+- **España:** Línea 024 de atención a la conducta suicida (24 h, gratuita)
+- **México:** Línea de la Vida 800 911 2000
+- **Argentina:** Centro de Asistencia al Suicida 135 (CABA y GBA) o (011) 5275-1135
+- **Colombia:** Línea 106 • **Chile:** \\*4141
+
+No estás solo/a. Mientras tanto, sigo aquí contigo 💜
+""".strip()
+
+CABECERA = """
+<div style="text-align: center; margin-bottom: 2rem;">
+    <h1>🧠 Mindly</h1>
+    <p class="subtitle">Tu compañero de bienestar mental • Conversaciones empáticas y apoyo psicológico</p>
+</div>
+"""
+
+INDICADOR_ADMIN = '<div class="admin-indicator">👑 Modo Administrador</div>'
+
+SOBRE_MINDLY = """
+Mindly es tu asistente de bienestar mental, diseñado para:
+- 💬 Conversaciones empáticas
+- 🎯 Técnicas de manejo emocional
+- 🔍 Información psicológica confiable
+- 🆘 Orientación en momentos difíciles
+
+**Recuerda:** En casos de emergencia, contacta servicios profesionales.
+"""
+
+SALUDO = """
+¡Hola, soy **Mindly**, tu compañero de bienestar mental. 🌟
+Estoy aquí para ayudarte con:
+- Manejo de emociones y estrés
+- Técnicas de relajación y mindfulness
+- Información sobre psicología
+- Apoyo en momentos difíciles
+
+¿En qué puedo ayudarte hoy?
+"""
+
+DIRECTORIO_APP = os.path.dirname(os.path.abspath(__file__))
+ESTILOS_ORIGEN = os.path.join(DIRECTORIO_APP, "estilos", "mindly.css")  # se sirve minificado desde static/
+LOG_FILE = "chat_log.json"  # formato antiguo, solo se usa para migrar
+LOG_DIR = "chat_logs"
+LOG_BACKEND = os.getenv("MINDLY_LOG_BACKEND", "jsonl")  # "sqlite" si hay varios procesos servidores
+LOG_SQLITE = os.getenv("MINDLY_LOG_SQLITE", os.path.join(LOG_DIR, "chat_log.sqlite3"))
+LOG_COLA_MAX = 1000
+LOG_POLITICA = "bloquear"  # bloquear | descartar_nuevo | descartar_antiguo
+ARCHIVO_DIAS = 30  # desde el panel de administrador, lo más antiguo se compacta en el archivo comprimido
+PERIODOS_EXPORTACION = {"Últimas 24 h": 1, "Últimos 7 días": 7, "Últimos 30 días": 30, "Todo": None}
 MAX_HISTORY = 8
+SESIONES_DIR = "chat_sesiones"  # historial completo de cada sesión; en memoria solo los últimos MAX_HISTORY*2
+SESION_INACTIVIDAD_S = 30 * 60  # tras este tiempo sin actividad se libera la memoria de la sesión
+SESIONES_RETENCION_DIAS = float(os.getenv("MINDLY_SESIONES_RETENCION_DIAS", "0"))  # 0: se borran al liberarse
+ANTERIORES_POR_PAGINA = 20
+CONTEXTO_MAX_TOKENS = 3000  # presupuesto de tokens del prompt (system + historial + mensaje)
+RESUMEN_MAX_TOKENS = 400
+MODELO = MODELO_GRANDE  # modelo por defecto si ninguna regla de enrutado encaja
+REGLAS_MODELO = REGLAS_POR_DEFECTO  # ver mindly_router.py
+UMBRAL_LATENCIA_MODELO_MS = 8000  # por encima, los turnos no protegidos pasan al respaldo
+STREAMING = True  # renderizar la respuesta token a token
+HTTP_POOL_MAX = 20
+MISTRAL_RPS = float(os.getenv("MISTRAL_RPS", "1.0"))  # límites del plan de Mistral
+MISTRAL_TPM = int(os.getenv("MISTRAL_TPM", "500000"))
+TOKENS_RESPUESTA_ESTIMADOS = 500
+ESPERA_MAX_S = 20.0  # espera máxima en cola antes de mostrar el aviso de límite
+PLAZO_RESPUESTA_S = 60.0  # tiempo máximo por respuesta completa
+COBERTURA = True  # segunda petición si el primer token tarda más que el p95 reciente
+UMBRAL_COBERTURA_S = 6.0  # umbral mientras no hay suficientes muestras
+CACHE_TTL = 6 * 3600
+CACHE_SIMILITUD = True
+METRICAS_ARCHIVO = os.path.join(LOG_DIR, "metrics.prom")  # texto de Prometheus para node_exporter/textfile
+METRICAS_INTERVALO_S = 10.0
+CONOCIMIENTO_ARCHIVO = os.path.join(DIRECTORIO_APP, "conocimiento", "tecnicas.json")  # índice BM25 junto a él (.bm25)
+CONOCIMIENTO_UMBRAL_DIRECTO = 0.6  # confianza mínima para responder sin llamar al modelo
+CONOCIMIENTO_UMBRAL_PASAJES = 0.35  # confianza mínima para añadir pasajes al prompt
+CONOCIMIENTO_PUNTUACION_MINIMA = 4.0  # puntuación BM25 mínima de una respuesta directa
+METRICAS_PUERTO = int(os.getenv("MINDLY_METRICS_PORT", "0"))  # >0 sirve /metrics en ese puerto
+
+@st.cache_resource
+def obtener_configuracion():
+    """Secrets y variables de entorno resueltos y validados una sola vez por proceso.
+    
+    Si la configuración es válida, un cambio en secrets.toml no se aplica hasta reiniciar la app.
+    """
+    api_key = st.secrets.get("MISTRAL_API_KEY",
+              st.secrets.get("mistralapi",
+              os.getenv("MISTRAL_API_KEY",
+              os.getenv("mistralapi", "")))).strip()
+    if not api_key:
+        error_api_key = "vacia"
+    elif len(api_key) < 20:  # Las API keys suelen ser largas
+        error_api_key = "corta"
+    else:
+        error_api_key = None
+    return {
+        "MISTRAL_API_KEY": api_key,
+        "error_api_key": error_api_key,
+        "MISTRAL_SERVER_URL": st.secrets.get("MISTRAL_SERVER_URL", os.getenv("MISTRAL_SERVER_URL", "")),
+        "GITHUB_TOKEN": st.secrets.get("GITHUB_TOKEN", ""),
+        "GIST_ID": st.secrets.get("GIST_ID", ""),
+        "GITHUB_API_URL": st.secrets.get("GITHUB_API_URL", os.getenv("GITHUB_API_URL", "")),
+    }
 
-MISTRAL_API_KEY = st.secrets.get("MISTRAL_API_KEY", 
-                 st.secrets.get("mistralapi", 
-                 os.getenv("MISTRAL_API_KEY", 
-                 os.getenv("mistralapi", ""))))
+with perfil_arranque.fase("configuracion"):
+    configuracion = obtener_configuracion()
 
-if not MISTRAL_API_KEY or MISTRAL_API_KEY.strip() == "":
-    st.error("❌ No se encontró la API key de Mistral o está vacía")
-    st.info("💡 Configura MISTRAL_API_KEY en .streamlit/secrets.toml o como variable de entorno")
-    
-    if ADMIN_MODE:
-        st.warning("🔧 Debug Info (Solo Admin):")
-        st.code(f"""
-        secrets: {st.secrets.get("MISTRAL_API_KEY", "NO ENCONTRADO")}
-        env: {os.getenv("MISTRAL_API_KEY", "NO ENCONTRADO")}
-        """)
+if configuracion["error_api_key"]:
+    obtener_configuracion.clear()  # volver a leerla en el siguiente rerun, por si se corrige secrets.toml
+    if configuracion["error_api_key"] == "vacia":
+        st.error("❌ No se encontró la API key de Mistral o está vacía")
+        st.info("💡 Configura MISTRAL_API_KEY en .streamlit/secrets.toml o como variable de entorno")
+        
+        if ADMIN_MODE:
+            st.warning("🔧 Debug Info (Solo Admin):")
+            st.code(f"""
+            secrets: {st.secrets.get("MISTRAL_API_KEY", "NO ENCONTRADO")}
+            env: {os.getenv("MISTRAL_API_KEY", "NO ENCONTRADO")}
+            """)
+    else:
+        st.error("❌ La API key parece ser demasiado corta o inválida")
+        if ADMIN_MODE:
+            st.code(f"API Key length: {len(configuracion['MISTRAL_API_KEY'])} characters")
     st.stop()
 
-if len(MISTRAL_API_KEY.strip()) < 20:  # Las API keys suelen ser largas
-    st.error("❌ La API key parece ser demasiado corta o inválida")
-    if ADMIN_MODE:
-        st.code(f"API Key length: {len(MISTRAL_API_KEY)} characters")
-    st.stop()
+MISTRAL_API_KEY = configuracion["MISTRAL_API_KEY"]
+MISTRAL_SERVER_URL = configuracion["MISTRAL_SERVER_URL"]
+GITHUB_TOKEN = configuracion["GITHUB_TOKEN"]
+GIST_ID = configuracion["GIST_ID"]
+GITHUB_API_URL = configuracion["GITHUB_API_URL"]  # vacío = API pública de GitHub
+GIST_COMPRIMIR = False  # fragmentos gzip+base64 en lugar de JSONL plano
+MODULOS_PRECARGA = ("mistralai", "mindly_http")  # se importan en segundo plano tras el primer render
+
+inicio_recursos = time.perf_counter()
+
+@st.cache_resource
+def obtener_registro_metricas():
+    """Tiempos por etapa de todo el proceso"""
+    registro = RegistroMetricas()
+    if METRICAS_PUERTO:
+        registro.servir_prometheus(METRICAS_PUERTO)
+    return registro
+
+registro_metricas = obtener_registro_metricas()
+
+@st.cache_resource
+def obtener_estadisticas_http():
+    """Estadísticas de conexiones de cada cliente HTTP, según se van creando"""
+    return {}
+
+@st.cache_resource
+def obtener_cliente_mistral(api_key, server_url=""):
+    """Cliente de Mistral compartido entre reruns y sesiones (reutiliza conexiones).
+    
+    Se crea con el primer turno que lo necesita, no al cargar la página.
+    """
+    with perfil_arranque.importando("mistralai"):
+        from mistralai import Mistral
+        from mindly_http import crear_cliente_httpx
+    http_client, stats = crear_cliente_httpx(max_conexiones=HTTP_POOL_MAX)
+    obtener_estadisticas_http()["Mistral"] = stats.resumen
+    return Mistral(api_key=api_key, client=http_client, server_url=server_url or None), stats
+
+def cliente_mistral():
+    return obtener_cliente_mistral(MISTRAL_API_KEY, MISTRAL_SERVER_URL)[0]
+
+@st.cache_resource
+def obtener_sesion_http():
+    """Sesión HTTP compartida para las llamadas a la API de GitHub"""
+    with perfil_arranque.importando("requests"):
+        from mindly_http import SesionHTTP
+    sesion = SesionHTTP(pool_max=HTTP_POOL_MAX)
+    obtener_estadisticas_http()["GitHub"] = sesion.estadisticas
+    return sesion
+
+@st.cache_resource
+def obtener_hoja_estilos():
+    """CSS minificado una sola vez por proceso; devuelve (URL en static/ o None, css)"""
+    try:
+        archivo, css = construir_hoja_estilos(ESTILOS_ORIGEN, os.path.join(DIRECTORIO_APP, "static"))
+    except OSError:
+        # Sin permiso de escritura: se minifica en memoria y se inyecta en línea
+        with open(ESTILOS_ORIGEN, encoding="utf-8") as f:
+            return None, minificar_css(f.read())
+    url = f"app/static/{archivo}" if st.get_option("server.enableStaticServing") else None
+    return url, css
 
-try:
-    client = Mistral(api_key=MISTRAL_API_KEY.strip())
-except Exception as e:
-    error_str = str(e)
-    if "Illegal header value" in error_str:
-        st.error("❌ Error: API key inválida o vacía")
-        st.info("🔑 Verifica que tu MISTRAL_API_KEY esté correctamente configurada")
+def load_custom_css():
+    # Streamlit borra en cada rerun lo que no se vuelve a emitir, así que se emite siempre,
+    # pero solo una etiqueta <link>: el navegador descarga la hoja una vez y la guarda en caché
+    url, css = obtener_hoja_estilos()
+    if url:
+        st.markdown(f'<link rel="stylesheet" href="{url}">', unsafe_allow_html=True)
     else:
-        st.error(f"❌ Error al conectar con Mistral: {error_str}")
-    st.stop() 
-
-GITHUB_TOKEN = st.secrets.get("GITHUB_TOKEN", "")
-GIST_ID = st.secrets.get("GIST_ID", "")
-
-class GistManager:
-    def __init__(self, token, gist_id=None):
-        self.token = token
-        self.gist_id = gist_id
-        self.headers = {
-            "Authorization": f"token {token}",
-            "Accept": "application/vnd.github.v3+json"
-        }
-    
-    def crear_gist(self, filename, content, description="Chat logs de Mindly"):
-        """Crear un nuevo Gist"""
-        data = {
-            "description": description,
-            "public": False,
-            "files": {
-                filename: {
-                    "content": content
-                }
-            }
-        }
-        
-        response = requests.post(
-            "https://api.github.com/gists",
-            headers=self.headers,
-            json=data
-        )
-        
-        if response.status_code == 201:
-            gist_data = response.json()
-            self.gist_id = gist_data["id"]
-            return True, gist_data["id"], gist_data["html_url"]
-        else:
-            return False, None, response.json()
-    
-    def actualizar_gist(self, filename, content):
-        """Actualizar un Gist existente"""
-        if not self.gist_id:
-            return False, "No hay Gist ID configurado"
-        
-        data = {
-            "files": {
-                filename: {
-                    "content": content
-                }
-            }
-        }
-        
-        response = requests.patch(
-            f"https://api.github.com/gists/{self.gist_id}",
-            headers=self.headers,
-            json=data
-        )
-        
-        if response.status_code == 200:
-            return True, response.json()["html_url"]
-        else:
-            return False, response.json()
-    
-    def obtener_gist(self):
-        """Obtener contenido del Gist"""
-        if not self.gist_id:
-            return False, "No hay Gist ID configurado"
-        
-        response = requests.get(
-            f"https://api.github.com/gists/{self.gist_id}",
-            headers=self.headers
-        )
-        
-        if response.status_code == 200:
-            return True, response.json()
-        else:
-            return False, response.json()
-    
-    def subir_logs(self, logs_data):
-        """Subir logs al Gist"""
-        content = json.dumps(logs_data, ensure_ascii=False, indent=2)
-        
-        if self.gist_id:
-            success, result = self.actualizar_gist("chat_log.json", content)
-            return success, result
-        else:
-            success, gist_id, url = self.crear_gist("chat_log.json", content)
-            if success:
-                st.session_state.gist_id = gist_id
-            return success, url if success else gist_id
+        st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
 
-def load_custom_css():
-    st.markdown("""
-    <style>
-    /* [TODOS LOS ESTILOS CSS ANTERIORES - MANTENGO LOS MISMOS] */
-    @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600&family=Inter:wght@300;400;500&display=swap');
-    
-    :root {
-        --primary-color: #6B73FF;
-        --secondary-color: #9B59B6;
-        --accent-color: #3498DB;
-        --background-soft: #F8F9FF;
-        --text-primary: #2C3E50;
-        --text-secondary: #5A6C7D;
-        --success-color: #27AE60;
-        --warning-color: #F39C12;
-        --gentle-purple: #E8E4F3;
-        --gentle-blue: #E3F2FD;
-    }
-    
-    .main {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        background-attachment: fixed;
-    }
-    
-    .block-container {
-        background: rgba(255, 255, 255, 0.95);
-        border-radius: 20px;
-        padding: 2rem;
-        margin-top: 2rem;
-        backdrop-filter: blur(10px);
-        box-shadow: 0 8px 32px rgba(0, 0, 0, 0.1);
-        border: 1px solid rgba(255, 255, 255, 0.2);
-    }
-    
-    h1 {
-        font-family: 'Poppins', sans-serif;
-        color: var(--primary-color);
-        text-align: center;
-        font-weight: 600;
-        font-size: 2.5rem;
-        margin-bottom: 1rem;
-        text-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }
-    
-    .subtitle {
-        font-family: 'Inter', sans-serif;
-        color: var(--text-secondary);
-        text-align: center;
-        font-size: 1.1rem;
-        margin-bottom: 2rem;
-        font-weight: 300;
-    }
-    
-    .stChatMessage {
-        background: rgba(255, 255, 255, 0.9);
-        border-radius: 15px;
-        padding: 1rem;
-        margin: 0.5rem 0;
-        box-shadow: 0 2px 10px rgba(0, 0, 0, 0.1);
-        font-family: 'Inter', sans-serif;
-        border-left: 4px solid transparent;
-    }
-    
-    [data-testid="user-message"] {
-        background: linear-gradient(135deg, var(--gentle-blue) 0%, #E1F5FE 100%);
-        border-left-color: var(--accent-color);
-    }
-    
-    [data-testid="assistant-message"] {
-        background: linear-gradient(135deg, var(--gentle-purple) 0%, #F3E5F5 100%);
-        border-left-color: var(--secondary-color);
-    }
-    
-    .stChatInputContainer {
-        background: rgba(255, 255, 255, 0.9);
-        border-radius: 25px;
-        padding: 0.5rem;
-        margin-top: 1rem;
-        box-shadow: 0 4px 15px rgba(0, 0, 0, 0.1);
-        border: 2px solid rgba(107, 115, 255, 0.3);
-    }
-    
-    .stChatInputContainer:focus-within {
-        border-color: var(--primary-color);
-        box-shadow: 0 4px 20px rgba(107, 115, 255, 0.3);
-    }
-    
-    .stSpinner {
-        color: var(--primary-color);
-    }
-    
-    .stButton > button {
-        background: linear-gradient(135deg, var(--primary-color) 0%, var(--secondary-color) 100%);
-        color: white;
-        border: none;
-        border-radius: 10px;
-        padding: 0.5rem 1.5rem;
-        font-family: 'Poppins', sans-serif;
-        font-weight: 500;
-        transition: all 0.3s ease;
-    }
-    
-    .stButton > button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 5px 15px rgba(107, 115, 255, 0.4);
-    }
-    
-    .css-1d391kg {
-        background: linear-gradient(180deg, var(--gentle-purple) 0%, white 100%);
-    }
-    
-    .stMarkdown {
-        font-family: 'Inter', sans-serif;
-        color: var(--text-primary);
-        line-height: 1.6;
-    }
-    
-    .stChatMessage:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 20px rgba(0, 0, 0, 0.15);
-        transition: all 0.3s ease;
-    }
-    
-    @keyframes fadeInUp {
-        from {
-            opacity: 0;
-            transform: translateY(30px);
-        }
-        to {
-            opacity: 1;
-            transform: translateY(0);
-        }
-    }
-    
-    .main {
-        animation: fadeInUp 0.8s ease-out;
-    }
-    
-    ::-webkit-scrollbar {
-        width: 8px;
-    }
-    
-    ::-webkit-scrollbar-track {
-        background: rgba(255, 255, 255, 0.1);
-        border-radius: 10px;
-    }
-    
-    ::-webkit-scrollbar-thumb {
-        background: linear-gradient(180deg, var(--primary-color), var(--secondary-color));
-        border-radius: 10px;
-    }
-    
-    ::-webkit-scrollbar-thumb:hover {
-        background: var(--accent-color);
-    }
-    
-    @media (max-width: 600px) {
-        .block-container {
-            padding: 1rem !important;
-            margin-top: 1rem !important;
-            border-radius: 10px !important;
-        }
-
-        .stButton > button {
-            font-size: 18px !important;
-            padding: 1rem 2rem !important;
-        }
-
-        .stChatInputContainer textarea {
-            font-size: 18px !important;
-            min-height: 50px !important;
-        }
-
-        h1 {
-            font-size: 2rem !important;
-            margin-bottom: 1rem !important;
-        }
-
-        .subtitle {
-            font-size: 1rem !important;
-            margin-bottom: 1.5rem !important;
-        }
-
-        .main > div[role="main"] {
-            padding-left: 1rem !important;
-            padding-right: 1rem !important;
-        }
-
-        .stChatMessage {
-            font-size: 17px !important;
-            padding: 0.8rem !important;
-            margin: 0.4rem 0 !important;
-        }
-    }
-    
-    /* Indicador de modo administrador */
-    /* Estilos para historial de conversaciones */
-    .conversation-item {
-        background: rgba(255, 255, 255, 0.8);
-        border-radius: 8px;
-        padding: 0.5rem;
-        margin: 0.3rem 0;
-        border-left: 3px solid var(--accent-color);
-        transition: all 0.2s ease;
-    }
-    
-    .conversation-item:hover {
-        background: rgba(255, 255, 255, 0.95);
-        transform: translateX(2px);
-    }
-    
-    .conversation-meta {
-        font-size: 0.8rem;
-        color: var(--text-secondary);
-        margin-top: 0.2rem;
-    }
-    
-    /* Indicador de modo administrador */
-    .admin-indicator {
-        position: fixed;
-        top: 10px;
-        right: 10px;
-        background: rgba(39, 174, 96, 0.9);
-        color: white;
-        padding: 0.3rem 0.8rem;
-        border-radius: 15px;
-        font-size: 0.8rem;
-        font-weight: 500;
-        z-index: 1000;
-    }
-    
-    .gist-section {
-        background: rgba(39, 174, 96, 0.1);
-        border-radius: 10px;
-        padding: 1rem;
-        border-left: 4px solid var(--success-color);
-        margin: 1rem 0;
-    }
-    
-    .gist-info {
-        background: rgba(52, 152, 219, 0.1);
-        border-radius: 8px;
-        padding: 0.8rem;
-        border-left: 3px solid var(--accent-color);
-    }
-    </style>
-    """, unsafe_allow_html=True)
+@st.cache_resource
+def obtener_backend_log():
+    """Almacén de logs (con su archivo comprimido) compartido por todas las sesiones del proceso"""
+    backend = abrir_log(LOG_BACKEND, LOG_DIR, LOG_SQLITE)
+    migrar_json_legacy(LOG_FILE, backend)
+    return backend
 
-try:
-    with open(LOG_FILE, "r", encoding="utf-8") as f:
-        chat_log = json.load(f)
-except FileNotFoundError:
-    chat_log = []
-
-def detectar_intencion(mensaje):
-    mensaje = mensaje.lower()
-    if re.search(r"\b(ansiedad|depresión|estrés|angustia|tristeza|miedo)\b", mensaje):
-        return "consulta_emocional"
-    elif re.search(r"\b(ayuda|consejo|apoyo|orientación|escuchar)\b", mensaje):
-        return "solicitud_ayuda"
-    elif re.search(r"\b(técnica|herramienta|ejercicio|estrategia|psicoterapia|mindfulness|respiración)\b", mensaje):
-        return "consulta_tecnica"
-    elif re.search(r"\b(urgente|crisis|emergencia)\b", mensaje):
-        return "situacion_urgente"
-    else:
-        return "intencion_desconocida"
+@st.cache_resource
+def obtener_escritor_log():
+    """Hilo escritor del log, uno por proceso"""
+    return EscritorLogAsincrono(obtener_backend_log(), max_cola=LOG_COLA_MAX, politica=LOG_POLITICA,
+                                metricas=registro_metricas)
+
+escritor_log = obtener_escritor_log()
+
+CAMPOS_METRICAS_LOG = ("modelo", "ttft_ms", "duracion_ms", "cache", "tokens_prompt",
+                       "tokens_respuesta", "ms_ahorrados_urgencia", "espera_ms", "cobertura", "cobertura_ganada",
+                       "conocimiento")
 
-def guardar_log(usuario_msg, modelo_resp, intencion):
+def guardar_log(usuario_msg, modelo_resp, intencion, metricas=None):
     entrada = {
         "timestamp": datetime.now().isoformat(),
         "usuario": usuario_msg,
         "respuesta": modelo_resp,
         "intencion": intencion
     }
-    chat_log.append(entrada)
-    with open(LOG_FILE, "w", encoding="utf-8") as f:
-        json.dump(chat_log, f, ensure_ascii=False, indent=2)
+    if metricas:
+        entrada.update({k: v for k, v in metricas.items() if k in CAMPOS_METRICAS_LOG})
+    escritor_log.encolar(entrada)
+
+@st.cache_resource
+def obtener_planificador():
+    """Planificador de peticiones a Mistral, compartido por todas las sesiones"""
+    return PlanificadorMistral(rps=MISTRAL_RPS, tpm=MISTRAL_TPM, presupuesto_espera=ESPERA_MAX_S)
+
+planificador = obtener_planificador()
+
+@st.cache_resource
+def obtener_enrutador():
+    """Enrutador de modelos; sus latencias recientes se comparten entre sesiones"""
+    return EnrutadorModelos(REGLAS_MODELO, por_defecto=MODELO, umbral_latencia_ms=UMBRAL_LATENCIA_MODELO_MS)
+
+enrutador = obtener_enrutador()
+
+@st.cache_resource
+def obtener_cobertura():
+    """Plazos y cobertura de las peticiones al modelo; las latencias se comparten entre sesiones"""
+    return CoberturaLLM(plazo_total_s=PLAZO_RESPUESTA_S, activa=COBERTURA, umbral_por_defecto_s=UMBRAL_COBERTURA_S)
+
+cobertura = obtener_cobertura()
+
+def id_sesion():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
+@st.cache_resource
+def obtener_almacen_sesiones():
+    """Historiales de todas las sesiones, acotados en memoria"""
+    return AlmacenSesiones(SESIONES_DIR, max_memoria=MAX_HISTORY*2, inactividad_s=SESION_INACTIVIDAD_S,
+                           retencion_s=SESIONES_RETENCION_DIAS * 86400)
+
+almacen_sesiones = obtener_almacen_sesiones()
+historial = almacen_sesiones.obtener(id_sesion())
+
+@st.cache_resource
+def obtener_base_conocimiento():
+    """Base de técnicas con su índice BM25 mapeado en memoria; None si no hay archivo"""
+    from mindly_conocimiento import BaseConocimiento
+    if not os.path.exists(CONOCIMIENTO_ARCHIVO):
+        return None
+    return BaseConocimiento(CONOCIMIENTO_ARCHIVO, umbral_directo=CONOCIMIENTO_UMBRAL_DIRECTO,
+                            umbral_pasajes=CONOCIMIENTO_UMBRAL_PASAJES,
+                            puntuacion_minima=CONOCIMIENTO_PUNTUACION_MINIMA)
+
+base_conocimiento = obtener_base_conocimiento()
+
+motor_chat = MotorChat(
+    cliente_mistral, enrutador, planificador, cobertura,
+    ConstructorContexto(CONTEXTO_MAX_TOKENS, max_mensajes=MAX_HISTORY*2),
+    registro=registro_metricas,
+    plazo_s=PLAZO_RESPUESTA_S,
+    tokens_respuesta_estimados=TOKENS_RESPUESTA_ESTIMADOS,
+    conocimiento=base_conocimiento
+)
 
-def chat(message, history, system_message):
-    try:
-        messages = [{"role": "system", "content": system_message}]
-        messages.extend(history[-MAX_HISTORY*2:])
-        messages.append({"role": "user", "content": message})
+@st.cache_resource
+def obtener_cache_respuestas():
+    """Caché de respuestas; solo comparte entre sesiones preguntas técnicas impersonales y nunca cachea urgencias"""
+    return CacheRespuestas(
+        ttl=CACHE_TTL,
+        similitud=CACHE_SIMILITUD,
+        excluir=lambda texto: detectar_intencion(texto) == "situacion_urgente",
+        compartible=lambda texto: detectar_intencion(texto) == "consulta_tecnica"
+    )
+
+cache_respuestas = obtener_cache_respuestas()
+
+def registrar_turno(metricas):
+    """Pasar las métricas de un turno al registro del proceso"""
+    registro_metricas.contar("turnos")
+    if metricas.get("cache"):
+        registro_metricas.contar("aciertos_cache")
+        return
+    if metricas.get("conocimiento"):
+        registro_metricas.contar(f"conocimiento_{metricas['conocimiento']}")
+        if metricas.get("modelo") == MODELO_LOCAL:
+            return
+    if metricas.get("error"):
+        registro_metricas.contar("errores_modelo")
+        return
+    if "ttft_ms" in metricas:
+        registro_metricas.observar("modelo_ttft", metricas["ttft_ms"])
+    if "duracion_ms" in metricas:
+        registro_metricas.observar("modelo_total", metricas["duracion_ms"])
+
+def mostrar_latencias_admin():
+    """Tabla de latencias por etapa (ventana reciente) para el panel de administrador"""
+    ms = lambda valor: round(valor, 1) if valor is not None else None
+    filas = [
+        {"Etapa": ETAPAS.get(etapa, etapa), "Muestras": datos["total"],
+         "p50 (ms)": ms(datos["p50_ms"]), "p95 (ms)": ms(datos["p95_ms"]), "p99 (ms)": ms(datos["p99_ms"])}
+        for etapa, datos in registro_metricas.resumen().items()
+    ]
+    with st.expander("⏱️ Latencias por etapa"):
+        if filas:
+            st.dataframe(filas, hide_index=True)
+        else:
+            st.caption("Aún no hay mediciones.")
+        contadores = registro_metricas.contadores()
+        if contadores:
+            st.caption(" • ".join(f"{nombre}: {valor}" for nombre, valor in sorted(contadores.items())))
+        st.caption(f"Prometheus: {METRICAS_ARCHIVO}" + (f" • :{METRICAS_PUERTO}/metrics" if METRICAS_PUERTO else ""))
+
+@st.cache_resource
+def obtener_analitica():
+    """Columnas del log en memoria para la analítica; se amplían solo con lo nuevo"""
+    with perfil_arranque.importando("numpy"):
+        from mindly_analitica import AnaliticaLog
+    return AnaliticaLog()
+
+def mostrar_analitica_admin(backend):
+    """Gráficos de intención por día, carga horaria y longitudes para el panel de administrador"""
+    if not st.toggle("📊 Analítica del log"):
+        return
+    with perfil_arranque.importando("pandas"):
+        import pandas as pd  # solo hace falta para los gráficos
+    
+    analitica = obtener_analitica().actualizar(backend)
+    dias, categorias, matriz = analitica.intenciones_por_dia()
+    if not len(dias):
+        st.caption("Aún no hay datos.")
+        return
+    st.markdown("**Intención por día**")
+    st.area_chart(pd.DataFrame(matriz, index=pd.to_datetime(dias), columns=categorias))
+    
+    carga = analitica.carga_horaria()
+    st.markdown("**Mensajes por hora del día**")
+    st.bar_chart(pd.DataFrame({"mensajes": carga["por_hora_del_dia"]}))
+    st.caption(
+        f"⏰ Hora pico: {carga['hora_pico']}:00 • máximo {carga['max_por_hora']} mensajes en una hora "
+        f"({carga['momento_pico']}) • p95 {carga['p95_por_hora']:.0f} mensajes/hora"
+    )
+    
+    longitudes = analitica.percentiles_longitud()
+    st.caption(
+        "✏️ Longitud p50/p90/p99 (caracteres): "
+        f"mensajes {longitudes['usuario']['p50']:.0f}/{longitudes['usuario']['p90']:.0f}/{longitudes['usuario']['p99']:.0f} • "
+        f"respuestas {longitudes['respuesta']['p50']:.0f}/{longitudes['respuesta']['p90']:.0f}/{longitudes['respuesta']['p99']:.0f}"
+    )
+
+def mostrar_archivo_admin(lector_log):
+    """Compactación del log y exportaciones por periodo e intención para el panel de administrador"""
+    with st.expander("🗄️ Archivo y exportación"):
+        if st.button(f"🗜️ Compactar entradas de más de {ARCHIVO_DIAS} días"):
+            with st.spinner("Compactando..."):
+                archivadas = lector_log.compactar((datetime.now() - timedelta(days=ARCHIVO_DIAS)).isoformat())
+            st.success(f"✅ {archivadas} entradas archivadas" if archivadas else "No hay entradas tan antiguas")
+        stats_archivo = lector_log.archivo.estadisticas()
+        if stats_archivo["entradas"]:
+            st.caption(
+                f"🗜️ {stats_archivo['entradas']} entradas archivadas en {stats_archivo['bloques']} bloques "
+                f"{'/'.join(stats_archivo['codecs'])} • {stats_archivo['bytes'] / 1024:.0f} KB, "
+                f"{stats_archivo['ratio']:.1f}x menos que sin comprimir"
+            )
+        
+        periodo = st.selectbox("Periodo", list(PERIODOS_EXPORTACION))
+        intenciones = st.multiselect("Intenciones (todas si no eliges ninguna)", sorted(lector_log.conteo_intenciones()))
+        if st.button("📤 Exportar selección"):
+            dias = PERIODOS_EXPORTACION[periodo]
+            desde = (datetime.now() - timedelta(days=dias)).isoformat() if dias else None
+            antes = lector_log.archivo.estadisticas()
+            temporal = tempfile.NamedTemporaryFile(suffix=".json", delete=False)
+            try:
+                inicio = time.perf_counter()
+                with temporal:
+                    exportadas = lector_log.exportar(temporal, desde=desde, intenciones=intenciones or None)
+                duracion_ms = (time.perf_counter() - inicio) * 1000
+                despues = lector_log.archivo.estadisticas()
+                leidos = despues["bloques_leidos"] - antes["bloques_leidos"]
+                saltados = despues["bloques_saltados"] - antes["bloques_saltados"]
+                st.caption(f"{exportadas} entradas en {duracion_ms:.0f} ms • "
+                           f"{leidos} de {leidos + saltados} bloques archivados descomprimidos")
+                with open(temporal.name, "rb") as exportado:
+                    st.download_button(
+                        label="💾 Descargar JSON",
+                        data=exportado,
+                        file_name=f"mindly_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                        mime="application/json"
+                    )
+            finally:
+                os.remove(temporal.name)
+
+def mostrar_arranque_admin():
+    """Tiempos del arranque del proceso (primera ejecución e imports diferidos)"""
+    fases = perfil_arranque.fases()
+    imports = perfil_arranque.imports()
+    with st.expander("🚀 Arranque del proceso"):
+        if "primer render" in fases:
+            st.caption(f"Primer render: {fases['primer render']:.0f} ms desde el inicio del script")
+        st.dataframe([{"Fase": fase, "ms": ms} for fase, ms in fases.items()], hide_index=True)
+        if imports:
+            st.dataframe(
+                [{"Import diferido": modulo, "ms": datos["ms"], "Cuándo": datos["origen"]}
+                 for modulo, datos in sorted(imports.items(), key=lambda par: -par[1]["ms"])],
+                hide_index=True
+            )
 
-        response = client.chat.complete(
-            model="mistral-large-latest",
-            messages=messages
+def mostrar_metricas_admin():
+    """Métricas operativas del proceso para el panel de administrador"""
+    mostrar_arranque_admin()
+    mostrar_latencias_admin()
+    
+    stats_sesiones = almacen_sesiones.estadisticas()
+    st.caption(
+        f"🗂️ Sesiones: {stats_sesiones['sesiones']} en memoria • "
+        f"{stats_sesiones['bytes_por_sesion'] / 1024:.1f} KB/sesión (máx. {stats_sesiones['bytes_por_sesion_max'] / 1024:.1f} KB, "
+        f"esta {historial.tamano_bytes() / 1024:.1f} KB) • "
+        f"{stats_sesiones['mensajes_memoria']} de {stats_sesiones['mensajes_total']} mensajes en memoria • "
+        f"{stats_sesiones['hibernadas']} hibernadas"
+    )
+    
+    stats_log = escritor_log.estadisticas()
+    st.caption(
+        f"📝 Escritor de log: cola {stats_log['profundidad']} (máx. {stats_log['profundidad_max']}) • "
+        f"{stats_log['escritas']} escritas • {stats_log['descartadas']} descartadas • "
+        f"latencia media {stats_log['latencia_media_ms']:.1f} ms"
+    )
+    
+    for nombre, resumen_http in list(obtener_estadisticas_http().items()):
+        stats_http = resumen_http()
+        st.caption(
+            f"🔌 {nombre}: {stats_http['peticiones']} peticiones • "
+            f"{stats_http['conexiones_nuevas']} conexiones nuevas • "
+            f"{stats_http['tasa_reutilizacion']:.0%} reutilizadas"
         )
-
-        return response.choices[0].message.content
     
-    except Exception as e:
-        error_msg = str(e)
-        if "401" in error_msg or "unauthorized" in error_msg.lower():
-            return "❌ Lo siento, no puedo procesar tu solicitud ahora. La clave de API de Mistral es incorrecta. Si eres el administrador, por favor revisa la configuración."
-        elif "429" in error_msg or "rate limit" in error_msg.lower():
-            return "⏳ Hemos alcanzado el límite de solicitudes. Por favor, espera unos minutos y vuelve a intentarlo."
-        elif "400" in error_msg or "bad request" in error_msg.lower():
-            return "⚠️ Hubo un problema con la solicitud. Tal vez el mensaje era muy largo. ¿Podrías intentar una versión más corta?"
-        elif "500" in error_msg or "internal server error" in error_msg.lower():
-            return "🔧 Ups, parece que Mistral está teniendo problemas técnicos. Por favor, intenta de nuevo en unos momentos."
-        else:
-            return f"❌ Ha ocurrido un error inesperado. Por favor, revisa tu conexión a internet e inténtalo de nuevo."
+    stats_cache = cache_respuestas.estadisticas()
+    st.caption(
+        f"⚡ Caché: {stats_cache['tasa_aciertos']:.0%} aciertos "
+        f"({stats_cache['aciertos_exactos']} exactos, {stats_cache['aciertos_similares']} similares) • "
+        f"{stats_cache['ms_ahorrados'] / 1000:.1f} s ahorrados • {stats_cache['entradas']} entradas"
+    )
+    
+    if base_conocimiento is not None:
+        stats_con = base_conocimiento.estadisticas()
+        st.caption(
+            f"📚 Conocimiento: {stats_con['consultas']} consultas • "
+            f"{stats_con['tasa_directas']:.0%} respondidas sin modelo, {stats_con['pasajes']} con pasajes • "
+            f"búsqueda p50/p99 {stats_con['busqueda_p50_us']:.0f}/{stats_con['busqueda_p99_us']:.0f} µs"
+        )
+    
+    for modelo, stats_modelo in enrutador.estadisticas().items():
+        p50 = f"{stats_modelo['p50_ms']:.0f} ms" if stats_modelo['p50_ms'] is not None else "—"
+        st.caption(f"🧭 {modelo}: {stats_modelo['elegido']} turnos • p50 {p50} • {stats_modelo['fallos_recientes']} fallos recientes")
+    
+    stats_plan = planificador.estadisticas()
+    st.caption(
+        f"🚦 Planificador: {stats_plan['en_cola']} en cola (máx. {stats_plan['en_cola_max']}) • "
+        f"espera media {stats_plan['espera_media_ms']:.0f} ms, p95 {stats_plan['espera_p95_ms']:.0f} ms • "
+        f"{stats_plan['reintentos_429']} reintentos 429 • {stats_plan['rechazadas']} rechazadas"
+    )
+    
+    stats_cob = cobertura.estadisticas()
+    ms = lambda valor: f"{valor:.0f}" if valor is not None else "—"
+    st.caption(
+        f"🛡️ Cobertura: {stats_cob['coberturas_lanzadas']} lanzadas, {stats_cob['coberturas_ganadas']} ganadas • "
+        f"umbral {ms(stats_cob['umbral_ms'])} ms • {stats_cob['plazos_agotados']} plazos agotados"
+    )
+    st.caption(
+        f"⏱️ Primer token p50/p95/p99: sin cobertura {ms(stats_cob['sin_cobertura_p50_ms'])}/"
+        f"{ms(stats_cob['sin_cobertura_p95_ms'])}/{ms(stats_cob['sin_cobertura_p99_ms'])} ms • "
+        f"con cobertura {ms(stats_cob['efectiva_p50_ms'])}/{ms(stats_cob['efectiva_p95_ms'])}/"
+        f"{ms(stats_cob['efectiva_p99_ms'])} ms"
+    )
+
+perfil_arranque.registrar("recursos compartidos", (time.perf_counter() - inicio_recursos) * 1000)
 
 # ==== Interfaz en Streamlit ====
 st.set_page_config(
@@ -458,51 +549,43 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-load_custom_css()
+with perfil_arranque.fase("estilos"), registro_metricas.medir("css"):
+    load_custom_css()
 
 if ADMIN_MODE:
-    st.markdown("""
-    <div class="admin-indicator">
-        👑 Modo Administrador
-    </div>
-    """, unsafe_allow_html=True)
-
-st.markdown("""
-    <div style="text-align: center; margin-bottom: 2rem;">
-        <h1>🧠 Mindly</h1>
-        <p class="subtitle">Tu compañero de bienestar mental • Conversaciones empáticas y apoyo psicológico</p>
-    </div>
-""", unsafe_allow_html=True)
+    st.markdown(INDICADOR_ADMIN, unsafe_allow_html=True)
+
+st.markdown(CABECERA, unsafe_allow_html=True)
 
 with st.sidebar:
     st.markdown("### ℹ️ Sobre Mindly")
-    st.markdown("""
-    Mindly es tu asistente de bienestar mental, diseñado para:
-    - 💬 Conversaciones empáticas
-    - 🎯 Técnicas de manejo emocional  
-    - 🔍 Información psicológica confiable
-    - 🆘 Orientación en momentos difíciles
-    
-    **Recuerda:** En casos de emergencia, contacta servicios profesionales.
-    """)
+    st.markdown(SOBRE_MINDLY)
     
     if st.button("🔄 Nueva Conversación"):
-        st.session_state.history = []
+        historial.vaciar()
+        st.session_state.resumen = ResumenRodante(RESUMEN_MAX_TOKENS)
+        st.session_state.anteriores_visibles = 0
     
     if ADMIN_MODE and GITHUB_TOKEN:
         st.markdown("---")
         st.markdown("### 📊 Panel de Administrador")
         
-        if chat_log:
+        lector_log = obtener_backend_log().actualizar()
+        total_logs = lector_log.contar()
+        if total_logs:
             st.markdown(f"""
             <div class="gist-info">
             📈 <strong>Estadísticas:</strong><br>
-            • Total conversaciones: {len(chat_log)}<br>
-            • Última actualización: {chat_log[-1]['timestamp'][:19] if chat_log else 'N/A'}<br>
+            • Total conversaciones: {total_logs}<br>
+            • Última actualización: {(lector_log.ultimo_timestamp() or 'N/A')[:19]}<br>
             • Modo: Admin activo 👑
             </div>
             """, unsafe_allow_html=True)
         
+        mostrar_analitica_admin(lector_log)
+        mostrar_archivo_admin(lector_log)
+        mostrar_metricas_admin()
+        
         with st.expander("⚙️ Configurar Gist"):
             github_token_input = st.text_input(
                 "GitHub Token", 
@@ -516,20 +599,33 @@ with st.sidebar:
                 help="ID del Gist existente"
             )
         
+        with perfil_arranque.importando("mindly_gist"):
+            import requests
+            from mindly_gist import GistManager, SincronizadorGist, ErrorSincronizacion, exportar_gist, GITHUB_API
+        
         gist_manager = GistManager(
             github_token_input or GITHUB_TOKEN, 
-            gist_id_input or st.session_state.get('gist_id')
+            gist_id_input or st.session_state.get('gist_id'),
+            sesion=obtener_sesion_http(),
+            api_base=GITHUB_API_URL or GITHUB_API
         )
         
         col1, col2 = st.columns(2)
         
         with col1:
             if st.button("☁️ Subir Logs"):
-                if chat_log:
+                if total_logs:
                     with st.spinner("Subiendo..."):
-                        success, result = gist_manager.subir_logs(chat_log)
+                        sincronizador = SincronizadorGist(
+                            gist_manager,
+                            os.path.join(LOG_DIR, "gist_sync.json"),
+                            comprimir=GIST_COMPRIMIR
+                        )
+                        with registro_metricas.medir("gist_sync"):
+                            success, result, subidas = sincronizador.sincronizar(lector_log)
                         if success:
-                            st.success("✅ Logs subidos!")
+                            st.session_state.gist_id = gist_manager.gist_id
+                            st.success(f"✅ {subidas} entradas nuevas subidas!" if subidas else "✅ El Gist ya estaba al día")
                             st.markdown(f"🔗 [Ver Gist]({result})")
                         else:
                             st.error(f"❌ Error: {result}")
@@ -540,19 +636,21 @@ with st.sidebar:
             if st.button("📥 Descargar"):
                 if gist_manager.gist_id:
                     with st.spinner("Descargando..."):
-                        success, result = gist_manager.obtener_gist()
-                        if success:
-                            files = result.get('files', {})
-                            if 'chat_log.json' in files:
-                                content = files['chat_log.json']['content']
+                        temporal = tempfile.NamedTemporaryFile(suffix=".json", delete=False)
+                        try:
+                            with temporal:
+                                exportar_gist(gist_manager, temporal)
+                            with open(temporal.name, "rb") as exportado:
                                 st.download_button(
                                     label="💾 Descargar JSON",
-                                    data=content,
+                                    data=exportado,
                                     file_name=f"mindly_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
                                     mime="application/json"
                                 )
-                        else:
-                            st.error(f"❌ Error: {result}")
+                        except (ErrorSincronizacion, requests.RequestException) as e:
+                            st.error(f"❌ Error: {e}")
+                        finally:
+                            os.remove(temporal.name)
                 else:
                     st.warning("Necesitas Gist ID.")
     
@@ -561,54 +659,107 @@ with st.sidebar:
         st.markdown("### 📊 Panel de Administrador")
         st.info("🔑 Configura tu GitHub Token en secrets.toml para gestionar logs")
         
-        if chat_log:
+        lector_log = obtener_backend_log().actualizar()
+        total_logs = lector_log.contar()
+        if total_logs:
             st.markdown(f"""
             <div class="gist-info">
             📈 <strong>Estadísticas locales:</strong><br>
-            • Total conversaciones: {len(chat_log)}<br>
-            • Última actualización: {chat_log[-1]['timestamp'][:19] if chat_log else 'N/A'}<br>
-            • Archivo: chat_log.json
+            • Total conversaciones: {total_logs}<br>
+            • Última actualización: {(lector_log.ultimo_timestamp() or 'N/A')[:19]}<br>
+            • Almacén: {LOG_SQLITE if LOG_BACKEND == "sqlite" else LOG_DIR + "/"}
             </div>
             """, unsafe_allow_html=True)
+        
+        mostrar_analitica_admin(lector_log)
+        mostrar_archivo_admin(lector_log)
+        mostrar_metricas_admin()
 
 
-if "history" not in st.session_state:
-    st.session_state.history = []
+if "anteriores_visibles" not in st.session_state:
+    st.session_state.anteriores_visibles = 0
+
+if "resumen" not in st.session_state:
+    st.session_state.resumen = ResumenRodante(RESUMEN_MAX_TOKENS)
 
 if "gist_id" not in st.session_state:
     st.session_state.gist_id = GIST_ID
 
-if not st.session_state.history:
-    with st.chat_message("assistant"):
-        st.markdown(f"""
-        ¡Hola, soy **Mindly**, tu compañero de bienestar mental. 🌟
-        Estoy aquí para ayudarte con:
-        - Manejo de emociones y estrés
-        - Técnicas de relajación y mindfulness  
-        - Información sobre psicología
-        - Apoyo en momentos difíciles
-        
-        ¿En qué puedo ayudarte hoy?
-        """)
+if not historial:
+    st.chat_message("assistant").markdown(SALUDO)
 
-for message in st.session_state.history:
+# Los mensajes que ya no están en memoria se leen del disco solo si se piden
+ocultos = len(historial) - historial.en_memoria
+if ocultos > st.session_state.anteriores_visibles:
+    if st.button("⬆️ Ver mensajes anteriores", key="ver_anteriores"):
+        st.session_state.anteriores_visibles = min(st.session_state.anteriores_visibles + ANTERIORES_POR_PAGINA, ocultos)
+
+for message in historial.anteriores(st.session_state.anteriores_visibles):
+    st.chat_message(message["role"]).markdown(message["content"])
+for message in historial[ocultos:]:
     st.chat_message(message["role"]).markdown(message["content"])
 
-if prompt := st.chat_input("💭 Comparte lo que está en tu mente..."):
+prompt = st.chat_input("💭 Comparte lo que está en tu mente...")
+perfil_arranque.registrar("primer render", (time.perf_counter() - inicio_rerun) * 1000)
+
+if prompt:
     st.chat_message("user").markdown(prompt)
-    st.session_state.history.append({"role": "user", "content": prompt})
+    historial.agregar("user", prompt)
     
-    with st.spinner("🧠 Mindly está reflexionando..."):
-        try:
-            respuesta_final = chat(prompt, st.session_state.history, system_message)
-            st.chat_message("assistant").markdown(respuesta_final)
-            st.session_state.history.append({"role": "assistant", "content": respuesta_final})
-                
+    try:
+        historial_previo = historial[:-1]
+        inicio_turno = time.perf_counter()
+        with registro_metricas.medir("intencion"):
             intencion = detectar_intencion(prompt)
-            guardar_log(prompt, respuesta_final, intencion)
+        urgente = intencion == "situacion_urgente"
+        respuesta_cacheada = None if urgente else cache_respuestas.buscar(prompt, system_message, historial_previo,
+                                                                                 id_sesion())
         
-        except Exception as e:
-            st.error(f"❌ Error al procesar tu mensaje: {str(e)}")
-            respuesta_final = "Lo siento, hubo un problema al procesar tu mensaje. ¿Podrías intentarlo de nuevo?"
+        if respuesta_cacheada is not None:
+            metricas_turno = {"cache": True}
+            respuesta_final = respuesta_cacheada
             st.chat_message("assistant").markdown(respuesta_final)
-            st.session_state.history.append({"role": "assistant", "content": respuesta_final})
+        else:
+            metricas_turno = {}
+            with st.chat_message("assistant"):
+                if urgente:
+                    st.markdown(RECURSOS_CRISIS)
+                    crisis_ms = (time.perf_counter() - inicio_turno) * 1000
+                inicio_modelo_ms = (time.perf_counter() - inicio_turno) * 1000
+                if STREAMING:
+                    st.write_stream(motor_chat.chat_stream(prompt, historial, system_message,
+                                                           metricas_turno, st.session_state.resumen, id_sesion(), intencion))
+                    respuesta_final = metricas_turno["respuesta"]
+                else:
+                    with st.spinner("🧠 Mindly está reflexionando..."):
+                        respuesta_final = motor_chat.chat(prompt, historial, system_message,
+                                                          metricas_turno, st.session_state.resumen, id_sesion(), intencion)
+                    st.markdown(respuesta_final)
+            if urgente:
+                # Latencia percibida ahorrada: lo que habría tardado el primer contenido visible sin el atajo
+                primer_contenido_ms = inicio_modelo_ms + metricas_turno.get("ttft_ms", metricas_turno.get("duracion_ms", 0))
+                metricas_turno["ms_ahorrados_urgencia"] = round(max(primer_contenido_ms - crisis_ms, 0.0), 1)
+        
+        respuesta_local = metricas_turno.get("modelo") == MODELO_LOCAL
+        if not metricas_turno.get("cache") and not metricas_turno.get("error") and not urgente and not respuesta_local:
+            latencia_ms = (time.perf_counter() - inicio_turno) * 1000
+            cache_respuestas.guardar(prompt, system_message, historial_previo, respuesta_final, latencia_ms,
+                                     id_sesion())
+        
+        registrar_turno(metricas_turno)
+        contenido_historial = f"{RECURSOS_CRISIS}\n\n{respuesta_final}" if urgente else respuesta_final
+        historial.agregar("assistant", contenido_historial)
+        guardar_log(prompt, respuesta_final, intencion, metricas_turno)
+    
+    except Exception as e:
+        st.error(f"❌ Error al procesar tu mensaje: {str(e)}")
+        respuesta_final = "Lo siento, hubo un problema al procesar tu mensaje. ¿Podrías intentarlo de nuevo?"
+        st.chat_message("assistant").markdown(respuesta_final)
+        historial.agregar("assistant", respuesta_final)
+
+registro_metricas.observar("rerun", (time.perf_counter() - inicio_rerun) * 1000)
+perfil_arranque.precargar(MODULOS_PRECARGA)
+try:
+    registro_metricas.escribir_prometheus(METRICAS_ARCHIVO, METRICAS_INTERVALO_S)
+except OSError:
+    pass
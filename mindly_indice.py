@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+
+VERSION_INDICE = 1
+
+
+class LectorLogIndexado:
+    """Lectura incremental del log JSONL con un índice auxiliar en disco.
+
+    El índice (`indice.json` junto a los segmentos) guarda por segmento los bytes
+    ya procesados, el número de entradas y un offset cada `paso_offsets`
+    entradas, además del total, el último timestamp y el recuento por intención.
+    `actualizar()` solo lee lo que se ha añadido desde la última vez, así que el
+    coste de arranque y de cada interacción no depende del tamaño del log.
+    Los segmentos que desaparecen (purgados tras archivarlos) se suman a `purgadas`.
+    """
+
+    def __init__(self, store, ruta_indice=None, paso_offsets=1000):
+        self.store = store
+        self.ruta_indice = ruta_indice or os.path.join(store.directorio, "indice.json")
+        self.paso_offsets = paso_offsets
+        self._lock = threading.Lock()
+        self._indice = self._cargar()
+
+    def actualizar(self):
+        """Incorporar al índice lo escrito desde la última actualización"""
+        with self._lock:
+            cambios = False
+            presentes = {os.path.basename(ruta) for ruta in self.store.segmentos()}
+            for nombre in [n for n in self._indice["segmentos"] if n not in presentes]:
+                seg = self._indice["segmentos"].pop(nombre)
+                self._indice["purgadas"] = self._indice.get("purgadas", 0) + seg["entradas"]
+                cambios = True
+            for ruta in self.store.segmentos():
+                nombre = os.path.basename(ruta)
+                tam = os.path.getsize(ruta)
+                seg = self._indice["segmentos"].get(nombre)
+                if seg is not None and tam == seg["bytes"]:
+                    continue
+                if seg is None or tam < seg["bytes"]:
+                    # Segmento nuevo o reescrito: se indexa desde el principio
+                    seg = {"bytes": 0, "entradas": 0, "offsets": [], "intenciones": {},
+                           "ultimo_timestamp": None}
+                    self._indice["segmentos"][nombre] = seg
+                cambios |= self._leer_cola(ruta, seg)
+            if cambios:
+                self._recalcular_totales()
+                self._guardar()
+        return self
+
+    def contar(self):
+        return self._indice["total"]
+
+    def ultimo_timestamp(self):
+        return self._indice["ultimo_timestamp"]
+
+    def purgadas(self):
+        return self._indice.get("purgadas", 0)
+
+    def segmentos_indexados(self):
+        """(ruta, entradas, último timestamp) de cada segmento indexado, en orden cronológico"""
+        resultado = []
+        for ruta in self.store.segmentos():
+            seg = self._indice["segmentos"].get(os.path.basename(ruta))
+            if seg is not None:
+                resultado.append((ruta, seg["entradas"], seg["ultimo_timestamp"]))
+        return resultado
+
+    def conteo_intenciones(self):
+        return dict(self._indice["intenciones"])
+
+    def iterar_desde(self, n=0):
+        """Iterar las entradas a partir de la n-ésima (0 = todas)"""
+        base = 0
+        for ruta in self.store.segmentos():
+            seg = self._indice["segmentos"].get(os.path.basename(ruta))
+            if seg is None:
+                continue
+            if base + seg["entradas"] <= n:
+                base += seg["entradas"]
+                continue
+            local = max(n - base, 0)
+            inicio_local, offset = 0, 0
+            for i, off in seg["offsets"]:
+                if i > local:
+                    break
+                inicio_local, offset = i, off
+            with open(ruta, "rb") as f:
+                f.seek(offset)
+                actual = inicio_local
+                for linea in f:
+                    if not linea.strip():
+                        continue
+                    try:
+                        entrada = json.loads(linea)
+                    except json.JSONDecodeError:
+                        continue  # el índice tampoco la cuenta
+                    if actual >= local:
+                        yield entrada
+                    actual += 1
+                    if actual >= seg["entradas"]:
+                        break
+            base += seg["entradas"]
+
+    def _leer_cola(self, ruta, seg):
+        with open(ruta, "rb") as f:
+            f.seek(seg["bytes"])
+            datos = f.read()
+        fin = datos.rfind(b"\n")
+        if fin < 0:
+            return False  # línea a medio escribir; se leerá en la próxima actualización
+        posicion = seg["bytes"]
+        for linea in datos[:fin + 1].splitlines(keepends=True):
+            if linea.strip():
+                try:
+                    entrada = json.loads(linea)
+                except json.JSONDecodeError:
+                    # Línea corrupta: no cuenta como entrada (iterar_desde también la salta)
+                    seg["invalidas"] = seg.get("invalidas", 0) + 1
+                    posicion += len(linea)
+                    continue
+                if seg["entradas"] % self.paso_offsets == 0:
+                    seg["offsets"].append([seg["entradas"], posicion])
+                intencion = entrada.get("intencion") or "intencion_desconocida"
+                seg["intenciones"][intencion] = seg["intenciones"].get(intencion, 0) + 1
+                if entrada.get("timestamp"):
+                    seg["ultimo_timestamp"] = max(seg["ultimo_timestamp"] or "", entrada["timestamp"])
+                seg["entradas"] += 1
+            posicion += len(linea)
+        seg["bytes"] = posicion
+        return True
+
+    def _recalcular_totales(self):
+        total, ultimo, intenciones = 0, None, {}
+        for seg in self._indice["segmentos"].values():
+            total += seg["entradas"]
+            if seg["ultimo_timestamp"] and (ultimo is None or seg["ultimo_timestamp"] > ultimo):
+                ultimo = seg["ultimo_timestamp"]
+            for clave, n in seg["intenciones"].items():
+                intenciones[clave] = intenciones.get(clave, 0) + n
+        self._indice.update({"total": total, "ultimo_timestamp": ultimo, "intenciones": intenciones})
+
+    def _vacio(self):
+        return {"version": VERSION_INDICE, "total": 0, "ultimo_timestamp": None,
+                "intenciones": {}, "segmentos": {}}
+
+    def _cargar(self):
+        try:
+            with open(self.ruta_indice, "r", encoding="utf-8") as f:
+                indice = json.load(f)
+            if indice.get("version") == VERSION_INDICE:
+                return indice
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        return self._vacio()
+
+    def _guardar(self):
+        temporal = f"{self.ruta_indice}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(self._indice, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temporal, self.ruta_indice)
@@ -0,0 +1,124 @@
+import codecs
+import re
+import unicodedata
+from collections import namedtuple
+
+# Orden = prioridad en caso de empate; "situacion_urgente" siempre gana si aparece
+CATEGORIAS = {
+    "situacion_urgente": ("urgente", "crisis", "emergencia"),
+    "consulta_emocional": ("ansiedad", "depresión", "estrés", "angustia", "tristeza", "miedo"),
+    "solicitud_ayuda": ("ayuda", "consejo", "apoyo", "orientación", "escuchar"),
+    "consulta_tecnica": ("técnica", "herramienta", "ejercicio", "estrategia", "psicoterapia",
+                         "mindfulness", "respiración"),
+}
+PRIORIDAD_URGENTE = "situacion_urgente"
+DESCONOCIDA = "intencion_desconocida"
+
+# Variantes con diacríticos de cada letra plegada: el patrón las acepta directamente y
+# así el mensaje no tiene que plegarse antes de buscar
+VARIANTES = {"a": "aáàâä", "e": "eéèêë", "i": "iíìîï", "o": "oóòôö", "u": "uúùûü", "n": "nñ", "c": "cç"}
+
+ResultadoIntencion = namedtuple("ResultadoIntencion", ["etiqueta", "puntuaciones", "urgente"])
+
+
+def _sin_diacriticos(error):
+    """Manejador de errores de codificación: las marcas diacríticas desaparecen y
+    cualquier otro carácter no ASCII (rayas, comillas, ¿, emojis...) se convierte
+    en un espacio, para que no pegue las palabras de alrededor"""
+    trozo = error.object[error.start:error.end]
+    return "".join("" if unicodedata.combining(c) else " " for c in trozo), error.end
+
+
+codecs.register_error("mindly_plegar", _sin_diacriticos)
+
+
+def plegar(texto):
+    """Minúsculas y sin tildes ni otros diacríticos; el resto de caracteres no ASCII, espacios"""
+    texto = texto.lower()
+    if texto.isascii():
+        return texto
+    return unicodedata.normalize("NFKD", texto).encode("ascii", "mindly_plegar").decode("ascii")
+
+
+def _clase(letra):
+    variantes = VARIANTES.get(letra)
+    return f"[{variantes}]" if variantes else re.escape(letra)
+
+
+def _regex_trie(palabras):
+    """Alternancia factorizada por prefijos comunes (trie), más rápida que una lista plana"""
+    trie = {}
+    for palabra in palabras:
+        nodo = trie
+        for letra in palabra:
+            nodo = nodo.setdefault(letra, {})
+        nodo[""] = True
+
+    def construir(nodo):
+        ramas = [_clase(letra) + construir(hijo) for letra, hijo in sorted(nodo.items()) if letra]
+        if not ramas:
+            return ""
+        cuerpo = ramas[0] if len(ramas) == 1 else "(?:" + "|".join(ramas) + ")"
+        return f"(?:{cuerpo})?" if "" in nodo else cuerpo
+
+    return construir(trie)
+
+
+class ClasificadorIntencion:
+    """Clasificador de intención en una sola pasada.
+
+    Todas las palabras clave, ya plegadas, se compilan una vez en una única
+    alternancia factorizada por prefijos que acepta cada letra con o sin
+    diacríticos; cada mensaje solo se pasa a minúsculas (NFC) y se recorre con
+    una sola búsqueda; solo las coincidencias se pliegan. El resultado incluye la puntuación (número de coincidencias) de
+    cada categoría, de modo que un mensaje puede tener varias etiquetas, y la
+    etiqueta principal respeta la prioridad de urgencia.
+    """
+
+    def __init__(self, categorias=CATEGORIAS):
+        self.orden = list(categorias)
+        self._prioridad = {categoria: -i for i, categoria in enumerate(self.orden)}
+        self._categoria_de = {}
+        for categoria, palabras in categorias.items():
+            for palabra in palabras:
+                self._categoria_de.setdefault(plegar(palabra), categoria)
+        iniciales = "".join(sorted({VARIANTES.get(p[0], p[0]) for p in self._categoria_de}))
+        # La anticipación descarta enseguida las palabras que no empiezan como ninguna clave
+        self._patron = re.compile(rf"\b(?=[{iniciales}])(?:" + _regex_trie(self._categoria_de) + r")\b")
+        # Forma encontrada en el texto (con o sin tildes) -> categoría; se rellena al vuelo
+        self._vistas = dict(self._categoria_de)
+
+    def clasificar(self, mensaje):
+        puntuaciones = {}
+        mensaje = mensaje.lower()
+        if not mensaje.isascii() and not unicodedata.is_normalized("NFC", mensaje):
+            mensaje = unicodedata.normalize("NFC", mensaje)  # tildes como carácter aparte (p. ej. en macOS)
+        for encontrada in self._patron.findall(mensaje):
+            categoria = self._vistas.get(encontrada)
+            if categoria is None:
+                categoria = self._vistas[encontrada] = self._categoria_de[plegar(encontrada)]
+            puntuaciones[categoria] = puntuaciones.get(categoria, 0) + 1
+
+        if not puntuaciones:
+            return ResultadoIntencion(DESCONOCIDA, puntuaciones, False)
+        if PRIORIDAD_URGENTE in puntuaciones:
+            return ResultadoIntencion(PRIORIDAD_URGENTE, puntuaciones, True)
+        etiqueta = max(puntuaciones, key=lambda c: (puntuaciones[c], self._prioridad[c]))
+        return ResultadoIntencion(etiqueta, puntuaciones, False)
+
+    def clasificar_lote(self, mensajes):
+        return [self.clasificar(m) for m in mensajes]
+
+    def reclasificar_log(self, entradas):
+        """Iterar las entradas del log con `intencion` recalculada"""
+        for entrada in entradas:
+            nueva = dict(entrada)
+            nueva["intencion"] = self.clasificar(entrada.get("usuario", "")).etiqueta
+            yield nueva
+
+
+clasificador = ClasificadorIntencion()
+
+
+def detectar_intencion(mensaje):
+    return clasificador.clasificar(mensaje).etiqueta
@@ -0,0 +1,253 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+# Segmentos: <prefijo>-AAAAMMDD-NNN.jsonl (un día por segmento, rotación por tamaño dentro del día)
+PATRON_SEGMENTO = r"^{prefijo}-(\d{{8}})-(\d{{3}})\.jsonl$"
+
+
+class LogStore:
+    """Almacén de logs append-only en segmentos JSONL.
+
+    Cada entrada se escribe como una línea añadida al final del segmento activo,
+    así que el coste por turno no depende del tamaño total del log. Los fsync se
+    agrupan: se hacen cada `fsync_cada` entradas o cada `fsync_intervalo` segundos.
+    """
+
+    def __init__(self, directorio, prefijo="chat_log", max_bytes_segmento=5 * 1024 * 1024,
+                 fsync_cada=20, fsync_intervalo=2.0):
+        self.directorio = directorio
+        self.prefijo = prefijo
+        self.max_bytes_segmento = max_bytes_segmento
+        self.fsync_cada = fsync_cada
+        self.fsync_intervalo = fsync_intervalo
+        self._patron = re.compile(PATRON_SEGMENTO.format(prefijo=re.escape(prefijo)))
+        self._lock = threading.Lock()
+        self._archivo = None
+        self._ruta_activa = None
+        self._dia_activo = None
+        self._pendientes = 0
+        self._ultimo_fsync = time.monotonic()
+        os.makedirs(directorio, exist_ok=True)
+
+    def segmentos(self):
+        """Rutas de todos los segmentos, en orden cronológico"""
+        nombres = []
+        for nombre in os.listdir(self.directorio):
+            m = self._patron.match(nombre)
+            if m:
+                nombres.append((m.group(1), int(m.group(2)), nombre))
+        nombres.sort()
+        return [os.path.join(self.directorio, n) for _, _, n in nombres]
+
+    def segmento_activo(self):
+        """Ruta del segmento abierto para escritura (None si aún no se ha escrito nada)"""
+        return self._ruta_activa
+
+    def agregar(self, entrada):
+        """Añadir una entrada al log"""
+        self.agregar_lote([entrada])
+
+    def agregar_lote(self, entradas):
+        """Añadir varias entradas con una sola escritura por segmento"""
+        with self._lock:
+            grupo, dia_grupo = [], None
+            for entrada in entradas:
+                dia = self._dia(entrada)
+                if grupo and dia != dia_grupo:
+                    self._escribir(dia_grupo, grupo)
+                    grupo = []
+                dia_grupo = dia
+                grupo.append(json.dumps(entrada, ensure_ascii=False, separators=(",", ":")) + "\n")
+            if grupo:
+                self._escribir(dia_grupo, grupo)
+            self._fsync_si_toca()
+
+    def flush(self):
+        """Forzar escritura a disco de lo pendiente"""
+        with self._lock:
+            self._fsync()
+
+    def cerrar(self):
+        with self._lock:
+            self._fsync()
+            if self._archivo:
+                self._archivo.close()
+                self._archivo = None
+
+    def leer_todo(self):
+        """Iterar todas las entradas de todos los segmentos"""
+        with self._lock:
+            if self._archivo:
+                self._archivo.flush()
+        for ruta in self.segmentos():
+            with open(ruta, "r", encoding="utf-8") as f:
+                for linea in f:
+                    linea = linea.strip()
+                    if linea:
+                        yield json.loads(linea)
+
+    def _dia(self, entrada):
+        ts = entrada.get("timestamp") or datetime.now().isoformat()
+        return ts[:10].replace("-", "")
+
+    def _escribir(self, dia, lineas):
+        datos = "".join(lineas).encode("utf-8")
+        self._asegurar_segmento(dia, len(datos))
+        self._archivo.write(datos)
+        self._archivo.flush()
+        self._pendientes += len(lineas)
+
+    def _asegurar_segmento(self, dia, tam_nuevo):
+        if self._archivo and self._dia_activo == dia:
+            if self._archivo.tell() + tam_nuevo <= self.max_bytes_segmento or self._archivo.tell() == 0:
+                return
+        self._fsync()
+        if self._archivo:
+            self._archivo.close()
+            self._archivo = None
+
+        # Reabrir el último segmento del día si aún tiene espacio, si no crear el siguiente
+        indice = 0
+        existentes = [r for r in self.segmentos() if self._patron.match(os.path.basename(r)).group(1) == dia]
+        if existentes:
+            ultimo = existentes[-1]
+            indice = int(self._patron.match(os.path.basename(ultimo)).group(2))
+            if os.path.getsize(ultimo) + tam_nuevo > self.max_bytes_segmento and os.path.getsize(ultimo) > 0:
+                indice += 1
+        ruta = os.path.join(self.directorio, f"{self.prefijo}-{dia}-{indice:03d}.jsonl")
+        _quitar_linea_cortada(ruta)
+        self._archivo = open(ruta, "ab")
+        self._ruta_activa = ruta
+        self._dia_activo = dia
+
+    def _fsync_si_toca(self):
+        if not self._pendientes:
+            return
+        if (self._pendientes >= self.fsync_cada
+                or time.monotonic() - self._ultimo_fsync >= self.fsync_intervalo):
+            self._fsync()
+
+    def _fsync(self):
+        if self._archivo and self._pendientes:
+            self._archivo.flush()
+            os.fsync(self._archivo.fileno())
+        self._pendientes = 0
+        self._ultimo_fsync = time.monotonic()
+
+
+def _quitar_linea_cortada(ruta):
+    """Truncar una última línea sin salto (escritura cortada) para no pegarle la siguiente entrada"""
+    try:
+        with open(ruta, "r+b") as f:
+            tam = f.seek(0, os.SEEK_END)
+            if tam == 0:
+                return
+            f.seek(tam - 1)
+            if f.read(1) == b"\n":
+                return
+            inicio = max(tam - 64 * 1024, 0)
+            while True:
+                f.seek(inicio)
+                fin = f.read(tam - inicio).rfind(b"\n")
+                if fin >= 0 or inicio == 0:
+                    break
+                inicio = max(inicio - 64 * 1024, 0)
+            f.truncate(inicio + fin + 1 if fin >= 0 else 0)
+    except FileNotFoundError:
+        pass
+
+
+def migrar_json_legacy(ruta_json, store, sufijo=".migrado"):
+    """Migrar el chat_log.json antiguo (un array JSON) al almacén JSONL.
+
+    Se ejecuta una sola vez: al terminar, el archivo original se renombra con
+    `sufijo` para que no se vuelva a importar. Si arrancan varios procesos a la
+    vez, solo migra el que consigue reservar el archivo (renombrándolo). Si un
+    proceso murió a mitad de una migración, su reserva se retoma aquí sin
+    duplicar lo que ya llegó al almacén. Devuelve el número de entradas migradas.
+    """
+    migradas = 0
+    for reservado in migraciones_interrumpidas(ruta_json):
+        propio = f"{ruta_json}.{os.getpid()}.migrando"
+        try:
+            os.rename(reservado, propio)
+        except FileNotFoundError:
+            continue  # otro proceso la ha retomado antes
+        migradas += _migrar(propio, ruta_json, store, sufijo, reanudar=True)
+
+    reservado = f"{ruta_json}.{os.getpid()}.migrando"
+    try:
+        os.rename(ruta_json, reservado)
+    except FileNotFoundError:
+        return migradas
+    return migradas + _migrar(reservado, ruta_json, store, sufijo)
+
+
+def migraciones_interrumpidas(ruta_json):
+    """Reservas `<ruta_json>.<pid>.migrando` de procesos que ya no existen"""
+    patron = re.compile(re.escape(os.path.basename(ruta_json)) + r"\.(\d+)\.migrando$")
+    directorio = os.path.dirname(ruta_json) or "."
+    rutas = []
+    for nombre in sorted(os.listdir(directorio)):
+        m = patron.match(nombre)
+        if m and not _proceso_vivo(int(m.group(1))):
+            rutas.append(os.path.join(directorio, nombre))
+    return rutas
+
+
+def _proceso_vivo(pid):
+    if pid == os.getpid():
+        return False  # de un proceso anterior con el mismo pid: este no está migrando nada
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _migrar(reservado, ruta_json, store, sufijo, reanudar=False):
+    try:
+        with open(reservado, "r", encoding="utf-8") as f:
+            entradas = json.load(f)
+    except json.JSONDecodeError:
+        os.replace(reservado, ruta_json)
+        return 0
+    if not isinstance(entradas, list):
+        os.replace(reservado, ruta_json)
+        return 0
+
+    if reanudar:
+        entradas = _sin_migradas(entradas, store)
+    store.agregar_lote(entradas)
+    store.flush()
+    os.replace(reservado, ruta_json + sufijo)
+    return len(entradas)
+
+
+def _clave(entrada):
+    return json.dumps(entrada, ensure_ascii=False, sort_keys=True)
+
+
+def _sin_migradas(entradas, store):
+    """Quitar las entradas que una migración interrumpida ya dejó en el almacén"""
+    timestamps = {e.get("timestamp") for e in entradas}
+    if hasattr(store, "iterar_desde"):
+        existentes = store.actualizar().iterar_desde(0)
+    else:
+        existentes = store.leer_todo()
+    ya = Counter(_clave(e) for e in existentes if e.get("timestamp") in timestamps)
+    pendientes = []
+    for entrada in entradas:
+        clave = _clave(entrada)
+        if ya[clave]:
+            ya[clave] -= 1
+        else:
+            pendientes.append(entrada)
+    return pendientes
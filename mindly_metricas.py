@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from mindly_cobertura import percentil
+
+# Límites superiores (ms) de los cubos del histograma, al estilo de Prometheus
+CUBOS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+ETAPAS = {
+    "rerun": "Ejecución completa del script",
+    "css": "Inyección de estilos",
+    "intencion": "Detección de intención",
+    "contexto": "Construcción del contexto",
+    "conocimiento": "Búsqueda en la base de conocimiento",
+    "modelo_ttft": "Modelo: primer token",
+    "modelo_total": "Modelo: respuesta completa",
+    "log_escritura": "Escritura de un lote del log",
+    "gist_sync": "Sincronización con Gist",
+}
+
+
+class HistogramaRodante:
+    """Histograma acumulado (para Prometheus) más una ventana de muestras recientes.
+
+    Los cubos y la suma cuentan desde el arranque del proceso; los percentiles se
+    calculan sobre las muestras de los últimos `ventana_s` segundos (como mucho
+    `max_muestras`).
+    """
+
+    def __init__(self, cubos=CUBOS_MS, ventana_s=300.0, max_muestras=2000):
+        self.cubos = tuple(cubos)
+        self.ventana_s = ventana_s
+        self.conteos = [0] * (len(self.cubos) + 1)
+        self.suma_ms = 0.0
+        self.total = 0
+        self._recientes = deque(maxlen=max_muestras)
+
+    def observar(self, ms, ahora):
+        self.conteos[bisect_left(self.cubos, ms)] += 1
+        self.suma_ms += ms
+        self.total += 1
+        self._recientes.append((ahora, ms))
+
+    def recientes(self, ahora):
+        limite = ahora - self.ventana_s
+        while self._recientes and self._recientes[0][0] < limite:
+            self._recientes.popleft()
+        return [ms for _, ms in self._recientes]
+
+
+class RegistroMetricas:
+    """Tiempos por etapa y contadores del proceso.
+
+    Observar una muestra es una búsqueda binaria y un append bajo un lock, así
+    que se puede llamar en cada turno sin coste apreciable. Los datos se exportan
+    en formato de texto de Prometheus a un archivo (`escribir_prometheus`) o por
+    HTTP en /metrics (`servir_prometheus`).
+    """
+
+    def __init__(self, prefijo="mindly", ventana_s=300.0, reloj=time.monotonic):
+        self.prefijo = prefijo
+        self.ventana_s = ventana_s
+        self.reloj = reloj
+        self._lock = threading.Lock()
+        self._histogramas = {}
+        self._contadores = {}
+        self._ultima_escritura = 0.0
+        self._servidor = None
+
+    def observar(self, etapa, ms):
+        with self._lock:
+            histograma = self._histogramas.get(etapa)
+            if histograma is None:
+                histograma = self._histogramas[etapa] = HistogramaRodante(ventana_s=self.ventana_s)
+            histograma.observar(ms, self.reloj())
+
+    @contextmanager
+    def medir(self, etapa):
+        """Medir el bloque `with` como una muestra de `etapa`"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(etapa, (time.perf_counter() - inicio) * 1000)
+
+    def contar(self, nombre, n=1):
+        with self._lock:
+            self._contadores[nombre] = self._contadores.get(nombre, 0) + n
+
+    def resumen(self):
+        """Por etapa: muestras totales, recientes y percentiles de la ventana"""
+        ahora = self.reloj()
+        with self._lock:
+            datos = {etapa: (h.total, h.recientes(ahora)) for etapa, h in self._histogramas.items()}
+        resumen = {}
+        for etapa, (total, recientes) in sorted(datos.items()):
+            resumen[etapa] = {
+                "total": total,
+                "recientes": len(recientes),
+                "media_ms": sum(recientes) / len(recientes) if recientes else None,
+                "p50_ms": percentil(recientes, 0.50),
+                "p95_ms": percentil(recientes, 0.95),
+                "p99_ms": percentil(recientes, 0.99),
+            }
+        return resumen
+
+    def contadores(self):
+        with self._lock:
+            return dict(self._contadores)
+
+    def prometheus(self):
+        """Texto en el formato de exposición de Prometheus"""
+        nombre = f"{self.prefijo}_etapa_duracion_ms"
+        lineas = [f"# HELP {nombre} Duración de cada etapa de un turno en milisegundos",
+                  f"# TYPE {nombre} histogram"]
+        with self._lock:
+            for etapa, h in sorted(self._histogramas.items()):
+                acumulado = 0
+                for limite, conteo in zip([f"{c:g}" for c in h.cubos] + ["+Inf"], h.conteos):
+                    acumulado += conteo
+                    lineas.append(f'{nombre}_bucket{{etapa="{etapa}",le="{limite}"}} {acumulado}')
+                lineas.append(f'{nombre}_sum{{etapa="{etapa}"}} {h.suma_ms:.3f}')
+                lineas.append(f'{nombre}_count{{etapa="{etapa}"}} {h.total}')
+            for contador, valor in sorted(self._contadores.items()):
+                lineas.append(f"# TYPE {self.prefijo}_{contador}_total counter")
+                lineas.append(f"{self.prefijo}_{contador}_total {valor}")
+        return "\n".join(lineas) + "\n"
+
+    def escribir_prometheus(self, ruta, intervalo_s=0.0):
+        """Escribir el texto de Prometheus en `ruta` (de forma atómica).
+
+        Con `intervalo_s` se omite la escritura si la anterior fue hace menos de
+        ese tiempo. Devuelve si se escribió.
+        """
+        ahora = self.reloj()
+        with self._lock:
+            if ahora - self._ultima_escritura < intervalo_s:
+                return False
+            self._ultima_escritura = ahora
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(temporal, ruta)
+        return True
+
+    def servir_prometheus(self, puerto, host="127.0.0.1"):
+        """Servir /metrics en un hilo de fondo; devuelve la URL"""
+        if self._servidor is None:
+            registro = self
+
+            class Manejador(BaseHTTPRequestHandler):
+                def log_message(self, *args):
+                    pass
+
+                def do_GET(self):
+                    if self.path.split("?")[0].rstrip("/") != "/metrics":
+                        self.send_error(404)
+                        return
+                    datos = registro.prometheus().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(datos)))
+                    self.end_headers()
+                    self.wfile.write(datos)
+
+            self._servidor = ThreadingHTTPServer((host, puerto), Manejador)
+            self._servidor.daemon_threads = True
+            threading.Thread(target=self._servidor.serve_forever, name="mindly-metricas",
+                             daemon=True).start()
+        host, puerto = self._servidor.server_address
+        return f"http://{host}:{puerto}/metrics"
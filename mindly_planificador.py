@@ -0,0 +1,164 @@
+import random
+import threading
+import time
+from collections import deque
+
+
+class LimiteEsperaExcedido(Exception):
+    """La petición no pudo enviarse dentro del presupuesto de espera"""
+
+
+class CuboTokens:
+    """Token bucket: `capacidad` como ráfaga máxima, se rellena a `tasa` por segundo"""
+
+    def __init__(self, tasa, capacidad, reloj=time.monotonic):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.reloj = reloj
+        self._tokens = capacidad
+        self._ultimo = reloj()
+
+    def _rellenar(self):
+        ahora = self.reloj()
+        self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+        self._ultimo = ahora
+
+    def espera_para(self, n):
+        """Segundos hasta que haya `n` tokens (0 si ya los hay)"""
+        self._rellenar()
+        n = min(n, self.capacidad)
+        return 0.0 if self._tokens >= n else (n - self._tokens) / self.tasa
+
+    def consumir(self, n):
+        self._rellenar()
+        self._tokens -= min(n, self.capacidad)
+
+
+def es_limite_peticiones(error):
+    if getattr(error, "status_code", None) == 429:
+        return True
+    texto = str(error).lower()
+    return "429" in texto or "rate limit" in texto
+
+
+def retry_after(error):
+    """Segundos indicados por la cabecera Retry-After de la respuesta del error, si la hay"""
+    respuesta = getattr(error, "raw_response", None)
+    valor = respuesta.headers.get("retry-after") if respuesta is not None else None
+    try:
+        return float(valor) if valor is not None else None
+    except ValueError:
+        return None
+
+
+class PlanificadorMistral:
+    """Planificador de peticiones a Mistral compartido por todo el proceso.
+
+    Antes de cada llamada se reserva una petición del cubo de peticiones por
+    segundo (`rps`) y los tokens estimados del cubo de tokens por minuto (`tpm`).
+    Las sesiones que esperan se atienden por turnos (round robin), de modo que
+    una sesión con muchas peticiones no deja sin servicio al resto. Si la API
+    responde 429, se pausa el envío para todos durante `Retry-After` (o un
+    backoff exponencial con jitter) y se reintenta, siempre dentro de
+    `presupuesto_espera` segundos; si no es posible, se propaga el error para que
+    la interfaz muestre el mensaje amable.
+
+    `reloj` y `esperar(condicion, segundos)` se pueden sustituir por un reloj
+    falso en las pruebas.
+    """
+
+    def __init__(self, rps=1.0, tpm=500_000, rafaga=2, max_reintentos=3, espera_base=1.0,
+                 presupuesto_espera=20.0, reloj=time.monotonic, esperar=threading.Condition.wait):
+        self.max_reintentos = max_reintentos
+        self.espera_base = espera_base
+        self.presupuesto_espera = presupuesto_espera
+        self.reloj = reloj
+        self.esperar = esperar
+        self._peticiones = CuboTokens(rps, rafaga, reloj)
+        self._tokens = CuboTokens(tpm / 60.0, tpm, reloj)
+        self._cond = threading.Condition()
+        self._colas = {}
+        self._turnos = deque()
+        self._pausa_hasta = 0.0
+        self._esperas_ms = deque(maxlen=1000)
+        self._stats = {"peticiones": 0, "en_cola_max": 0, "reintentos_429": 0,
+                       "rechazadas": 0, "espera_total_ms": 0.0}
+
+    def ejecutar(self, sesion_id, llamada, tokens_estimados=0, presupuesto=None, metricas=None):
+        """Ejecutar `llamada()` respetando los límites; devuelve su resultado"""
+        limite = self.reloj() + (self.presupuesto_espera if presupuesto is None else presupuesto)
+        espera_total = 0.0
+        for intento in range(self.max_reintentos + 1):
+            espera_total += self._adquirir(sesion_id, tokens_estimados, limite)
+            if metricas is not None:
+                metricas["espera_ms"] = round(espera_total * 1000, 1)
+            try:
+                return llamada()
+            except Exception as e:
+                if not es_limite_peticiones(e) or intento == self.max_reintentos:
+                    raise
+                espera = retry_after(e)
+                if espera is None:
+                    espera = self.espera_base * (2 ** intento) * random.uniform(0.5, 1.0)
+                if self.reloj() + espera > limite:
+                    raise
+                with self._cond:
+                    self._stats["reintentos_429"] += 1
+                    self._pausa_hasta = max(self._pausa_hasta, self.reloj() + espera)
+                    self._cond.notify_all()
+
+    def estadisticas(self):
+        with self._cond:
+            stats = dict(self._stats)
+            esperas = sorted(self._esperas_ms)
+            stats["en_cola"] = sum(len(c) for c in self._colas.values())
+        stats["espera_media_ms"] = stats["espera_total_ms"] / stats["peticiones"] if stats["peticiones"] else 0.0
+        stats["espera_p95_ms"] = esperas[int(len(esperas) * 0.95) - 1] if esperas else 0.0
+        return stats
+
+    def _adquirir(self, sesion_id, tokens, limite):
+        inicio = self.reloj()
+        ticket = object()
+        with self._cond:
+            if sesion_id not in self._colas:
+                self._colas[sesion_id] = deque()
+                self._turnos.append(sesion_id)
+            self._colas[sesion_id].append(ticket)
+            self._stats["en_cola_max"] = max(self._stats["en_cola_max"],
+                                             sum(len(c) for c in self._colas.values()))
+            try:
+                while True:
+                    ahora = self.reloj()
+                    espera = None
+                    if self._turnos[0] == sesion_id and self._colas[sesion_id][0] is ticket:
+                        espera = max(self._pausa_hasta - ahora,
+                                     self._peticiones.espera_para(1),
+                                     self._tokens.espera_para(tokens))
+                        if espera <= 0:
+                            self._peticiones.consumir(1)
+                            self._tokens.consumir(tokens)
+                            break
+                    restante = limite - ahora
+                    if restante <= 0 or (espera is not None and espera > restante):
+                        self._stats["rechazadas"] += 1
+                        raise LimiteEsperaExcedido("Límite de solicitudes: tiempo de espera agotado")
+                    self.esperar(self._cond, min(espera, restante) if espera is not None else restante)
+            finally:
+                self._retirar(sesion_id, ticket)
+                self._cond.notify_all()
+
+            esperado = self.reloj() - inicio
+            self._stats["peticiones"] += 1
+            self._stats["espera_total_ms"] += esperado * 1000
+            self._esperas_ms.append(esperado * 1000)
+            return esperado
+
+    def _retirar(self, sesion_id, ticket):
+        cola = self._colas[sesion_id]
+        es_turno = self._turnos[0] == sesion_id and cola[0] is ticket
+        cola.remove(ticket)
+        if not cola:
+            del self._colas[sesion_id]
+            self._turnos.remove(sesion_id)
+        elif es_turno:
+            self._turnos.rotate(-1)
@@ -0,0 +1,346 @@
+"""Replay offline del log: vuelve a enviar los mensajes registrados al modelo.
+
+Sirve para medir el efecto de cambiar `system_message`, el modelo o el
+historial en la latencia y los tokens antes de tocar la app. Cada mensaje
+(`usuario` de cada entrada) pasa por el mismo `MotorChat.chat()` que usa la app
+(contexto, enrutador, planificador, plazo y cobertura), con hasta
+`--concurrencia` peticiones en vuelo a la vez.
+
+El origen puede ser el antiguo `chat_log.json`, un JSONL, el directorio de
+segmentos `chat_logs/` o la base SQLite; por defecto es el log de la app, abierto
+como lo abre ella (`MINDLY_LOG_BACKEND`, `MINDLY_LOG_SQLITE`). Cada resultado se añade al momento a
+`--salida` (una línea JSON compacta por mensaje), que hace de checkpoint: si se
+interrumpe, al relanzar el mismo comando se siguen solo los que faltan.
+
+Uso:
+    python mindly_replay.py --salida replay.jsonl --concurrencia 16
+    python mindly_replay.py chat_logs/ --modelo mistral-small-latest --system-message prompt.txt
+    python mindly_replay.py chat_log.json --server-url http://127.0.0.1:8000  # benchmarks/fake_mistral.py
+"""
+import argparse
+import ast
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from mindly_analitica import FuenteArchivo
+from mindly_archivo import abrir_log
+from mindly_chat import MotorChat
+from mindly_cobertura import CoberturaLLM, percentil
+from mindly_conocimiento import BaseConocimiento
+from mindly_contexto import ConstructorContexto
+from mindly_http import crear_cliente_httpx
+from mindly_intencion import detectar_intencion
+from mindly_planificador import PlanificadorMistral
+from mindly_router import EnrutadorModelos, REGLAS_POR_DEFECTO, MODELO_GRANDE
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+CONFIG_APP = ("system_message", "CONTEXTO_MAX_TOKENS", "PLAZO_RESPUESTA_S", "COBERTURA", "UMBRAL_COBERTURA_S",
+              "TOKENS_RESPUESTA_ESTIMADOS", "UMBRAL_LATENCIA_MODELO_MS", "ESPERA_MAX_S",
+              "CONOCIMIENTO_UMBRAL_DIRECTO", "CONOCIMIENTO_UMBRAL_PASAJES", "CONOCIMIENTO_PUNTUACION_MINIMA",
+              "LOG_DIR")
+
+
+def config_app(ruta=os.path.join(RAIZ, "mindly_ia.py")):
+    """Constantes literales de mindly_ia.py, leídas sin ejecutarlo (el script arranca Streamlit)"""
+    with open(ruta, encoding="utf-8") as f:
+        arbol = ast.parse(f.read())
+    config = {}
+    for nodo in arbol.body:
+        if isinstance(nodo, ast.Assign) and len(nodo.targets) == 1 and isinstance(nodo.targets[0], ast.Name):
+            nombre = nodo.targets[0].id
+            if nombre in CONFIG_APP:
+                try:
+                    config[nombre] = ast.literal_eval(nodo.value)
+                except ValueError:
+                    pass
+    return config
+
+
+def abrir_fuente(ruta):
+    """Fuente de entradas según la ruta: directorio de segmentos, SQLite o archivo suelto.
+
+    Los backends se abren con su archivo comprimido, así que también se
+    reproducen las entradas ya compactadas.
+    """
+    if os.path.isdir(ruta):
+        return abrir_log("jsonl", ruta).actualizar()
+    if ruta.endswith((".sqlite3", ".sqlite", ".db")):
+        return abrir_log("sqlite", os.path.dirname(ruta) or ".", ruta).actualizar()
+    return FuenteArchivo(ruta)
+
+
+def ruta_log_app(app):
+    """Dónde escribe la app su log: el directorio de segmentos o la base SQLite"""
+    directorio = app.get("LOG_DIR", "chat_logs")
+    if os.getenv("MINDLY_LOG_BACKEND", "jsonl") == "sqlite":
+        return os.getenv("MINDLY_LOG_SQLITE", os.path.join(directorio, "chat_log.sqlite3"))
+    return directorio
+
+
+class ArchivoResultados:
+    """Resultados en JSONL; la primera línea guarda la configuración del replay.
+
+    Al abrir un archivo existente se recuperan los índices ya procesados (y se
+    descarta una última línea a medias), así el replay se reanuda donde quedó.
+    Las entradas que terminaron en error se vuelven a intentar.
+    """
+
+    def __init__(self, ruta, config, reiniciar=False):
+        self.ruta = ruta
+        self.hechos = set()
+        if reiniciar and os.path.exists(ruta):
+            os.remove(ruta)
+        if os.path.exists(ruta):
+            self._cargar(config)
+        self._archivo = open(ruta, "a", encoding="utf-8")
+        if not self.hechos and self._archivo.tell() == 0:
+            self._escribir({"config": config})
+
+    def _cargar(self, config):
+        valido = 0
+        with open(self.ruta, "rb") as f:
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break  # escritura cortada
+                datos = json.loads(linea)
+                if "config" in datos and datos["config"] != config:
+                    raise SystemExit(f"{self.ruta} es de un replay con otra configuración; usa --reiniciar u otra --salida")
+                if "i" in datos and not datos.get("error"):
+                    self.hechos.add(datos["i"])
+                valido += len(linea)
+        if valido != os.path.getsize(self.ruta):
+            with open(self.ruta, "r+b") as f:
+                f.truncate(valido)
+
+    def _escribir(self, datos):
+        self._archivo.write(json.dumps(datos, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._archivo.flush()
+
+    def agregar(self, resultado):
+        self._escribir(resultado)
+        if not resultado.get("error"):
+            self.hechos.add(resultado["i"])
+
+    def cerrar(self):
+        self._archivo.close()
+
+
+def entradas_pendientes(fuente, hechos, max_history=0, limite=None):
+    """(índice, entrada, historial) de cada entrada con mensaje que falta por reproducir.
+
+    El log no guarda a qué sesión pertenece cada entrada, así que el historial
+    son las `max_history` entradas anteriores del log: sirve para medir el coste
+    de enviar historial, no para reproducir conversaciones exactas.
+    """
+    anteriores = deque(maxlen=max_history or None)
+    for i, entrada in enumerate(fuente.iterar_desde(0)):
+        if limite is not None and i >= limite:
+            return
+        usuario = entrada.get("usuario")
+        if usuario and i not in hechos:
+            history = []
+            for previa in anteriores:
+                history.append({"role": "user", "content": previa.get("usuario") or ""})
+                history.append({"role": "assistant", "content": previa.get("respuesta") or ""})
+            yield i, entrada, history
+        if max_history:
+            anteriores.append(entrada)
+
+
+def reproducir_entrada(motor, i, entrada, history, system_message, stream):
+    """Enviar un mensaje del log por el camino de chat de la app y medirlo"""
+    intencion = detectar_intencion(entrada["usuario"])
+    metricas = {}
+    if stream:
+        for _ in motor.chat_stream(entrada["usuario"], history, system_message, metricas,
+                                   sesion_id=f"replay-{i}", intencion=intencion):
+            pass
+    else:
+        motor.chat(entrada["usuario"], history, system_message, metricas,
+                   sesion_id=f"replay-{i}", intencion=intencion)
+    resultado = {
+        "i": i,
+        "ms": metricas.get("duracion_ms"),
+        "tok_prompt": metricas.get("tokens_prompt"),
+        "tok_resp": metricas.get("tokens_respuesta"),
+        "intencion": intencion,
+        "intencion_log": entrada.get("intencion"),
+        "modelo": metricas.get("modelo"),
+    }
+    if "ttft_ms" in metricas:
+        resultado["ttft_ms"] = metricas["ttft_ms"]
+    if metricas.get("cobertura_ganada"):
+        resultado["cobertura"] = True
+    if metricas.get("conocimiento"):
+        resultado["conocimiento"] = metricas["conocimiento"]
+    if metricas.get("error"):
+        resultado["error"] = True
+    return resultado
+
+
+async def reproducir(motor, pendientes, resultados, concurrencia, system_message, stream, total=None):
+    """Reproducir las entradas con como mucho `concurrencia` peticiones en vuelo"""
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrencia))
+    semaforo = asyncio.Semaphore(concurrencia)
+    tareas = set()
+    stats = {"hechos": 0, "errores": 0}
+    inicio = ultimo_aviso = time.monotonic()
+
+    async def una(i, entrada, history):
+        nonlocal ultimo_aviso
+        try:
+            resultado = await asyncio.to_thread(reproducir_entrada, motor, i, entrada, history, system_message, stream)
+            resultados.agregar(resultado)
+            stats["hechos"] += 1
+            stats["errores"] += bool(resultado.get("error"))
+            if time.monotonic() - ultimo_aviso >= 5:
+                ultimo_aviso = time.monotonic()
+                ritmo = stats["hechos"] / (ultimo_aviso - inicio)
+                print(f"  {len(resultados.hechos)}{f'/{total}' if total else ''} • {ritmo:.1f} mensajes/s • "
+                      f"{stats['errores']} errores", file=sys.stderr)
+        finally:
+            semaforo.release()
+
+    # El semáforo se adquiere antes de crear cada tarea: nunca hay más de `concurrencia`
+    # entradas leídas en memoria, aunque el log tenga millones
+    for i, entrada, history in pendientes:
+        await semaforo.acquire()
+        tarea = asyncio.create_task(una(i, entrada, history))
+        tareas.add(tarea)
+        tarea.add_done_callback(tareas.discard)
+    if tareas:
+        await asyncio.gather(*tareas)
+    return stats
+
+
+def resumen(ruta):
+    """Agregados de un archivo de resultados completo (incluidas ejecuciones anteriores)"""
+    por_indice = {}
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            datos = json.loads(linea)
+            if "i" in datos:
+                por_indice[datos["i"]] = datos  # el último intento de cada entrada
+    filas = list(por_indice.values())
+    correctas = [f for f in filas if not f.get("error")]
+    latencias = [f["ms"] for f in correctas if f.get("ms") is not None]
+    ttfts = [f["ttft_ms"] for f in correctas if f.get("ttft_ms") is not None]
+    por_modelo = {}
+    for f in correctas:
+        por_modelo[f.get("modelo")] = por_modelo.get(f.get("modelo"), 0) + 1
+    return {
+        "mensajes": len(filas),
+        "errores": len(filas) - len(correctas),
+        "latencia_p50_ms": percentil(latencias, 0.50),
+        "latencia_p95_ms": percentil(latencias, 0.95),
+        "latencia_p99_ms": percentil(latencias, 0.99),
+        "ttft_p50_ms": percentil(ttfts, 0.50),
+        "ttft_p95_ms": percentil(ttfts, 0.95),
+        "tokens_prompt": sum(f.get("tok_prompt") or 0 for f in correctas),
+        "tokens_respuesta": sum(f.get("tok_resp") or 0 for f in correctas),
+        "conocimiento": {tipo: sum(1 for f in correctas if f.get("conocimiento") == tipo)
+                         for tipo in ("directa", "pasajes", "sin_coincidencia")},
+        "intencion_cambiada": sum(1 for f in filas if f.get("intencion_log") and f["intencion"] != f["intencion_log"]),
+        "por_modelo": por_modelo,
+    }
+
+
+def main():
+    app = config_app()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("origen", nargs="?", default=ruta_log_app(app),
+                        help="chat_log.json, JSONL, directorio chat_logs/ o base .sqlite3 "
+                             "(por defecto, el log de la app)")
+    parser.add_argument("--salida", default="replay_resultados.jsonl", help="resultados y checkpoint")
+    parser.add_argument("--reiniciar", action="store_true", help="empezar de cero aunque exista --salida")
+    parser.add_argument("--concurrencia", type=int, default=8, help="peticiones en vuelo a la vez")
+    parser.add_argument("--limite", type=int, help="reproducir solo las primeras N entradas del log")
+    parser.add_argument("--server-url", default=os.getenv("MISTRAL_SERVER_URL", ""),
+                        help="API compatible con Mistral, p. ej. benchmarks/fake_mistral.py")
+    parser.add_argument("--api-key", default=os.getenv("MISTRAL_API_KEY", ""))
+    parser.add_argument("--modelo", help="forzar un modelo (por defecto, el enrutado de la app)")
+    parser.add_argument("--system-message", help="archivo con el system message a probar")
+    parser.add_argument("--max-history", type=int, default=0,
+                        help="entradas anteriores del log enviadas como historial")
+    parser.add_argument("--stream", action="store_true", help="usar chat_stream y medir el primer token")
+    parser.add_argument("--sin-cobertura", action="store_true", help="no lanzar peticiones de cobertura")
+    parser.add_argument("--sin-conocimiento", action="store_true",
+                        help="no consultar la base de conocimiento (todo va al modelo)")
+    parser.add_argument("--rps", type=float, default=float(os.getenv("MISTRAL_RPS", "1.0")))
+    parser.add_argument("--tpm", type=int, default=int(os.getenv("MISTRAL_TPM", "500000")))
+    args = parser.parse_args()
+
+    if not args.api_key and not args.server_url:
+        parser.error("hace falta MISTRAL_API_KEY (o --api-key) para usar la API de Mistral")
+    system_message = app["system_message"]
+    if args.system_message:
+        with open(args.system_message, encoding="utf-8") as f:
+            system_message = f.read().strip()
+
+    from mistralai import Mistral
+
+    http_client, _ = crear_cliente_httpx(max_conexiones=2 * args.concurrencia)  # principal + cobertura
+    client = Mistral(api_key=args.api_key or "replay", client=http_client, server_url=args.server_url or None)
+    enrutador = (EnrutadorModelos([], por_defecto=args.modelo, respaldos={}) if args.modelo else
+                 EnrutadorModelos(REGLAS_POR_DEFECTO, por_defecto=MODELO_GRANDE,
+                                  umbral_latencia_ms=app.get("UMBRAL_LATENCIA_MODELO_MS", 8000)))
+    plazo_s = app.get("PLAZO_RESPUESTA_S", 60.0)
+    motor = MotorChat(
+        lambda: client, enrutador,
+        # El replay no tiene prisa: espera en cola lo que haga falta en lugar de dar el aviso de límite
+        PlanificadorMistral(rps=args.rps, tpm=args.tpm, presupuesto_espera=3600.0),
+        CoberturaLLM(plazo_total_s=plazo_s, activa=app.get("COBERTURA", True) and not args.sin_cobertura,
+                     umbral_por_defecto_s=app.get("UMBRAL_COBERTURA_S", 6.0)),
+        ConstructorContexto(app.get("CONTEXTO_MAX_TOKENS", 3000), max_mensajes=args.max_history * 2 or None),
+        plazo_s=plazo_s,
+        tokens_respuesta_estimados=app.get("TOKENS_RESPUESTA_ESTIMADOS", 500),
+        conocimiento=None if args.sin_conocimiento else BaseConocimiento(
+            os.path.join(RAIZ, "conocimiento", "tecnicas.json"),
+            umbral_directo=app.get("CONOCIMIENTO_UMBRAL_DIRECTO", 0.6),
+            umbral_pasajes=app.get("CONOCIMIENTO_UMBRAL_PASAJES", 0.35),
+            puntuacion_minima=app.get("CONOCIMIENTO_PUNTUACION_MINIMA", 4.0))
+    )
+
+    config = {
+        "origen": os.path.abspath(args.origen),
+        "system_message": hashlib.sha1(system_message.encode("utf-8")).hexdigest()[:12],
+        "modelo": args.modelo,
+        "max_history": args.max_history,
+        "stream": args.stream,
+        "conocimiento": not args.sin_conocimiento,
+    }
+    resultados = ArchivoResultados(args.salida, config, reiniciar=args.reiniciar)
+    fuente = abrir_fuente(args.origen)
+    total = fuente.contar()
+    if args.limite is not None:
+        total = min(total, args.limite)
+    print(f"Replay de {args.origen}: {total} entradas, {len(resultados.hechos)} ya hechas, "
+          f"concurrencia {args.concurrencia}", file=sys.stderr)
+
+    inicio = time.monotonic()
+    try:
+        stats = asyncio.run(reproducir(
+            motor, entradas_pendientes(fuente, resultados.hechos, args.max_history, args.limite),
+            resultados, args.concurrencia, system_message, args.stream, total
+        ))
+    except KeyboardInterrupt:
+        print(f"Interrumpido; relanza el mismo comando para seguir ({len(resultados.hechos)} hechas)", file=sys.stderr)
+        return 130
+    finally:
+        resultados.cerrar()
+    duracion = time.monotonic() - inicio
+    print(f"{stats['hechos']} mensajes en {duracion:.1f} s ({stats['hechos'] / max(duracion, 1e-9):.1f}/s), "
+          f"{stats['errores']} errores", file=sys.stderr)
+    print(json.dumps(resumen(args.salida), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
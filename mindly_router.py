@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import deque
+
+MODELO_GRANDE = "mistral-large-latest"
+MODELO_PEQUENO = "mistral-small-latest"
+
+# Se aplica la primera regla que encaje; una regla encaja si cumple todas sus condiciones
+REGLAS_POR_DEFECTO = [
+    {"intenciones": ["situacion_urgente", "consulta_emocional"], "modelo": MODELO_GRANDE},
+    {"intenciones": ["consulta_tecnica"], "modelo": MODELO_PEQUENO},
+    {"max_tokens_prompt": 40, "intenciones": ["intencion_desconocida"], "modelo": MODELO_PEQUENO},
+]
+RESPALDOS_POR_DEFECTO = {
+    MODELO_GRANDE: ["mistral-medium-latest", MODELO_PEQUENO],
+    MODELO_PEQUENO: [MODELO_GRANDE],
+}
+INTENCIONES_PROTEGIDAS = ("situacion_urgente", "consulta_emocional")
+
+
+def es_error_definitivo(error):
+    """Errores que no se arreglan cambiando de modelo (clave inválida, petición mal formada)"""
+    estado = getattr(error, "status_code", None)
+    if estado in (400, 401):
+        return True
+    texto = str(error).lower()
+    return "401" in texto or "unauthorized" in texto or "400" in texto or "bad request" in texto
+
+
+class EnrutadorModelos:
+    """Elige el modelo de cada turno y gestiona la cadena de respaldo.
+
+    El modelo sale de la primera regla de `reglas` que encaje con la intención y
+    el tamaño del prompt (o de `por_defecto`). Si en los últimos `olvido_s`
+    segundos la latencia mediana de ese modelo supera `umbral_latencia_ms`, o ha
+    fallado en la mayoría de sus llamadas, se pasa a su primer respaldo, salvo
+    para las intenciones protegidas, que se quedan siempre en el modelo de su
+    regla. Pasado ese tiempo el modelo vuelve a probarse. `ejecutar` recorre la
+    cadena en orden hasta que un modelo responde.
+    """
+
+    def __init__(self, reglas=None, por_defecto=MODELO_GRANDE, respaldos=None,
+                 protegidas=INTENCIONES_PROTEGIDAS, umbral_latencia_ms=None, ventana=50,
+                 olvido_s=60.0):
+        self.reglas = REGLAS_POR_DEFECTO if reglas is None else reglas
+        self.por_defecto = por_defecto
+        self.respaldos = RESPALDOS_POR_DEFECTO if respaldos is None else respaldos
+        self.protegidas = set(protegidas)
+        self.umbral_latencia_ms = umbral_latencia_ms
+        self.ventana = ventana
+        self.olvido_s = olvido_s
+        self._lock = threading.Lock()
+        self._latencias = {}
+        self._resultados = {}
+        self._elegidos = {}
+
+    def elegir(self, intencion, tokens_prompt):
+        """Cadena de modelos a probar para este turno, en orden"""
+        modelo = self.por_defecto
+        for regla in self.reglas:
+            if "intenciones" in regla and intencion not in regla["intenciones"]:
+                continue
+            if "max_tokens_prompt" in regla and tokens_prompt > regla["max_tokens_prompt"]:
+                continue
+            if "min_tokens_prompt" in regla and tokens_prompt < regla["min_tokens_prompt"]:
+                continue
+            modelo = regla["modelo"]
+            break
+
+        cadena = [modelo] + [m for m in self.respaldos.get(modelo, []) if m != modelo]
+        if intencion not in self.protegidas and len(cadena) > 1 and self._degradado(modelo):
+            cadena = cadena[1:] + [modelo]
+        with self._lock:
+            self._elegidos[cadena[0]] = self._elegidos.get(cadena[0], 0) + 1
+        return cadena
+
+    def ejecutar(self, cadena, llamada, metricas=None):
+        """Llamar `llamada(modelo)` con cada modelo de la cadena hasta que uno funcione.
+
+        Devuelve `(resultado, modelo)`. Los errores definitivos (400/401) y el
+        error del último modelo se propagan. Si `llamada` deja en
+        `metricas["espera_ms"]` lo que esperó en cola (como hace
+        `PlanificadorMistral.ejecutar`), esa espera no cuenta como latencia del
+        modelo: con el límite de peticiones saturado, un modelo sano no debe
+        parecer lento.
+        """
+        metricas = {} if metricas is None else metricas
+        for i, modelo in enumerate(cadena):
+            metricas.pop("espera_ms", None)
+            inicio = time.perf_counter()
+            try:
+                resultado = llamada(modelo)
+            except Exception as e:
+                self.registrar(modelo, self._latencia_ms(inicio, metricas), ok=False)
+                if es_error_definitivo(e) or i == len(cadena) - 1:
+                    raise
+                metricas.setdefault("modelos_fallidos", []).append(modelo)
+                continue
+            self.registrar(modelo, self._latencia_ms(inicio, metricas), ok=True)
+            metricas["modelo"] = modelo
+            return resultado, modelo
+
+    def _latencia_ms(self, inicio, metricas):
+        return max((time.perf_counter() - inicio) * 1000 - metricas.get("espera_ms", 0.0), 0.0)
+
+    def modelo_cobertura(self, intencion, cadena):
+        """Modelo para una petición de cobertura: el de menor latencia mediana de la cadena.
+
+        Las intenciones protegidas repiten con su propio modelo.
+        """
+        if intencion in self.protegidas:
+            return cadena[0]
+        with self._lock:
+            medianas = [(self._mediana(m), i, m) for i, m in enumerate(cadena)]
+        conocidas = [x for x in medianas if x[0] is not None]
+        return min(conocidas)[2] if conocidas else cadena[0]
+
+    def registrar(self, modelo, latencia_ms, ok=True):
+        with self._lock:
+            self._resultados.setdefault(modelo, deque(maxlen=10)).append((ok, time.monotonic()))
+            if ok:
+                self._latencias.setdefault(modelo, deque(maxlen=self.ventana)).append((latencia_ms, time.monotonic()))
+
+    def estadisticas(self):
+        with self._lock:
+            modelos = set(self._latencias) | set(self._resultados) | set(self._elegidos)
+            return {
+                modelo: {
+                    "elegido": self._elegidos.get(modelo, 0),
+                    "p50_ms": self._mediana(modelo),
+                    "fallos_recientes": sum(not ok for ok in self._recientes(modelo)),
+                }
+                for modelo in sorted(modelos)
+            }
+
+    def _mediana(self, modelo):
+        limite = time.monotonic() - self.olvido_s
+        latencias = sorted(ms for ms, t in self._latencias.get(modelo, ()) if t >= limite)
+        return latencias[len(latencias) // 2] if latencias else None
+
+    def _recientes(self, modelo):
+        limite = time.monotonic() - self.olvido_s
+        return [ok for ok, t in self._resultados.get(modelo, ()) if t >= limite]
+
+    def _degradado(self, modelo):
+        with self._lock:
+            resultados = self._recientes(modelo)
+            if len(resultados) >= 3 and resultados.count(False) > len(resultados) / 2:
+                return True
+            if self.umbral_latencia_ms is None:
+                return False
+            mediana = self._mediana(modelo)
+            return mediana is not None and mediana > self.umbral_latencia_ms
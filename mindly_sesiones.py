@@ -0,0 +1,314 @@
+import atexit
+import json
+import os
+import re
+import sys
+import threading
+import time
+from array import array
+from collections import deque
+
+from mindly_escritor import EscritorLogAsincrono
+
+ROL_USUARIO = sys.intern("user")
+ROL_ASISTENTE = sys.intern("assistant")
+_ROLES = {ROL_USUARIO: ROL_USUARIO, ROL_ASISTENTE: ROL_ASISTENTE}
+
+
+class Turno:
+    """Mensaje del historial. Se indexa como el dict de siempre: turno["role"], turno["content"]"""
+
+    __slots__ = ("role", "content")
+
+    def __init__(self, role, content):
+        self.role = _ROLES.get(role) or sys.intern(role)
+        self.content = content
+
+    def __getitem__(self, clave):
+        try:
+            return getattr(self, clave)
+        except AttributeError:
+            raise KeyError(clave) from None
+
+    def get(self, clave, defecto=None):
+        return getattr(self, clave, defecto)
+
+    def __repr__(self):
+        return f"Turno({self.role!r}, {self.content[:30]!r})"
+
+
+class _Vista:
+    """Tramo [inicio, fin) de un historial, sin copiar ni leer del disco hasta que se accede"""
+
+    __slots__ = ("historial", "inicio", "fin")
+
+    def __init__(self, historial, inicio, fin):
+        self.historial = historial
+        self.inicio = inicio
+        self.fin = max(fin, inicio)
+
+    def __len__(self):
+        return self.fin - self.inicio
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            inicio, fin, paso = i.indices(len(self))
+            if paso != 1:
+                return [self[j] for j in range(inicio, fin, paso)]
+            return _Vista(self.historial, self.inicio + inicio, self.inicio + fin)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.historial._turno(self.inicio + i)
+
+    def __iter__(self):
+        return self.historial._iterar(self.inicio, self.fin)
+
+    def __bool__(self):
+        return self.fin > self.inicio
+
+
+class HistorialSesion:
+    """Historial de una sesión: los últimos `max_memoria` mensajes en memoria, todo en disco.
+
+    `agregar` no toca el disco: el mensaje queda pendiente y `guardar` lo añade
+    al archivo JSONL de la sesión. Con `escritor` (un `EscritorLogAsincrono`) se
+    le encarga guardar en segundo plano; sin él se guarda al momento. En memoria
+    quedan los más recientes, que son los que se envían al modelo. Se comporta
+    como una secuencia del historial completo (longitud, índices y cortes), así
+    que los mensajes antiguos se leen del disco solo si alguien los pide, por
+    ejemplo al pulsar "ver anteriores".
+    """
+
+    def __init__(self, ruta, max_memoria=16, escritor=None):
+        self.ruta = ruta
+        self.max_memoria = max_memoria
+        self.escritor = escritor
+        self.ultimo_uso = time.monotonic()
+        self._lock = threading.RLock()
+        self._lock_archivo = threading.Lock()
+        self._offsets = array("q")  # posición en el archivo de cada mensaje guardado
+        self._pendientes = []  # mensajes aún sin guardar, detrás de los del archivo
+        self._recientes = deque(maxlen=max_memoria)
+        self._cargar()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._offsets) + len(self._pendientes)
+
+    def __getitem__(self, i):
+        return _Vista(self, 0, len(self))[i]
+
+    def __iter__(self):
+        return self._iterar(0, len(self))
+
+    def __bool__(self):
+        return len(self) > 0
+
+    @property
+    def en_memoria(self):
+        return len(self._recientes)
+
+    def agregar(self, role, content):
+        turno = Turno(role, content)
+        with self._lock:
+            self._pendientes.append(turno)
+            self._recientes.append(turno)
+            self.ultimo_uso = time.monotonic()
+        if self.escritor is None:
+            self.guardar()
+        else:
+            # Si la cola está llena no se pierde nada: queda pendiente hasta el próximo aviso o la hibernación
+            self.escritor.encolar(self)
+        return turno
+
+    def guardar(self):
+        """Añadir al archivo los mensajes pendientes; devuelve cuántos"""
+        with self._lock_archivo:
+            with self._lock:
+                lote = list(self._pendientes)
+            if not lote:
+                return 0
+            offsets = array("q")
+            lineas = []
+            with open(self.ruta, "ab") as f:
+                posicion = f.tell()
+                for turno in lote:
+                    linea = (json.dumps({"role": turno.role, "content": turno.content}, ensure_ascii=False)
+                             + "\n").encode("utf-8")
+                    offsets.append(posicion)
+                    posicion += len(linea)
+                    lineas.append(linea)
+                f.write(b"".join(lineas))
+            with self._lock:
+                self._offsets.extend(offsets)
+                del self._pendientes[:len(lote)]
+            return len(lote)
+
+    def anteriores(self, cantidad):
+        """Los `cantidad` mensajes anteriores a la ventana en memoria (leídos del disco)"""
+        fin = len(self) - len(self._recientes)
+        return list(self._iterar(max(fin - cantidad, 0), fin))
+
+    def vaciar(self):
+        with self._lock_archivo, self._lock:
+            self._offsets = array("q")
+            self._pendientes.clear()
+            self._recientes.clear()
+            try:
+                os.remove(self.ruta)
+            except FileNotFoundError:
+                pass
+
+    def tamano_bytes(self):
+        """Memoria aproximada del historial (objeto, ventana, textos y offsets)"""
+        with self._lock:
+            recientes = list(self._recientes)
+        return (sys.getsizeof(self) + sys.getsizeof(self._recientes) + sys.getsizeof(self._offsets)
+                + sys.getsizeof(self._pendientes) + sum(sys.getsizeof(t) + sys.getsizeof(t.content) for t in recientes))
+
+    def _turno(self, i):
+        return next(self._iterar(i, i + 1))
+
+    def _iterar(self, inicio, fin):
+        self.ultimo_uso = time.monotonic()
+        with self._lock:
+            recientes, pendientes = list(self._recientes), list(self._pendientes)
+            guardados = len(self._offsets)
+        total = guardados + len(pendientes)
+        fin = min(fin, total)
+        primero_en_memoria = total - len(recientes)
+        if inicio < min(guardados, primero_en_memoria):
+            yield from self._leer(inicio, min(fin, guardados, primero_en_memoria))
+        for i in range(max(inicio, guardados), min(fin, primero_en_memoria)):
+            yield pendientes[i - guardados]
+        for i in range(max(inicio, primero_en_memoria), fin):
+            yield recientes[i - primero_en_memoria]
+
+    def _leer(self, inicio, fin):
+        with self._lock_archivo, open(self.ruta, "rb") as f:
+            f.seek(self._offsets[inicio])
+            turnos = []
+            for _ in range(inicio, fin):
+                datos = json.loads(f.readline())
+                turnos.append(Turno(datos["role"], datos["content"]))
+        return turnos
+
+    def _cargar(self):
+        """Reabrir una sesión hibernada: offsets de todo el archivo y la ventana final"""
+        if not os.path.exists(self.ruta):
+            return
+        with open(self.ruta, "rb") as f:
+            posicion = 0
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break  # escritura cortada
+                self._offsets.append(posicion)
+                posicion += len(linea)
+        if posicion != os.path.getsize(self.ruta):
+            with open(self.ruta, "r+b") as f:
+                f.truncate(posicion)
+        self._recientes.extend(self._leer(max(len(self) - self.max_memoria, 0), len(self)))
+
+
+class _GuardadoHistoriales:
+    """Destino del escritor asíncrono: guarda los pendientes de cada historial del lote"""
+
+    def agregar_lote(self, historiales):
+        for historial in {id(h): h for h in historiales}.values():
+            historial.guardar()
+
+
+class AlmacenSesiones:
+    """Historiales de todas las sesiones del proceso.
+
+    Los mensajes se guardan en el archivo de cada sesión desde un hilo aparte,
+    y el barrido de sesiones inactivas también corre fuera del turno de chat.
+    Las sesiones sin actividad durante `inactividad_s` se hibernan: se libera
+    su memoria y, si el usuario vuelve, se reabren desde su archivo. Los
+    archivos sin uso durante `retencion_s` se borran; con 0 (por defecto) el
+    archivo se borra al hibernar, así que no queda ninguna conversación en disco
+    más allá de la sesión.
+    """
+
+    def __init__(self, directorio, max_memoria=16, inactividad_s=1800.0, retencion_s=0.0,
+                 intervalo_barrido_s=60.0):
+        self.directorio = directorio
+        self.max_memoria = max_memoria
+        self.inactividad_s = inactividad_s
+        self.retencion_s = retencion_s
+        self.intervalo_barrido_s = intervalo_barrido_s
+        os.makedirs(directorio, exist_ok=True)
+        self._lock = threading.Lock()
+        self._sesiones = {}
+        self._ultimo_barrido = time.monotonic()
+        self._stats = {"hibernadas": 0, "reabiertas": 0, "borradas": 0}
+        self.escritor = EscritorLogAsincrono(_GuardadoHistoriales(), politica="descartar_nuevo")
+        atexit.register(self.cerrar)
+
+    def obtener(self, sesion_id):
+        sesion_id = re.sub(r"[^A-Za-z0-9_-]", "_", sesion_id or "local")
+        with self._lock:
+            historial = self._sesiones.get(sesion_id)
+            if historial is None:
+                ruta = os.path.join(self.directorio, f"{sesion_id}.jsonl")
+                if os.path.exists(ruta):
+                    self._stats["reabiertas"] += 1
+                historial = self._sesiones[sesion_id] = HistorialSesion(ruta, self.max_memoria, self.escritor)
+            historial.ultimo_uso = time.monotonic()
+            barrer = time.monotonic() - self._ultimo_barrido >= self.intervalo_barrido_s
+            if barrer:
+                self._ultimo_barrido = time.monotonic()
+        if barrer:
+            threading.Thread(target=self.expirar, name="mindly-sesiones-barrido", daemon=True).start()
+        return historial
+
+    def expirar(self):
+        """Hibernar las sesiones inactivas y borrar los archivos caducados"""
+        ahora = time.monotonic()
+        with self._lock:
+            self._ultimo_barrido = ahora
+            for sesion_id, historial in list(self._sesiones.items()):
+                if ahora - historial.ultimo_uso >= self.inactividad_s:
+                    historial.guardar()  # también con retención 0, para que el escritor no recree el archivo luego
+                    del self._sesiones[sesion_id]
+                    self._stats["hibernadas"] += 1
+        limite = time.time() - self.retencion_s
+        for entrada in os.scandir(self.directorio):
+            if not entrada.name.endswith(".jsonl"):
+                continue
+            try:
+                if entrada.stat().st_mtime >= limite:
+                    continue
+                with self._lock:
+                    # La sesión puede haberse reabierto desde el archivo mientras se recorría el directorio
+                    if entrada.name[:-len(".jsonl")] in self._sesiones:
+                        continue
+                    os.remove(entrada.path)
+                    self._stats["borradas"] += 1
+            except FileNotFoundError:
+                pass
+
+    def cerrar(self):
+        """Guardar lo pendiente de las sesiones en memoria y detener el escritor"""
+        self.escritor.cerrar()
+        with self._lock:
+            historiales = list(self._sesiones.values())
+        for historial in historiales:
+            historial.guardar()
+
+    def estadisticas(self):
+        with self._lock:
+            historiales = list(self._sesiones.values())
+            stats = dict(self._stats)
+        tamanos = [h.tamano_bytes() for h in historiales]
+        stats.update({
+            "sesiones": len(historiales),
+            "mensajes_memoria": sum(h.en_memoria for h in historiales),
+            "mensajes_total": sum(len(h) for h in historiales),
+            "bytes_memoria": sum(tamanos),
+            "bytes_por_sesion": sum(tamanos) / len(tamanos) if tamanos else 0.0,
+            "bytes_por_sesion_max": max(tamanos, default=0),
+        })
+        return stats
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# La raíz del repositorio (módulos mindly_*.py y benchmarks/) importable también con `pytest` a secas
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
@@ -0,0 +1,61 @@
+import os
+import threading
+
+import pytest
+
+from mindly_archivo import ArchivoLog, LogConArchivado, abrir_log
+from mindly_backends import BackendJSONL
+
+
+def entrada(i, dia="2026-01-01"):
+    return {"timestamp": f"{dia}T00:00:{i % 60:02d}", "intencion": "saludo", "usuario": f"hola {i}"}
+
+
+def consumir(iterable, limite_s=10.0):
+    """list(iterable) con plazo, para que una regresión al bucle infinito falle en vez de colgar"""
+    resultado = {}
+
+    def leer():
+        try:
+            resultado["entradas"] = list(iterable)
+        except Exception as e:
+            resultado["error"] = e
+    hilo = threading.Thread(target=leer, daemon=True)
+    hilo.start()
+    hilo.join(limite_s)
+    assert not hilo.is_alive(), "iterar_desde no termina"
+    if "error" in resultado:
+        raise resultado["error"]
+    return resultado["entradas"]
+
+
+def test_iterar_tras_compactar_desde_otro_proceso(tmp_path):
+    ruta = str(tmp_path / "log.sqlite3")
+    lector = abrir_log("sqlite", str(tmp_path), ruta)
+    lector.agregar_lote([entrada(i) for i in range(10)] + [entrada(i, dia="2026-02-01") for i in range(10, 15)])
+    assert [e["usuario"] for e in consumir(lector.iterar_desde(0))][:3] == ["hola 0", "hola 1", "hola 2"]
+
+    otro = abrir_log("sqlite", str(tmp_path), ruta)  # otra instancia, como otro proceso
+    assert otro.compactar("2026-01-15") == 10
+
+    # El índice del archivo del lector es el de antes de compactar
+    assert [e["usuario"] for e in consumir(lector.iterar_desde(0))] == [f"hola {i}" for i in range(15)]
+    assert [e["usuario"] for e in consumir(lector.iterar_desde(12))] == ["hola 12", "hola 13", "hola 14"]
+    lector.cerrar()
+    otro.cerrar()
+
+
+def test_segmento_borrado_fuera_de_compactar(tmp_path):
+    backend = BackendJSONL(str(tmp_path / "chat_logs"), max_bytes_segmento=300)
+    log = LogConArchivado(backend, ArchivoLog(str(tmp_path / "chat_logs" / "archivo")))
+    log.agregar_lote([entrada(i) for i in range(30)])
+    log.flush()
+    log.actualizar()
+    os.remove(backend.store.segmentos()[0])
+
+    log.actualizar()
+    assert log.backend.purgadas() > 0 and log.archivo.total == 0
+    with pytest.raises(RuntimeError):
+        consumir(log.iterar_desde(0))
+    assert len(consumir(log.iterar_desde(log.backend.purgadas()))) == log.backend.contar()
+    log.cerrar()
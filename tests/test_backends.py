@@ -0,0 +1,99 @@
+import os
+import threading
+
+from mindly_backends import BackendJSONL, BackendSQLite
+
+
+def entrada(i, intencion="consulta_emocional"):
+    return {"timestamp": f"2026-01-01T00:00:{i % 60:02d}", "intencion": intencion, "usuario": f"hola {i}"}
+
+
+def descriptores_abiertos(ruta):
+    """Descriptores del proceso que apuntan a la base (solo en Linux)"""
+    ruta = os.path.realpath(ruta)
+    abiertos = 0
+    for fd in os.listdir("/proc/self/fd"):
+        try:
+            abiertos += os.readlink(f"/proc/self/fd/{fd}") == ruta
+        except OSError:
+            pass
+    return abiertos
+
+
+def test_hilos_efimeros_no_acumulan_conexiones(tmp_path):
+    # Como los reruns de Streamlit: cada petición llega en un hilo nuevo que termina enseguida
+    backend = BackendSQLite(str(tmp_path / "log.sqlite3"), max_conexiones=3)
+    errores = []
+
+    def turno(i):
+        try:
+            backend.agregar_lote([entrada(i)])
+            backend.contar()
+        except Exception as e:
+            errores.append(e)
+
+    for tanda in range(20):
+        hilos = [threading.Thread(target=turno, args=(tanda * 10 + j,)) for j in range(10)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        assert backend.conexiones_abiertas <= 3
+
+    assert not errores
+    assert backend.contar() == 200
+    if os.path.isdir("/proc/self/fd"):
+        assert descriptores_abiertos(backend.ruta) <= 3
+    backend.cerrar()
+    assert backend.conexiones_abiertas == 0
+
+
+def test_iteracion_abandonada_devuelve_la_conexion(tmp_path):
+    backend = BackendSQLite(str(tmp_path / "log.sqlite3"), max_conexiones=1, timeout=1.0)
+    backend.agregar_lote([entrada(i) for i in range(5)])
+    iterador = backend.iterar_desde(0)
+    assert next(iterador)["usuario"] == "hola 0"
+    iterador.close()
+    assert backend.contar() == 5
+    assert [e["usuario"] for e in backend.consultar(intenciones=["consulta_emocional"])][-1] == "hola 4"
+    backend.cerrar()
+
+
+def test_purgar_y_consultar(tmp_path):
+    backend = BackendSQLite(str(tmp_path / "log.sqlite3"))
+    backend.agregar_lote([entrada(i, "crisis" if i % 2 else "saludo") for i in range(10)])
+    assert backend.purgar(4) == 4
+    assert backend.purgar(4) == 0
+    assert backend.purgadas() == 4
+    assert [e["usuario"] for e in backend.consultar(intenciones=["crisis"])] == ["hola 5", "hola 7", "hola 9"]
+    backend.cerrar()
+
+
+def test_conteo_intenciones_igual_en_ambos_backends(tmp_path):
+    entradas = [entrada(0, "saludo"), entrada(1, "saludo"), entrada(2, None), entrada(3, ""),
+                {"timestamp": "2026-01-01T00:00:04", "usuario": "sin intención"}]
+    sqlite = BackendSQLite(str(tmp_path / "log.sqlite3"))
+    jsonl = BackendJSONL(str(tmp_path / "chat_logs"))
+    for backend in (sqlite, jsonl):
+        backend.agregar_lote(entradas)
+        backend.flush()
+
+    assert sqlite.conteo_intenciones() == {"saludo": 2, "intencion_desconocida": 3}
+    assert jsonl.actualizar().conteo_intenciones() == sqlite.conteo_intenciones()
+    sqlite.cerrar()
+    jsonl.cerrar()
+
+
+def test_purgar_libera_paginas_sin_vacuum(tmp_path):
+    backend = BackendSQLite(str(tmp_path / "log.sqlite3"))
+    backend.agregar_lote([dict(entrada(i), usuario="x" * 2000) for i in range(500)])
+    with backend._conexion() as conexion:
+        assert conexion.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        paginas = conexion.execute("PRAGMA page_count").fetchone()[0]
+
+    assert backend.purgar(450) == 450
+    with backend._conexion() as conexion:
+        assert conexion.execute("PRAGMA freelist_count").fetchone()[0] == 0
+        assert conexion.execute("PRAGMA page_count").fetchone()[0] < paginas / 2
+    assert backend.contar() == 50
+    backend.cerrar()
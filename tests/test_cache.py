@@ -0,0 +1,77 @@
+import pytest
+
+from mindly_cache import CacheRespuestas
+
+SISTEMA = "Eres Mindly"
+TECNICA = "qué es la respiración 4-7-8 y cómo se hace"
+
+
+def cache(**opciones):
+    opciones.setdefault("compartible", lambda texto: True)
+    return CacheRespuestas(**opciones)
+
+
+def test_acierto_exacto_tolera_mayusculas_y_tildes():
+    c = cache(similitud=False)
+    c.guardar(TECNICA, SISTEMA, [], "Inhala 4, retén 7, exhala 8", 900.0, "ana")
+    assert c.buscar("¿Qué es la RESPIRACION 4-7-8 y como se hace?", SISTEMA, [], "eva") == "Inhala 4, retén 7, exhala 8"
+    assert c.buscar(TECNICA, "Otro system message", [], "eva") is None
+
+
+@pytest.mark.parametrize("prompt, acierta", [
+    ("que es la respiracion 4-7-8 y como se hace exactamente", True),
+    ("que es la respiración 4 7 8 y como se hace", True),
+    ("cómo funciona el mindfulness en el trabajo", False),
+])
+def test_umbral_de_similitud(prompt, acierta):
+    c = cache(umbral_similitud=0.75)
+    c.guardar(TECNICA, SISTEMA, [], "respuesta", 900.0, "ana")
+    assert (c.buscar(prompt, SISTEMA, [], "eva") == "respuesta") is acierta
+
+
+def test_un_umbral_mas_alto_exige_mas_parecido():
+    c = cache(umbral_similitud=0.99)
+    c.guardar(TECNICA, SISTEMA, [], "respuesta", 900.0, "ana")
+    assert c.buscar("que es la respiracion 4-7-8 y como se hace exactamente", SISTEMA, [], "eva") is None
+
+
+def test_la_negacion_no_aprovecha_la_respuesta_afirmativa():
+    c = cache()
+    c.guardar("la respiración 4-7-8 sirve para dormir", SISTEMA, [], "Sí, ayuda", 900.0, "ana")
+    assert c.buscar("la respiración 4-7-8 no sirve para dormir", SISTEMA, [], "eva") is None
+
+
+def test_lo_personal_nunca_sale_de_su_sesion():
+    c = cache()
+    personal = "me llamo Ana y estoy muy triste por mi pareja"
+    c.guardar(personal, SISTEMA, [], "Ana, siento lo de tu pareja", 900.0, "ana")
+
+    assert c.buscar(personal, SISTEMA, [], "eva") is None
+    assert c.buscar("me llamo Eva y estoy muy triste por mi pareja", SISTEMA, [], "eva") is None
+    assert c.buscar(personal, SISTEMA, [], "ana") == "Ana, siento lo de tu pareja"
+    # Ni siquiera la propia sesión lo recibe por similitud, solo por coincidencia exacta
+    assert c.buscar("me llamo Ana y estoy triste por mi pareja", SISTEMA, [], "ana") is None
+
+
+def test_no_compartible_se_queda_en_la_sesion():
+    c = CacheRespuestas(compartible=lambda texto: False)
+    c.guardar(TECNICA, SISTEMA, [], "respuesta", 900.0, "ana")
+    assert c.buscar(TECNICA, SISTEMA, [], "eva") is None
+    assert c.buscar(TECNICA, SISTEMA, [], "ana") == "respuesta"
+    # Sin sesión no hay ámbito propio: ni se guarda ni se busca
+    c.guardar(TECNICA, SISTEMA, [], "otra", 900.0, None)
+    assert c.buscar(TECNICA, SISTEMA, [], None) is None
+
+
+def test_caducidad_y_expulsion_lru(monkeypatch):
+    import mindly_cache
+
+    reloj = [1000.0]
+    monkeypatch.setattr(mindly_cache.time, "monotonic", lambda: reloj[0])
+    c = cache(ttl=60, max_entradas=2, similitud=False)
+    for i in range(3):
+        c.guardar(f"pregunta {i}", SISTEMA, [], f"respuesta {i}", 100.0, "ana")
+    assert c.buscar("pregunta 0", SISTEMA, [], "ana") is None  # expulsada por LRU
+    assert c.buscar("pregunta 2", SISTEMA, [], "ana") == "respuesta 2"
+    reloj[0] += 61
+    assert c.buscar("pregunta 2", SISTEMA, [], "ana") is None
@@ -0,0 +1,64 @@
+import time
+
+from mindly_cobertura import CoberturaLLM
+
+
+def lento(retardo_s, texto="principal"):
+    def lanzar():
+        time.sleep(retardo_s)
+        yield texto
+    return lanzar
+
+
+def rapido():
+    yield "cobertura"
+
+
+def esperar_muestra(cobertura, clave, limite_s=5.0):
+    fin = time.monotonic() + limite_s
+    while time.monotonic() < fin:
+        valor = cobertura.estadisticas()[clave]
+        if valor is not None:
+            return valor
+        time.sleep(0.01)
+    return None
+
+
+def test_gana_la_cobertura_y_se_mide_el_principal():
+    cobertura = CoberturaLLM(plazo_total_s=5.0, umbral_por_defecto_s=0.05)
+    metricas = {}
+    texto = "".join(cobertura.ejecutar(lento(0.4), rapido, metricas=metricas))
+
+    assert texto == "cobertura" and metricas["cobertura_ganada"]
+    principal_ms = esperar_muestra(cobertura, "sin_cobertura_p50_ms")
+    efectiva_ms = cobertura.estadisticas()["efectiva_p50_ms"]
+    assert efectiva_ms < 300
+    assert 400 <= principal_ms < 2000
+
+
+def test_principal_sin_respuesta_cuenta_el_plazo():
+    cobertura = CoberturaLLM(plazo_total_s=0.5, umbral_por_defecto_s=0.05)
+    assert "".join(cobertura.ejecutar(lento(3.0), rapido)) == "cobertura"
+
+    principal_ms = esperar_muestra(cobertura, "sin_cobertura_p50_ms")
+    assert 450 <= principal_ms < 1500
+
+
+def test_gana_el_principal():
+    cobertura = CoberturaLLM(plazo_total_s=5.0, umbral_por_defecto_s=1.0)
+    assert "".join(cobertura.ejecutar(lento(0.0), rapido)) == "principal"
+    stats = cobertura.estadisticas()
+    assert stats["coberturas_lanzadas"] == 0
+    assert stats["efectiva_p50_ms"] == stats["sin_cobertura_p50_ms"]
+
+
+def test_umbral_sale_solo_del_principal():
+    # Las coberturas recortan la latencia efectiva; el umbral no debe seguirla hacia abajo
+    cobertura = CoberturaLLM(umbral_por_defecto_s=5.0, min_muestras=20)
+    for _ in range(20):
+        cobertura._registrar(efectiva_ms=100.0, principal_ms=2000.0)
+    assert cobertura.umbral_s() == 2.0
+
+    for _ in range(20):
+        cobertura._registrar(efectiva_ms=100.0)
+    assert cobertura.umbral_s() == 2.0
@@ -0,0 +1,80 @@
+import os
+import shutil
+
+import pytest
+
+from mindly_chat import MotorChat, en_conversacion
+from mindly_conocimiento import MAGIA, BaseConocimiento
+from mindly_contexto import ConstructorContexto
+
+TECNICAS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "conocimiento", "tecnicas.json")
+
+
+@pytest.fixture
+def base(tmp_path):
+    ruta = tmp_path / "tecnicas.json"
+    shutil.copy(TECNICAS, ruta)
+    return BaseConocimiento(str(ruta))
+
+
+@pytest.mark.parametrize("mensaje, titulo", [
+    ("qué es la respiración 4-7-8", "Respiración 4-7-8"),
+    ("relajación muscular progresiva", "Relajación muscular progresiva"),
+    ("qué hago si me da un ataque de pánico", "Técnica de anclaje 5-4-3-2-1"),
+])
+def test_respuesta_directa(base, mensaje, titulo):
+    resultado = base.consultar(mensaje)
+    assert resultado.tipo == "directa"
+    assert resultado.documentos[0][0]["titulo"] == titulo
+
+
+@pytest.mark.parametrize("mensaje", ["psicoterapia", "terapia", "grounding"])
+def test_una_palabra_suelta_no_basta(base, mensaje):
+    assert base.consultar(mensaje).tipo != "directa"
+
+
+@pytest.mark.parametrize("mensaje", [
+    "no me funciona la respiración 4-7-8, ¿qué hago?",
+    "la relajación muscular progresiva nunca me ha servido",
+    "ni la respiración 4-7-8 me calma",
+])
+def test_negacion_no_responde_directamente(base, mensaje):
+    resultado = base.consultar(mensaje)
+    assert resultado.tipo == "pasajes"
+    assert resultado.documentos
+
+
+def test_directa_no_permitida(base):
+    assert base.consultar("qué es la respiración 4-7-8", directa_permitida=False).tipo == "pasajes"
+
+
+def test_indice_antiguo_se_reconstruye(base):
+    with open(base.ruta_indice, "r+b") as f:
+        f.write(b"MBM25v1\0")
+    nueva = BaseConocimiento(base.ruta)
+    with open(nueva.ruta_indice, "rb") as f:
+        assert f.read(len(MAGIA)) == MAGIA
+    assert nueva.consultar("qué es la respiración 4-7-8").tipo == "directa"
+
+
+def test_en_conversacion():
+    mensaje = "qué es la respiración 4-7-8"
+    assert not en_conversacion(mensaje, [])
+    assert not en_conversacion(mensaje, [{"role": "user", "content": mensaje}])
+    assert en_conversacion(mensaje, [{"role": "user", "content": "hola"}, {"role": "assistant", "content": "¡Hola!"}])
+
+
+def test_motor_no_responde_directamente_a_mitad_de_conversacion(base):
+    motor = MotorChat(None, None, None, None, ConstructorContexto(3000), conocimiento=base)
+    mensaje = "qué es la respiración 4-7-8"
+    previo = [{"role": "user", "content": "me cuesta dormir"}, {"role": "assistant", "content": "Vaya, cuéntame más."}]
+
+    metricas = {}
+    directa, _, _ = motor._preparar(mensaje, [], "sistema", None, "consulta_tecnica", metricas)
+    assert directa and metricas["conocimiento"] == "directa"
+
+    metricas = {}
+    directa, mensajes, _ = motor._preparar(mensaje, previo + [{"role": "user", "content": mensaje}], "sistema",
+                                           None, "consulta_tecnica", metricas)
+    assert directa is None and metricas["conocimiento"] == "pasajes"
+    assert "Respiración 4-7-8" in mensajes[0]["content"]
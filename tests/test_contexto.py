@@ -0,0 +1,78 @@
+from mindly_contexto import ConstructorContexto, ResumenRodante, contar_tokens, tokens_mensajes
+
+
+def conversacion(turnos, palabras=40):
+    historial = []
+    for i in range(turnos):
+        historial.append({"role": "user", "content": f"Pregunta {i}. " + "palabra " * palabras})
+        historial.append({"role": "assistant", "content": f"Respuesta {i}. " + "palabra " * palabras})
+    return historial
+
+
+def test_cabe_entero_sin_resumen():
+    historial = conversacion(2)
+    mensajes = ConstructorContexto(3000).construir("hola", historial, "sistema")
+    assert [m["content"] for m in mensajes[1:-1]] == [m["content"] for m in historial]
+    assert mensajes[0] == {"role": "system", "content": "sistema"}
+    assert mensajes[-1] == {"role": "user", "content": "hola"}
+
+
+def test_no_duplica_el_turno_pendiente():
+    historial = conversacion(1) + [{"role": "user", "content": "hola"}]
+    mensajes = ConstructorContexto(3000).construir("hola", historial, "sistema")
+    assert [m["content"] for m in mensajes].count("hola") == 1
+
+
+def test_recorta_al_presupuesto_y_empieza_por_el_usuario():
+    historial = conversacion(30)
+    for presupuesto in (300, 600, 1200):
+        mensajes = ConstructorContexto(presupuesto).construir("hola", historial, "sistema")
+        assert tokens_mensajes(mensajes) <= presupuesto
+        assert mensajes[1]["role"] == "user"
+        # Se conservan los más recientes
+        assert mensajes[-2]["content"] == historial[-1]["content"]
+
+
+def test_max_mensajes():
+    mensajes = ConstructorContexto(100000, max_mensajes=4).construir("hola", conversacion(10), "sistema")
+    assert len(mensajes) == 1 + 4 + 1
+
+
+def test_el_resumen_rueda_con_los_turnos_que_salen_de_la_ventana():
+    constructor = ConstructorContexto(600)
+    resumen = ResumenRodante(max_tokens=60)
+    historial = conversacion(2)
+    mensajes = constructor.construir("hola", historial, "sistema", resumen)
+    assert resumen.turnos_resumidos == 0 and "Resumen" not in mensajes[0]["content"]
+
+    historial = conversacion(30)
+    mensajes = constructor.construir("hola", historial, "sistema", resumen)
+    assert resumen.turnos_resumidos > 0
+    enviados = len(mensajes) - 2
+    assert resumen.turnos_resumidos == len(historial) - enviados  # nada se pierde entre resumen y ventana
+    assert "Resumen de la conversación anterior" in mensajes[0]["content"]
+    assert tokens_mensajes(mensajes) <= 600
+    # Con max_tokens pequeño se descartan las líneas más antiguas
+    assert contar_tokens(resumen.texto) <= 60
+    assert "Pregunta 0" not in resumen.texto
+    assert resumen.lineas[-1].startswith("- Mindly: Respuesta")
+
+
+def test_el_resumen_solo_avanza():
+    constructor = ConstructorContexto(600)
+    resumen = ResumenRodante()
+    historial = conversacion(30)
+    constructor.construir("hola", historial, "sistema", resumen)
+    cubiertos = resumen.turnos_resumidos
+    constructor.construir("hola", historial, "sistema", resumen)
+    assert resumen.turnos_resumidos == cubiertos
+    historial += conversacion(1)
+    constructor.construir("hola", historial, "sistema", resumen)
+    assert resumen.turnos_resumidos >= cubiertos
+
+
+def test_resumen_usa_la_primera_frase_recortada():
+    resumen = ResumenRodante(max_caracteres=20)
+    resumen.incorporar([{"role": "user", "content": "Una frase bastante larga para recortar. Y otra."}])
+    assert resumen.lineas == ["- Usuario: Una frase bastante…"]
+    assert resumen.turnos_resumidos == 1
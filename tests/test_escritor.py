@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from mindly_escritor import EscritorLogAsincrono
+
+
+class DestinoLento:
+    """Destino que no escribe hasta que se abre `paso`"""
+
+    def __init__(self):
+        self.paso = threading.Event()
+        self.escritas = []
+        self.flushes = 0
+
+    def agregar_lote(self, entradas):
+        self.paso.wait(5)
+        self.escritas.extend(entradas)
+
+    def flush(self):
+        self.flushes += 1
+
+
+def lleno(politica, max_cola=2):
+    """Escritor con el hilo bloqueado en la primera entrada y la cola llena"""
+    destino = DestinoLento()
+    escritor = EscritorLogAsincrono(destino, max_cola=max_cola, politica=politica, timeout_bloqueo=0.05)
+    escritor.encolar(0)
+    while escritor.estadisticas()["profundidad"]:
+        pass  # el hilo ya ha sacado la primera y espera en el destino
+    for i in range(1, max_cola + 1):
+        assert escritor.encolar(i)
+    return escritor, destino
+
+
+@pytest.mark.parametrize("politica", ["bloquear", "descartar_nuevo"])
+def test_cola_llena_descarta_la_nueva(politica):
+    escritor, destino = lleno(politica)
+    assert not escritor.encolar(99)
+    destino.paso.set()
+    escritor.cerrar()
+    assert destino.escritas == [0, 1, 2]
+    assert escritor.estadisticas()["descartadas"] == 1
+
+
+def test_cola_llena_descarta_la_mas_antigua():
+    escritor, destino = lleno("descartar_antiguo")
+    assert escritor.encolar(99)
+    destino.paso.set()
+    escritor.cerrar()
+    assert destino.escritas == [0, 2, 99]
+    assert escritor.estadisticas()["descartadas"] == 1
+
+
+def test_cerrar_escribe_lo_pendiente():
+    destino = DestinoLento()
+    destino.paso.set()
+    escritor = EscritorLogAsincrono(destino, max_lote=7)
+    for i in range(50):
+        escritor.encolar(i)
+    escritor.cerrar()
+
+    assert destino.escritas == list(range(50))
+    assert destino.flushes >= 1
+    stats = escritor.estadisticas()
+    assert stats["escritas"] == 50 and stats["lotes"] >= 50 // 7
+    assert not escritor.encolar(50)  # cerrado: ya no acepta entradas
+
+
+def test_error_del_destino_cuenta_como_descartadas():
+    class Roto:
+        def agregar_lote(self, entradas):
+            raise OSError("disco lleno")
+
+    escritor = EscritorLogAsincrono(Roto())
+    escritor.encolar(1)
+    escritor.cerrar()
+    stats = escritor.estadisticas()
+    assert stats["errores"] == 1 and stats["descartadas"] == 1
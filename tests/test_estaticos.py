@@ -0,0 +1,27 @@
+import os
+
+from mindly_estaticos import construir_hoja_estilos, reglas_fuentes
+
+
+def test_reglas_fuentes_solo_enlazan_archivos_presentes(tmp_path):
+    (tmp_path / "Poppins-400.woff2").write_bytes(b"wOF2")
+    reglas = reglas_fuentes(str(tmp_path)).splitlines()
+
+    assert len(reglas) == 7
+    poppins = next(r for r in reglas if "'Poppins'" in r and "font-weight: 400" in r)
+    assert "local('Poppins Regular')" in poppins and "url('fuentes/Poppins-400.woff2') format('woff2')" in poppins
+    assert sum("url(" in r for r in reglas) == 1
+
+
+def test_hoja_estilos_con_fuentes(tmp_path):
+    origen = tmp_path / "estilos.css"
+    origen.write_text("body { font-family: 'Inter', system-ui, sans-serif; }\n", encoding="utf-8")
+    dir_static = tmp_path / "static"
+    (dir_static / "fuentes").mkdir(parents=True)
+    (dir_static / "fuentes" / "Inter-400.woff2").write_bytes(b"wOF2")
+
+    archivo, css = construir_hoja_estilos(str(origen), str(dir_static))
+    assert css.startswith("@font-face{")
+    assert "url('fuentes/Inter-400.woff2')" in css
+    assert css.endswith("body{font-family:'Inter',system-ui,sans-serif}")
+    assert os.path.exists(dir_static / archivo)
@@ -0,0 +1,52 @@
+import io
+import json
+
+import pytest
+
+from benchmarks.fake_github import ServidorGistFalso
+from mindly_gist import ARCHIVO_MANIFIESTO, ErrorSincronizacion, GistManager, exportar_gist
+
+
+def gist_con_fragmentos(servidor, n_fragmentos, entradas_por_fragmento=2):
+    archivos, fragmentos = {}, []
+    for i in range(n_fragmentos):
+        nombre = f"chat_log-20260101-{i:03d}.jsonl"
+        desde = i * entradas_por_fragmento
+        archivos[nombre] = "".join(json.dumps({"n": desde + j}) + "\n" for j in range(entradas_por_fragmento))
+        fragmentos.append({"archivo": nombre, "dia": "20260101", "indice": i, "desde": desde,
+                           "hasta": desde + entradas_por_fragmento, "bytes": len(archivos[nombre]),
+                           "comprimido": False})
+    archivos[ARCHIVO_MANIFIESTO] = json.dumps({"version": 1, "hwm": n_fragmentos * entradas_por_fragmento,
+                                               "fragmentos": fragmentos})
+    servidor.gists["g1"] = archivos
+    return GistManager("token", gist_id="g1", api_base=servidor.url)
+
+
+def test_exportar_con_listado_truncado():
+    # Con más archivos que max_archivos, la API omite el manifiesto y los últimos fragmentos
+    with ServidorGistFalso(max_archivos=3) as servidor:
+        gist = gist_con_fragmentos(servidor, 6)
+        ok, datos = gist.obtener_gist()
+        assert ok and datos["truncated"] and ARCHIVO_MANIFIESTO not in datos["files"]
+
+        destino = io.BytesIO()
+        total = exportar_gist(gist, destino)
+
+    assert total == 12
+    assert [e["n"] for e in json.loads(destino.getvalue())] == list(range(12))
+
+
+def test_exportar_sin_truncar_no_pide_raw():
+    with ServidorGistFalso() as servidor:
+        gist = gist_con_fragmentos(servidor, 4)
+        destino = io.BytesIO()
+        assert exportar_gist(gist, destino) == 8
+        assert not any(ruta.startswith("/raw/") for _, ruta in servidor.peticiones)
+
+
+def test_exportar_fragmento_inexistente():
+    with ServidorGistFalso() as servidor:
+        gist = gist_con_fragmentos(servidor, 2)
+        del servidor.gists["g1"]["chat_log-20260101-001.jsonl"]
+        with pytest.raises(ErrorSincronizacion):
+            exportar_gist(gist, io.BytesIO())
@@ -0,0 +1,59 @@
+import json
+
+from mindly_indice import LectorLogIndexado
+from mindly_logstore import LogStore
+
+
+def entrada(i, intencion="saludo"):
+    return {"timestamp": f"2026-01-01T00:00:{i % 60:02d}", "intencion": intencion, "usuario": f"hola {i}"}
+
+
+def linea(e):
+    return (json.dumps(e) + "\n").encode("utf-8")
+
+
+def test_lectura_incremental_y_offsets(tmp_path):
+    store = LogStore(str(tmp_path))
+    store.agregar_lote([entrada(i, "crisis" if i % 3 == 0 else "saludo") for i in range(25)])
+    store.flush()
+    lector = LectorLogIndexado(store, paso_offsets=4).actualizar()
+
+    assert lector.contar() == 25
+    assert lector.conteo_intenciones() == {"crisis": 9, "saludo": 16}
+    assert [e["usuario"] for e in lector.iterar_desde(21)] == ["hola 21", "hola 22", "hola 23", "hola 24"]
+
+    store.agregar(entrada(25))
+    store.flush()
+    reabierto = LectorLogIndexado(store, paso_offsets=4).actualizar()  # parte del índice guardado
+    assert reabierto.contar() == 26
+    assert reabierto.ultimo_timestamp() == "2026-01-01T00:00:25"
+
+
+def test_cola_a_medio_escribir(tmp_path):
+    store = LogStore(str(tmp_path))
+    store.agregar_lote([entrada(0), entrada(1)])
+    store.cerrar()
+    ruta = store.segmentos()[0]
+    completa = linea(entrada(2))
+    with open(ruta, "ab") as f:
+        f.write(completa[:10])
+    lector = LectorLogIndexado(store).actualizar()
+    assert lector.contar() == 2
+
+    with open(ruta, "ab") as f:
+        f.write(completa[10:])
+    assert lector.actualizar().contar() == 3
+    assert [e["usuario"] for e in lector.iterar_desde(0)] == ["hola 0", "hola 1", "hola 2"]
+
+
+def test_lineas_corruptas_no_cuentan_ni_rompen_la_lectura(tmp_path):
+    store = LogStore(str(tmp_path))
+    store.agregar(entrada(0))
+    store.cerrar()
+    with open(store.segmentos()[0], "ab") as f:
+        f.write(b'{"timestamp": roto\n' + linea(entrada(1)) + b"no es json\n" + linea(entrada(2)))
+
+    lector = LectorLogIndexado(store, paso_offsets=1).actualizar()
+    assert lector.contar() == 3
+    assert [e["usuario"] for e in lector.iterar_desde(0)] == ["hola 0", "hola 1", "hola 2"]
+    assert [e["usuario"] for e in lector.iterar_desde(2)] == ["hola 2"]
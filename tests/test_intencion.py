@@ -0,0 +1,43 @@
+import re
+import unicodedata
+
+import pytest
+
+from mindly_intencion import ClasificadorIntencion, detectar_intencion, plegar
+
+
+def test_plegar_quita_solo_diacriticos():
+    assert plegar("Depresión, ÑANDÚ y pingüino") == "depresion, nandu y pinguino"
+
+
+@pytest.mark.parametrize("texto", ["urgente—no", "urgente–no", "«urgente»", "¿urgente?", "urgente…", "urgente🙏"])
+def test_plegar_no_pega_palabras(texto):
+    assert "urgente" in re.findall(r"\w+", plegar(texto))
+
+
+@pytest.mark.parametrize("mensaje", [
+    "es urgente—no sé qué hacer",
+    "es urgente–necesito hablar",
+    "¡¡URGENTE!!",
+    "«crisis» otra vez",
+    "¿es una emergencia?",
+    "emergencia…ayuda",
+])
+def test_urgencia_junto_a_puntuacion(mensaje):
+    assert detectar_intencion(mensaje) == "situacion_urgente"
+
+
+def test_acepta_palabras_con_y_sin_tildes():
+    assert detectar_intencion("creo que tengo depresion") == "consulta_emocional"
+    assert detectar_intencion(unicodedata.normalize("NFD", "una técnica de respiración")) == "consulta_tecnica"
+
+
+def test_solo_palabras_completas():
+    assert detectar_intencion("un día estresante") == "intencion_desconocida"
+
+
+def test_puntuaciones_y_prioridad():
+    resultado = ClasificadorIntencion().clasificar("Estoy teniendo una crisis de ansiedad y miedo")
+    assert resultado.etiqueta == "situacion_urgente"
+    assert resultado.urgente
+    assert resultado.puntuaciones == {"situacion_urgente": 1, "consulta_emocional": 2}
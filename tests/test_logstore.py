@@ -0,0 +1,106 @@
+import json
+import os
+import subprocess
+import sys
+
+from mindly_archivo import abrir_log
+from mindly_logstore import LogStore, migrar_json_legacy
+
+
+def entrada(i, dia="2026-01-01"):
+    return {"timestamp": f"{dia}T00:00:{i % 60:02d}", "intencion": "saludo", "usuario": f"hola {i}"}
+
+
+def pid_terminado():
+    proceso = subprocess.Popen([sys.executable, "-c", "pass"])
+    proceso.wait()
+    return proceso.pid
+
+
+def test_migrar_json_legacy(tmp_path):
+    legado = tmp_path / "chat_log.json"
+    legado.write_text(json.dumps([entrada(i) for i in range(5)]), encoding="utf-8")
+    store = LogStore(str(tmp_path / "chat_logs"))
+
+    assert migrar_json_legacy(str(legado), store) == 5
+    assert migrar_json_legacy(str(legado), store) == 0
+    assert [e["usuario"] for e in store.leer_todo()] == [f"hola {i}" for i in range(5)]
+    assert (tmp_path / "chat_log.json.migrado").exists()
+
+
+def test_retomar_migracion_interrumpida(tmp_path):
+    # El proceso que migraba murió tras escribir 2 de las 5 entradas
+    entradas = [entrada(i) for i in range(5)]
+    reserva = tmp_path / f"chat_log.json.{pid_terminado()}.migrando"
+    reserva.write_text(json.dumps(entradas), encoding="utf-8")
+    log = abrir_log("jsonl", str(tmp_path / "chat_logs"))
+    log.agregar_lote(entradas[:2])
+    log.flush()
+
+    assert migrar_json_legacy(str(tmp_path / "chat_log.json"), log) == 3
+    assert [e["usuario"] for e in log.actualizar().iterar_desde(0)] == [f"hola {i}" for i in range(5)]
+    assert not reserva.exists()
+    assert (tmp_path / "chat_log.json.migrado").exists()
+
+
+def test_no_toca_la_migracion_de_un_proceso_vivo(tmp_path):
+    reserva = tmp_path / f"chat_log.json.{os.getppid()}.migrando"
+    reserva.write_text(json.dumps([entrada(0)]), encoding="utf-8")
+    store = LogStore(str(tmp_path / "chat_logs"))
+
+    assert migrar_json_legacy(str(tmp_path / "chat_log.json"), store) == 0
+    assert reserva.exists()
+    assert list(store.leer_todo()) == []
+
+
+def test_rotacion_por_tamano_y_por_dia(tmp_path):
+    store = LogStore(str(tmp_path), max_bytes_segmento=300)
+    for i in range(10):
+        store.agregar(entrada(i))
+    store.agregar(entrada(10, dia="2026-01-02"))
+    store.cerrar()
+
+    nombres = [os.path.basename(r) for r in store.segmentos()]
+    del_dia_1 = [n for n in nombres if n.startswith("chat_log-20260101-")]
+    assert len(del_dia_1) > 1
+    assert nombres[-1] == "chat_log-20260102-000.jsonl"
+    assert all(os.path.getsize(r) <= 300 for r in store.segmentos())
+    assert [e["usuario"] for e in store.leer_todo()] == [f"hola {i}" for i in range(11)]
+
+
+def test_reabrir_tras_linea_cortada(tmp_path):
+    store = LogStore(str(tmp_path))
+    store.agregar_lote([entrada(0), entrada(1)])
+    store.cerrar()
+    with open(store.segmentos()[-1], "ab") as f:
+        f.write(b'{"timestamp":"2026-01-01T00:00:02","usu')  # el proceso murió a mitad de escribir
+
+    store = LogStore(str(tmp_path))
+    store.agregar(entrada(3))
+    store.cerrar()
+    assert [e["usuario"] for e in store.leer_todo()] == ["hola 0", "hola 1", "hola 3"]
+
+
+def test_fsync_por_numero_y_por_intervalo(tmp_path, monkeypatch):
+    import mindly_logstore
+
+    reloj = [100.0]
+    llamadas = []
+    monkeypatch.setattr(mindly_logstore.time, "monotonic", lambda: reloj[0])
+    monkeypatch.setattr(mindly_logstore.os, "fsync", lambda fd: llamadas.append(fd))
+    store = LogStore(str(tmp_path), fsync_cada=3, fsync_intervalo=2.0)
+
+    store.agregar(entrada(0))
+    store.agregar(entrada(1))
+    assert llamadas == []
+    store.agregar(entrada(2))
+    assert len(llamadas) == 1  # tres pendientes
+
+    store.agregar(entrada(3))
+    assert len(llamadas) == 1
+    reloj[0] += 2.5
+    store.agregar(entrada(4))
+    assert len(llamadas) == 2  # ha pasado el intervalo
+
+    store.flush()
+    assert len(llamadas) == 2  # nada pendiente
@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pytest
+
+from mindly_planificador import LimiteEsperaExcedido, PlanificadorMistral
+
+
+class RelojFalso:
+    """Reloj que solo avanza cuando el planificador espera (o cuando lo mueve la prueba)"""
+
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+    def esperar(self, condicion, segundos):
+        self.ahora += segundos
+
+
+class Respuesta:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class Error429(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__("429 rate limit")
+        self.raw_response = Respuesta({} if retry_after is None else {"retry-after": str(retry_after)})
+
+
+def planificador(reloj, **opciones):
+    return PlanificadorMistral(reloj=reloj, esperar=reloj.esperar, **opciones)
+
+
+def test_limite_de_peticiones_por_segundo():
+    reloj = RelojFalso()
+    plan = planificador(reloj, rps=2.0, rafaga=2)
+    momentos = [plan.ejecutar("s1", reloj) for _ in range(6)]
+    assert momentos == pytest.approx([0.0, 0.0, 0.5, 1.0, 1.5, 2.0])
+
+
+def test_limite_de_tokens_por_minuto():
+    reloj = RelojFalso()
+    plan = planificador(reloj, rps=100.0, tpm=600, presupuesto_espera=120.0)
+    metricas = {}
+    assert plan.ejecutar("s1", reloj, tokens_estimados=600) == 0.0
+    assert plan.ejecutar("s1", reloj, tokens_estimados=300, metricas=metricas) == pytest.approx(30.0)
+    assert metricas["espera_ms"] == pytest.approx(30000.0)
+
+
+def test_presupuesto_de_espera_agotado():
+    reloj = RelojFalso()
+    plan = planificador(reloj, rps=0.1, rafaga=1)
+    plan.ejecutar("s1", reloj)
+    with pytest.raises(LimiteEsperaExcedido):
+        plan.ejecutar("s1", reloj, presupuesto=5.0)
+    assert plan.estadisticas()["rechazadas"] == 1
+    assert plan.ejecutar("s1", reloj, presupuesto=15.0) == pytest.approx(10.0)
+
+
+def test_429_pausa_y_reintenta_con_retry_after():
+    reloj = RelojFalso()
+    plan = planificador(reloj, rps=100.0)
+    intentos = []
+
+    def llamada():
+        intentos.append(reloj())
+        if len(intentos) == 1:
+            raise Error429(retry_after=3)
+        return "ok"
+
+    assert plan.ejecutar("s1", llamada) == "ok"
+    assert intentos == pytest.approx([0.0, 3.0])
+    assert plan.ejecutar("s2", reloj) == pytest.approx(3.0)  # la pausa vale para todas las sesiones
+    assert plan.estadisticas()["reintentos_429"] == 1
+
+
+def test_429_fuera_de_presupuesto_se_propaga():
+    reloj = RelojFalso()
+    plan = planificador(reloj, rps=100.0)
+
+    def llamada():
+        raise Error429(retry_after=30)
+
+    with pytest.raises(Error429):
+        plan.ejecutar("s1", llamada, presupuesto=10.0)
+
+
+def test_sesiones_por_turnos():
+    # Una sesión con tres peticiones en cola no pasa por delante de otra con una
+    reloj = RelojFalso()
+    plan = PlanificadorMistral(rps=1.0, rafaga=1, presupuesto_espera=100.0, reloj=reloj,
+                               esperar=lambda condicion, segundos: condicion.wait(0.005))
+    plan.ejecutar("otra", lambda: None)
+    atendidas = []
+    hilos = []
+
+    def encolar(sesion, nombre):
+        hilo = threading.Thread(target=plan.ejecutar, args=(sesion, lambda: atendidas.append(nombre)))
+        hilo.start()
+        hilos.append(hilo)
+        esperar_hasta(lambda: plan.estadisticas()["en_cola"] == len(hilos))
+
+    for nombre in ("a1", "a2", "a3"):
+        encolar("a", nombre)
+    encolar("b", "b1")
+
+    for paso in range(1, 5):
+        reloj.ahora += 1.0
+        esperar_hasta(lambda: len(atendidas) == paso)
+    for hilo in hilos:
+        hilo.join(5)
+    assert atendidas == ["a1", "b1", "a2", "a3"]
+
+
+def esperar_hasta(condicion, limite_s=5.0):
+    fin = time.monotonic() + limite_s
+    while not condicion():
+        assert time.monotonic() < fin
+        time.sleep(0.001)
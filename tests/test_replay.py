@@ -0,0 +1,139 @@
+import asyncio
+import json
+import sys
+import threading
+
+import pytest
+
+import mindly_replay
+from benchmarks.fake_mistral import ServidorMistralFalso
+from mindly_logstore import LogStore
+from mindly_replay import ArchivoResultados, config_app, entradas_pendientes, reproducir, resumen
+
+
+class FuenteLista:
+    def __init__(self, entradas):
+        self.entradas = entradas
+
+    def iterar_desde(self, n):
+        return iter(self.entradas[n:])
+
+
+class MotorFalso:
+    """Responde al momento con una duración fija por mensaje y cuenta las peticiones en vuelo"""
+
+    def __init__(self, espera=None):
+        self.espera = espera
+        self.en_vuelo = self.max_en_vuelo = 0
+        self.mensajes = []
+        self._lock = threading.Lock()
+
+    def chat(self, message, history, system_message, metricas=None, resumen=None, sesion_id=None, intencion=None):
+        with self._lock:
+            self.en_vuelo += 1
+            self.max_en_vuelo = max(self.max_en_vuelo, self.en_vuelo)
+            self.mensajes.append(message)
+        if self.espera is not None:
+            self.espera.wait(5)
+        with self._lock:
+            self.en_vuelo -= 1
+        n = int(message.split()[-1])
+        metricas.update({"duracion_ms": 100.0 * (n + 1), "tokens_prompt": 10, "tokens_respuesta": 20,
+                         "modelo": "mistral-small-latest"})
+        if n == 3:
+            metricas["error"] = True
+        return "respuesta"
+
+
+def entrada(i):
+    return {"timestamp": f"2026-01-01T00:00:{i:02d}", "intencion": "consulta_emocional",
+            "usuario": f"mensaje {i}", "respuesta": f"respuesta {i}"}
+
+
+def test_config_app(tmp_path):
+    ruta = tmp_path / "app.py"
+    ruta.write_text('import os\nsystem_message = "hola"\nPLAZO_RESPUESTA_S = 30.0\n'
+                    'CONTEXTO_MAX_TOKENS = int(os.getenv("X", "1"))\nOTRA = 1\n', encoding="utf-8")
+    assert config_app(str(ruta)) == {"system_message": "hola", "PLAZO_RESPUESTA_S": 30.0}
+    assert "system_message" in config_app()
+
+
+def test_resultados_se_reanudan(tmp_path):
+    ruta = str(tmp_path / "replay.jsonl")
+    resultados = ArchivoResultados(ruta, {"modelo": None})
+    resultados.agregar({"i": 0, "ms": 100.0})
+    resultados.agregar({"i": 1, "error": True})
+    resultados.cerrar()
+    with open(ruta, "a", encoding="utf-8") as f:
+        f.write('{"i":2,"ms"')  # interrumpido a mitad de línea
+
+    resultados = ArchivoResultados(ruta, {"modelo": None})
+    assert resultados.hechos == {0}
+    resultados.agregar({"i": 1, "ms": 50.0})
+    resultados.cerrar()
+    with open(ruta, encoding="utf-8") as f:
+        lineas = [json.loads(linea) for linea in f]
+    assert lineas[0] == {"config": {"modelo": None}} and len(lineas) == 4
+
+    with pytest.raises(SystemExit):
+        ArchivoResultados(ruta, {"modelo": "mistral-small-latest"})
+    resultados = ArchivoResultados(ruta, {"modelo": "otro"}, reiniciar=True)
+    assert resultados.hechos == set()
+    resultados.cerrar()
+
+
+def test_entradas_pendientes():
+    entradas = [entrada(0), {"timestamp": "2026-01-01T00:00:01", "usuario": ""}, entrada(2), entrada(3)]
+    pendientes = list(entradas_pendientes(FuenteLista(entradas), {2}, max_history=1, limite=4))
+    assert [i for i, _, _ in pendientes] == [0, 3]
+    assert pendientes[0][2] == []
+    assert pendientes[1][2] == [{"role": "user", "content": "mensaje 2"}, {"role": "assistant", "content": "respuesta 2"}]
+    assert [i for i, _, _ in entradas_pendientes(FuenteLista(entradas), set(), limite=2)] == [0]
+
+
+def test_reproducir_respeta_la_concurrencia_y_resume(tmp_path):
+    espera = threading.Event()
+    motor = MotorFalso(espera)
+    ruta = str(tmp_path / "replay.jsonl")
+    resultados = ArchivoResultados(ruta, {})
+    fuente = FuenteLista([entrada(i) for i in range(10)])
+
+    threading.Timer(0.2, espera.set).start()
+    stats = asyncio.run(reproducir(motor, entradas_pendientes(fuente, resultados.hechos), resultados, 3, "sistema", False))
+    resultados.cerrar()
+
+    assert stats == {"hechos": 10, "errores": 1}
+    assert motor.max_en_vuelo == 3
+    datos = resumen(ruta)
+    assert datos["mensajes"] == 10 and datos["errores"] == 1
+    assert datos["latencia_p50_ms"] == 600.0
+    assert datos["tokens_prompt"] == 90
+    assert datos["por_modelo"] == {"mistral-small-latest": 9}
+
+    # Al relanzar solo se repite la que falló
+    motor = MotorFalso()
+    resultados = ArchivoResultados(ruta, {})
+    asyncio.run(reproducir(motor, entradas_pendientes(fuente, resultados.hechos), resultados, 3, "sistema", False))
+    resultados.cerrar()
+    assert motor.mensajes == ["mensaje 3"]
+
+
+def test_cli_contra_api_falsa(tmp_path, monkeypatch, capsys):
+    store = LogStore(str(tmp_path / "chat_logs"))
+    store.agregar_lote([entrada(i) for i in range(4)])
+    store.cerrar()
+    salida = str(tmp_path / "replay.jsonl")
+
+    with ServidorMistralFalso(latencia_primer_token=0.0, intervalo_token=0.0) as servidor:
+        argumentos = ["mindly_replay.py", str(tmp_path / "chat_logs"), "--salida", salida, "--server-url",
+                      servidor.url, "--sin-conocimiento", "--sin-cobertura", "--rps", "1000", "--limite", "3"]
+        monkeypatch.setattr(sys, "argv", argumentos)
+        assert mindly_replay.main() == 0
+        datos = json.loads(capsys.readouterr().out)
+        assert datos["mensajes"] == 3 and datos["errores"] == 0
+        assert len(servidor.peticiones) == 3
+
+        monkeypatch.setattr(sys, "argv", argumentos[:-1] + ["4"])
+        assert mindly_replay.main() == 0
+        assert json.loads(capsys.readouterr().out)["mensajes"] == 4
+        assert len(servidor.peticiones) == 4
@@ -0,0 +1,92 @@
+import pytest
+
+import mindly_router
+from mindly_router import MODELO_GRANDE, MODELO_PEQUENO, EnrutadorModelos
+
+
+class ErrorApi(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"error {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """Reloj falso compartido por las ventanas y la medición de latencias"""
+    ahora = [1000.0]
+    monkeypatch.setattr(mindly_router.time, "monotonic", lambda: ahora[0])
+    monkeypatch.setattr(mindly_router.time, "perf_counter", lambda: ahora[0])
+    return ahora
+
+
+def test_elegir_por_reglas():
+    enrutador = EnrutadorModelos()
+    assert enrutador.elegir("consulta_emocional", 500)[0] == MODELO_GRANDE
+    assert enrutador.elegir("consulta_tecnica", 500) == [MODELO_PEQUENO, MODELO_GRANDE]
+    assert enrutador.elegir("intencion_desconocida", 10)[0] == MODELO_PEQUENO
+    assert enrutador.elegir("intencion_desconocida", 200)[0] == MODELO_GRANDE
+
+
+def test_degrada_por_fallos_y_se_recupera(reloj):
+    enrutador = EnrutadorModelos(olvido_s=60.0)
+    for _ in range(3):
+        enrutador.registrar(MODELO_PEQUENO, 0.0, ok=False)
+    assert enrutador.elegir("consulta_tecnica", 100) == [MODELO_GRANDE, MODELO_PEQUENO]
+
+    reloj[0] += 61
+    assert enrutador.elegir("consulta_tecnica", 100) == [MODELO_PEQUENO, MODELO_GRANDE]
+
+
+def test_degrada_por_latencia_salvo_intenciones_protegidas(reloj):
+    enrutador = EnrutadorModelos(umbral_latencia_ms=1000)
+    for _ in range(3):
+        enrutador.registrar(MODELO_GRANDE, 5000.0)
+    assert enrutador.elegir("saludo", 100)[0] == "mistral-medium-latest"
+    assert enrutador.elegir("consulta_emocional", 100)[0] == MODELO_GRANDE
+
+
+def test_ejecutar_pasa_al_respaldo():
+    enrutador = EnrutadorModelos()
+    metricas = {}
+
+    def llamada(modelo):
+        if modelo == MODELO_GRANDE:
+            raise ErrorApi(503)
+        return f"respuesta de {modelo}"
+
+    resultado, modelo = enrutador.ejecutar([MODELO_GRANDE, MODELO_PEQUENO], llamada, metricas)
+    assert (resultado, modelo) == (f"respuesta de {MODELO_PEQUENO}", MODELO_PEQUENO)
+    assert metricas["modelos_fallidos"] == [MODELO_GRANDE]
+    assert enrutador.estadisticas()[MODELO_GRANDE]["fallos_recientes"] == 1
+
+
+@pytest.mark.parametrize("estado, llamados", [(401, [MODELO_GRANDE]), (503, [MODELO_GRANDE, MODELO_PEQUENO])])
+def test_ejecutar_propaga_errores(estado, llamados):
+    enrutador = EnrutadorModelos()
+    probados = []
+
+    def llamada(modelo):
+        probados.append(modelo)
+        raise ErrorApi(estado)
+
+    with pytest.raises(ErrorApi):
+        enrutador.ejecutar([MODELO_GRANDE, MODELO_PEQUENO], llamada)
+    assert probados == llamados
+
+
+def test_la_espera_en_cola_no_cuenta_como_latencia(reloj):
+    # Como PlanificadorMistral.ejecutar: 5 s en cola por el límite de peticiones y 100 ms de modelo
+    enrutador = EnrutadorModelos(umbral_latencia_ms=1000)
+
+    def llamada_planificada(metricas):
+        reloj[0] += 5.0
+        metricas["espera_ms"] = 5000.0
+        reloj[0] += 0.1
+        return "ok"
+
+    for _ in range(3):
+        metricas = {}
+        enrutador.ejecutar([MODELO_GRANDE, MODELO_PEQUENO], lambda modelo: llamada_planificada(metricas), metricas)
+
+    assert enrutador.estadisticas()[MODELO_GRANDE]["p50_ms"] == pytest.approx(100.0)
+    assert enrutador.elegir("saludo", 100)[0] == MODELO_GRANDE
@@ -0,0 +1,115 @@
+import os
+import time
+
+import pytest
+
+import mindly_sesiones
+from mindly_sesiones import AlmacenSesiones, HistorialSesion
+
+
+class EscritorFalso:
+    def __init__(self):
+        self.avisos = []
+
+    def encolar(self, historial):
+        self.avisos.append(historial)
+        return True
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """Adelanta time.monotonic y time.time sin esperar"""
+    desfase = [0.0]
+    monotonic, time_ = time.monotonic, time.time
+    monkeypatch.setattr(mindly_sesiones.time, "monotonic", lambda: monotonic() + desfase[0])
+    monkeypatch.setattr(mindly_sesiones.time, "time", lambda: time_() + desfase[0])
+    return desfase
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    almacenes = []
+
+    def crear(**opciones):
+        almacenes.append(AlmacenSesiones(str(tmp_path / "sesiones"), **opciones))
+        return almacenes[-1]
+    yield crear
+    for a in almacenes:
+        a.cerrar()
+
+
+def conversar(historial, n):
+    for i in range(n):
+        historial.agregar("user" if i % 2 == 0 else "assistant", f"mensaje {i}")
+
+
+def test_agregar_no_escribe_en_el_turno(tmp_path):
+    escritor = EscritorFalso()
+    historial = HistorialSesion(str(tmp_path / "s.jsonl"), max_memoria=2, escritor=escritor)
+    conversar(historial, 3)
+
+    assert not os.path.exists(historial.ruta)
+    assert len(escritor.avisos) == 3
+    assert historial.guardar() == 3
+    assert historial.guardar() == 0
+    conversar(historial, 2)  # uno queda pendiente fuera de la ventana en memoria
+
+    assert len(historial) == 5 and historial.en_memoria == 2
+    assert [t["content"] for t in historial] == [f"mensaje {i}" for i in (0, 1, 2, 0, 1)]
+    assert [t["content"] for t in historial[1:4]] == ["mensaje 1", "mensaje 2", "mensaje 0"]
+    assert [t["content"] for t in historial.anteriores(2)] == ["mensaje 1", "mensaje 2"]
+
+
+def test_hibernar_y_reabrir(almacen, reloj):
+    sesiones = almacen(max_memoria=2, inactividad_s=60, retencion_s=3600)
+    conversar(sesiones.obtener("abc"), 5)
+
+    reloj[0] += 61
+    sesiones.expirar()
+    stats = sesiones.estadisticas()
+    assert stats["hibernadas"] == 1 and stats["sesiones"] == 0
+
+    historial = sesiones.obtener("abc")
+    assert sesiones.estadisticas()["reabiertas"] == 1
+    assert len(historial) == 5 and historial.en_memoria == 2
+    assert [t["content"] for t in historial] == [f"mensaje {i}" for i in range(5)]
+
+
+def test_sin_retencion_el_archivo_se_borra_al_hibernar(almacen, reloj):
+    sesiones = almacen(inactividad_s=60)
+    historial = sesiones.obtener("abc")
+    conversar(historial, 2)
+    assert sesiones.escritor.flush()
+    assert os.path.exists(historial.ruta)
+
+    reloj[0] += 61
+    sesiones.expirar()
+    assert not os.path.exists(historial.ruta)
+    assert sesiones.estadisticas()["borradas"] == 1
+    assert len(sesiones.obtener("abc")) == 0
+
+
+def test_no_borra_una_sesion_reabierta_durante_el_barrido(almacen, reloj, monkeypatch):
+    sesiones = almacen(inactividad_s=60, retencion_s=10)
+    conversar(sesiones.obtener("abc"), 2)
+    reloj[0] += 61
+    scandir = os.scandir
+
+    def scandir_y_reabrir(ruta):
+        entradas = list(scandir(ruta))
+        sesiones.obtener("abc")  # el usuario vuelve justo después de listar el directorio
+        return iter(entradas)
+
+    monkeypatch.setattr(mindly_sesiones.os, "scandir", scandir_y_reabrir)
+    sesiones.expirar()
+    monkeypatch.setattr(mindly_sesiones.os, "scandir", scandir)
+
+    assert sesiones.estadisticas()["borradas"] == 0
+    assert [t["content"] for t in sesiones.obtener("abc")] == ["mensaje 0", "mensaje 1"]
+
+
+def test_cerrar_guarda_lo_pendiente(almacen, tmp_path):
+    sesiones = almacen(retencion_s=3600)
+    conversar(sesiones.obtener("abc"), 3)
+    sesiones.cerrar()
+    assert len(HistorialSesion(str(tmp_path / "sesiones" / "abc.jsonl"))) == 3